@@ -0,0 +1,102 @@
+"""Time AnalyticsService against the 100 ms target on a large history.
+
+Builds a throwaway database with the same history as history_queries.py
+(1M rows by default, with random ratings), then times:
+
+- ``load``: the one columnar fetch and sort into NumPy arrays. This is
+  paid once per session or after a bulk change, and is dominated by
+  SQLite handing rows to Python, so it is reported but not held to the
+  target.
+- each statistic, computed from the cached arrays
+- ``patch``: splicing in one saved session after the load
+
+The target is for the last two: what a statistic costs once history is
+loaded, including right after new history arrives.
+
+Usage: python benchmarks/analytics.py [rows] [blocks]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from history_queries import populate
+from lifeblocks.models import TimeBlock
+from lifeblocks.models.database import apply_storage_profile
+from lifeblocks.models.timeblock import TimeBlockState
+from lifeblocks.services.analytics_service import AnalyticsService
+
+REPEATS = 5
+TARGET_MS = 100.0
+
+STATISTICS = {
+    "rolling_means": lambda analytics: analytics.rolling_means(),
+    "correlation": lambda analytics: analytics.resistance_satisfaction_correlation(),
+    "completion_rate_by_block": lambda analytics: analytics.completion_rate_by_block(),
+    "state_counts": lambda analytics: analytics.state_counts(),
+    "time_of_day_distribution": lambda analytics: analytics.time_of_day_distribution(),
+}
+
+
+def best_of(action):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        action()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    blocks = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    directory = tempfile.mkdtemp(prefix="lifeblocks-bench-")
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    apply_storage_profile(engine)
+    started = time.perf_counter()
+    populate(engine, rows, blocks)
+    with engine.begin() as connection:
+        # Ratings 1-5, about one in six left unrated
+        connection.execute(
+            text(
+                f"UPDATE {TimeBlock.__tablename__} SET "
+                "resistance_level = NULLIF(abs(random()) % 6, 0), "
+                "satisfaction_level = NULLIF(abs(random()) % 6, 0)"
+            )
+        )
+        connection.execute(text("ANALYZE"))
+    print(f"populated {rows:,} rows in {time.perf_counter() - started:.1f}s\n")
+
+    session = sessionmaker(bind=engine)()
+    analytics = AnalyticsService(session)
+    results = {"load": best_of(lambda: (analytics.invalidate(), analytics._load()))}
+    for name, statistic in STATISTICS.items():
+        # Cached arrays, fresh results: what a call after new history costs
+        results[name] = best_of(lambda: (analytics._results.clear(), statistic(analytics)))
+
+    def save_session():
+        session.add(
+            TimeBlock(block_id=1, start_time=datetime.now(), duration_minutes=30.0, state=TimeBlockState.COMPLETED)
+        )
+        session.flush()
+        analytics._load()
+
+    results["patch (one saved session)"] = best_of(save_session)
+    session.rollback()
+    session.close()
+    engine.dispose()
+
+    print(f"{'step':<30}{'time':>10}  target {TARGET_MS:.0f} ms")
+    for name, seconds in results.items():
+        milliseconds = seconds * 1000
+        verdict = "one-off" if name == "load" else ("ok" if milliseconds < TARGET_MS else "SLOW")
+        print(f"{name:<30}{milliseconds:>8.1f}ms  {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Time the hot history queries with and without the SQLite storage profile.
+
+Builds a throwaway database with a large history table (1M rows by
+default), then runs the queries behind the history view, delay checks,
+timer restore and last_picked recomputation against:
+
+- ``default``: SQLAlchemy defaults and no secondary indexes
+- ``profile``: the pragmas from ``apply_storage_profile`` plus the model indexes
+
+Usage: python benchmarks/history_queries.py [rows] [blocks]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from lifeblocks.models import Base, Block, TimeBlock
+from lifeblocks.models.database import apply_storage_profile
+from lifeblocks.models.timeblock import PickReason, TimeBlockState
+
+CHUNK_SIZE = 50_000
+REPEATS = 5
+
+
+def populate(engine, rows, blocks):
+    Base.metadata.create_all(engine)
+    now = datetime.now()
+    rng = random.Random(1)
+    states = [TimeBlockState.COMPLETED] * 8 + [
+        TimeBlockState.ABANDONED,
+        TimeBlockState.DELAYED,
+        TimeBlockState.EXPIRED,
+    ]
+
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Block.__table__),
+            [
+                {
+                    "id": block_id,
+                    "name": f"Block {block_id}",
+                    "weight": 1,
+                    "length_multiplier": 1.0,
+                    "active": True,
+                    "created_at": now - timedelta(days=5 * 365),
+                }
+                for block_id in range(1, blocks + 1)
+            ],
+        )
+
+        for offset in range(0, rows, CHUNK_SIZE):
+            chunk = []
+            for i in range(offset, min(rows, offset + CHUNK_SIZE)):
+                state = rng.choice(states)
+                chunk.append(
+                    {
+                        "block_id": rng.randint(1, blocks),
+                        # Spread rows across five years, newest last
+                        "start_time": now - timedelta(minutes=(rows - i) * 5 * 365 * 24 * 60 / rows),
+                        "duration_minutes": 60.0,
+                        "pause_duration_minutes": 0.0,
+                        "deleted": rng.random() < 0.02,
+                        "state": state.name,
+                        "forced": False,
+                        "pick_reason": PickReason.NORMAL.name,
+                        "delay_hours": 4 if state == TimeBlockState.DELAYED else None,
+                    }
+                )
+            connection.execute(insert(TimeBlock.__table__), chunk)
+
+        # One timer left running, as after a crash
+        connection.execute(
+            insert(TimeBlock.__table__),
+            {
+                "block_id": 1,
+                "start_time": now,
+                "duration_minutes": 60.0,
+                "pause_duration_minutes": 0.0,
+                "deleted": False,
+                "state": TimeBlockState.ACTIVE.name,
+                "forced": False,
+                "pick_reason": PickReason.NORMAL.name,
+            },
+        )
+
+
+def drop_secondary_indexes(engine):
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+
+def run_queries(session, blocks):
+    now = datetime.now()
+    block_ids = list(range(1, min(blocks, 200) + 1))
+    excluded_states = [
+        TimeBlockState.ABANDONED,
+        TimeBlockState.EXPIRED,
+        TimeBlockState.CANCELLED_ON_COMPLETE,
+        TimeBlockState.RESTARTED,
+        TimeBlockState.DELAYED,
+    ]
+
+    return {
+        "history view (last 7 days)": lambda: session.query(TimeBlock)
+        .filter(
+            TimeBlock.deleted.is_(False),
+            ~TimeBlock.state.in_(excluded_states),
+            TimeBlock.start_time >= now - timedelta(days=7),
+        )
+        .order_by(TimeBlock.start_time.desc())
+        .all(),
+        "latest delay per block (x50)": lambda: [
+            session.query(TimeBlock)
+            .filter(TimeBlock.block_id == block_id, TimeBlock.state == TimeBlockState.DELAYED)
+            .order_by(TimeBlock.start_time.desc())
+            .first()
+            for block_id in block_ids[:50]
+        ],
+        "restore active timer": lambda: session.query(TimeBlock)
+        .filter(
+            TimeBlock.state.in_([TimeBlockState.ACTIVE, TimeBlockState.PAUSED]),
+            TimeBlock.deleted.is_(False),
+        )
+        .first(),
+        "last_picked recompute (200 blocks)": lambda: session.query(
+            TimeBlock.block_id, func.max(TimeBlock.start_time)
+        )
+        .filter(TimeBlock.block_id.in_(block_ids), TimeBlock.deleted.is_(False))
+        .group_by(TimeBlock.block_id)
+        .all(),
+    }
+
+
+def benchmark(label, rows, blocks, use_profile):
+    directory = tempfile.mkdtemp(prefix="lifeblocks-bench-")
+    path = os.path.join(directory, "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    if use_profile:
+        apply_storage_profile(engine)
+
+    started = time.perf_counter()
+    populate(engine, rows, blocks)
+    if not use_profile:
+        drop_secondary_indexes(engine)
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+    print(f"[{label}] populated {rows:,} rows in {time.perf_counter() - started:.1f}s")
+
+    session = sessionmaker(bind=engine)()
+    results = {}
+    for name, query in run_queries(session, blocks).items():
+        timings = []
+        for _ in range(REPEATS):
+            session.expunge_all()
+            started = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - started)
+        results[name] = min(timings)
+    session.close()
+    engine.dispose()
+    return results
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    blocks = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    default = benchmark("default", rows, blocks, use_profile=False)
+    profile = benchmark("profile", rows, blocks, use_profile=True)
+
+    print(f"\n{'query':<38}{'default':>12}{'profile':>12}{'speedup':>10}")
+    for name in default:
+        speedup = default[name] / profile[name] if profile[name] else float("inf")
+        print(f"{name:<38}{default[name] * 1000:>10.1f}ms{profile[name] * 1000:>10.1f}ms{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,123 @@
+import argparse
+import sys
+
 from .models.database import init_database
+from .services.data_service import DataService
+from .services.block_service import BlockService
+from .services.rollup_service import RollupService
+from .services.schedule_simulator import ScheduleSimulator
+from .services.settings_service import SettingsService
 from .ui.main_window import MainWindow
 
 
-def main():
+def build_parser():
+    parser = argparse.ArgumentParser(prog="lifeblocks")
+    subparsers = parser.add_subparsers(dest="command")
+
+    export_parser = subparsers.add_parser("export", help="Export all data as JSON")
+    export_parser.add_argument(
+        "path", nargs="?", default="-", help='Output file, or "-" for stdout (default)'
+    )
+    export_parser.add_argument(
+        "--gzip", action="store_true", help="Gzip the output (implied by a .gz path)"
+    )
+
+    import_parser = subparsers.add_parser("import", help="Replace all data with a JSON export")
+    import_parser.add_argument("path", help="Export file (.json or .json.gz)")
+    import_parser.add_argument(
+        "--chunk-size", type=int, default=5000, help="Rows per insert batch (default 5000)"
+    )
+
+    subparsers.add_parser(
+        "rebuild-rollup", help="Recompute the daily rollup table from history"
+    )
+
+    simulate_parser = subparsers.add_parser(
+        "simulate", help="Simulate block selection over many days with the current blocks and settings"
+    )
+    simulate_parser.add_argument("--days", type=int, default=365, help="Days per run (default 365)")
+    simulate_parser.add_argument("--runs", type=int, default=32, help="Independent runs (default 32)")
+    simulate_parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: one per CPU; 0 runs inline)"
+    )
+    simulate_parser.add_argument(
+        "--hours-per-day", type=float, default=8.0, help="Hours of back-to-back sessions per day (default 8)"
+    )
+    simulate_parser.add_argument(
+        "--delay-probability", type=float, default=0.0, help="Chance an offered block is delayed (default 0)"
+    )
+    simulate_parser.add_argument("--seed", type=int, default=None, help="Random seed for repeatable runs")
+
+    return parser
+
+
+def print_progress(section, count, rows_per_sec):
+    print(f"{section}: {count} rows ({rows_per_sec:.0f} rows/sec)", file=sys.stderr)
+
+
+def print_simulation(report):
+    print(
+        f"{report.runs} runs x {report.days} days: "
+        f"{report.normal_picks} normal picks, {report.overdue_picks} overdue picks, "
+        f"{report.skipped_sessions} skipped sessions"
+    )
+    print(
+        f"{'Block':<24} {'Share':>7} {'Picks':>8} {'Gap p50 s':>10} {'Gap p90 s':>10} "
+        f"{'Gap max s':>10} {'Violations':>10} {'Longest over s':>14}"
+    )
+
+    def seconds(value):
+        return "-" if value is None else f"{value:.0f}"
+
+    for block in sorted(report.blocks.values(), key=lambda block: -block.share):
+        if not block.picks and not block.violations:
+            continue
+        print(
+            f"{block.name[:24]:<24} {block.share:>7.1%} {block.picks:>8} {seconds(block.gap_p50):>10} "
+            f"{seconds(block.gap_p90):>10} {seconds(block.gap_max):>10} {block.violations:>10} "
+            f"{block.longest_violation_seconds:>14.0f}"
+        )
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
     # Initialize database and get session
     engine, session = init_database()
 
+    if args.command == "export":
+        if args.path == "-" and args.gzip:
+            sys.exit("Cannot gzip to stdout; pipe through gzip instead")
+        DataService(session).export_to_file(args.path, compress=args.gzip or None)
+        return
+
+    if args.command == "import":
+        messages = DataService(session).import_from_file(
+            args.path, chunk_size=args.chunk_size, progress=print_progress
+        )
+        print("\n".join(messages))
+        if any(message.startswith("Error during import") for message in messages):
+            sys.exit(1)
+        return
+
+    if args.command == "rebuild-rollup":
+        RollupService.for_session(session).rebuild()
+        session.commit()
+        return
+
+    if args.command == "simulate":
+        block_service = BlockService(session, SettingsService(session))
+        report = ScheduleSimulator(block_service).run(
+            days=args.days,
+            runs=args.runs,
+            workers=args.workers,
+            hours_per_day=args.hours_per_day,
+            delay_probability=args.delay_probability,
+            seed=args.seed,
+        )
+        print_simulation(report)
+        return
+
     # Create and run main window
     app = MainWindow(session)
     app.run()
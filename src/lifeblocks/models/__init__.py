@@ -1,6 +1,8 @@
 from .base import Base
 from .block import Block
+from .block_ancestry import BlockAncestry
 from .timeblock import TimeBlock
 from .settings import Settings
+from .daily_rollup import DailyRollup
 
-__all__ = ["Base", "Block", "TimeBlock", "Settings"]
+__all__ = ["Base", "Block", "BlockAncestry", "TimeBlock", "Settings", "DailyRollup"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Boolean, Index
 from sqlalchemy.orm import relationship
 from lifeblocks.models.base import Base
 from datetime import datetime
@@ -6,6 +6,10 @@ from datetime import datetime
 
 class Block(Base):
     __tablename__ = "blocks"
+    __table_args__ = (
+        # Child lookups and the active-children filter of hierarchical selection
+        Index("ix_blocks_parent_id_active", "parent_id", "active"),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
@@ -17,6 +21,10 @@ class Block(Base):
     length_multiplier = Column(Float, default=1.0, nullable=False)
     min_duration_minutes = Column(Float, nullable=True)
     active = Column(Boolean, default=True, nullable=False)
+    # End of the most recent delay; set by BlockService.create_delayed_timeblock
+    snoozed_until = Column(DateTime, nullable=True, index=True)
+    # Pass value for stride selection; moved on each time that mode picks the block
+    stride_pass = Column(Float, nullable=True)
 
     # Relationships
     children = relationship("Block", backref="parent", remote_side=[id])
@@ -0,0 +1,76 @@
+from sqlalchemy import Column, Integer, ForeignKey, Index, event
+from sqlalchemy.schema import DDL
+from lifeblocks.models.base import Base
+
+
+class BlockAncestry(Base):
+    """Closure table of the block hierarchy.
+
+    One row per (ancestor, descendant) pair, including each block paired
+    with itself at depth 0, so a whole subtree or a whole parent chain is
+    a single indexed lookup. Maintained by triggers on ``blocks`` (see
+    ANCESTRY_DDL), never written directly.
+    """
+
+    __tablename__ = "block_ancestry"
+    __table_args__ = (
+        # Parent chains, ordered by distance
+        Index("ix_block_ancestry_descendant_id_depth", "descendant_id", "depth"),
+    )
+
+    # The primary key serves subtree lookups
+    ancestor_id = Column(Integer, ForeignKey("blocks.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("blocks.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+
+# Triggers keeping block_ancestry in step with blocks.parent_id, so every
+# write path, ORM or Core, is covered. Moving a block under its own subtree
+# is refused. SQLite only.
+ANCESTRY_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS block_ancestry_insert AFTER INSERT ON blocks BEGIN "
+    "INSERT INTO block_ancestry (ancestor_id, descendant_id, depth) "
+    "SELECT ancestor_id, new.id, depth + 1 FROM block_ancestry WHERE descendant_id = new.parent_id "
+    "UNION ALL SELECT new.id, new.id, 0; END",
+    "CREATE TRIGGER IF NOT EXISTS block_ancestry_cycle BEFORE UPDATE OF parent_id ON blocks "
+    "WHEN new.parent_id IN (SELECT descendant_id FROM block_ancestry WHERE ancestor_id = old.id) BEGIN "
+    "SELECT RAISE(ABORT, 'a block cannot be moved under itself'); END",
+    "CREATE TRIGGER IF NOT EXISTS block_ancestry_move AFTER UPDATE OF parent_id ON blocks "
+    "WHEN old.parent_id IS NOT new.parent_id BEGIN "
+    # Unlink the subtree from its old ancestors...
+    "DELETE FROM block_ancestry "
+    "WHERE descendant_id IN (SELECT descendant_id FROM block_ancestry WHERE ancestor_id = new.id) "
+    "AND ancestor_id NOT IN (SELECT descendant_id FROM block_ancestry WHERE ancestor_id = new.id); "
+    # ...and link it under each of the new ones
+    "INSERT INTO block_ancestry (ancestor_id, descendant_id, depth) "
+    "SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1 "
+    "FROM block_ancestry AS above, block_ancestry AS below "
+    "WHERE above.descendant_id = new.parent_id AND below.ancestor_id = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS block_ancestry_delete AFTER DELETE ON blocks BEGIN "
+    "DELETE FROM block_ancestry WHERE descendant_id = old.id OR ancestor_id = old.id; END",
+)
+
+# Derive the whole table from the parent links, for upgrades and imports
+# (whose Core inserts may add a child before its parent). Broken links end
+# a chain; the depth limit stops a cycle in old data from looping forever.
+ANCESTRY_REBUILD = (
+    "DELETE FROM block_ancestry",
+    "INSERT INTO block_ancestry (ancestor_id, descendant_id, depth) "
+    "WITH RECURSIVE chain(ancestor_id, descendant_id, depth) AS ("
+    "SELECT id, id, 0 FROM blocks "
+    "UNION ALL SELECT parent.id, chain.descendant_id, chain.depth + 1 FROM chain "
+    "JOIN blocks AS child ON child.id = chain.ancestor_id "
+    "JOIN blocks AS parent ON parent.id = child.parent_id "
+    "WHERE chain.depth < (SELECT COUNT(*) FROM blocks)) "
+    "SELECT ancestor_id, descendant_id, MIN(depth) FROM chain GROUP BY ancestor_id, descendant_id",
+)
+
+for _statement in ANCESTRY_DDL:
+    event.listen(BlockAncestry.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+# The triggers live on blocks, so they would outlast the table
+for _trigger in ("insert", "cycle", "move", "delete"):
+    event.listen(
+        BlockAncestry.__table__,
+        "before_drop",
+        DDL(f"DROP TRIGGER IF EXISTS block_ancestry_{_trigger}").execute_if(dialect="sqlite"),
+    )
@@ -25,4 +25,10 @@ class BlockQueue:
         return self.total_multiplier >= 1.0
 
     def has_space_for(self, block: Block):
-        return self.total_multiplier + block.length_multiplier <= 1.0 
\ No newline at end of file
+        return self.total_multiplier + block.length_multiplier <= 1.0
+
+    def session_share(self, block: Block) -> float:
+        """The part of a session the block gets: its length, scaled to the queue when sharing."""
+        if len(self.blocks) > 1:
+            return block.length_multiplier / self.total_multiplier
+        return block.length_multiplier
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, Float
+from lifeblocks.models.base import Base
+
+
+class DailyRollup(Base):
+    """Per-block, per-day totals of completed history.
+
+    Maintained incrementally by RollupService from every change to
+    ``history``; only non-deleted COMPLETED rows are counted.
+    """
+
+    __tablename__ = "daily_rollup"
+
+    block_id = Column(Integer, ForeignKey("blocks.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    completed_minutes = Column(Float, default=0.0, nullable=False)
+    pause_minutes = Column(Float, default=0.0, nullable=False)
+    session_count = Column(Integer, default=0, nullable=False)
+    # Sums and the number of rated sessions, so averages skip unrated ones
+    resistance_sum = Column(Integer, default=0, nullable=False)
+    resistance_count = Column(Integer, default=0, nullable=False)
+    satisfaction_sum = Column(Integer, default=0, nullable=False)
+    satisfaction_count = Column(Integer, default=0, nullable=False)
@@ -1,12 +1,37 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from lifeblocks.models import Base
 from lifeblocks.services.data_service import DataService
 
+DATABASE_URL = "sqlite:///blocks.db"
 
-def init_database():
+# Pragmas applied to every SQLite connection. WAL lets readers run alongside
+# the writer and, with synchronous=NORMAL, only fsyncs at checkpoints.
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", 256 * 1024 * 1024),  # 256 MiB
+    ("cache_size", -64 * 1024),  # negative means KiB, so 64 MiB
+    ("temp_store", "MEMORY"),
+)
+
+
+def apply_storage_profile(engine):
+    """Run the LifeBlocks SQLite pragmas on each new connection of an engine."""
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return engine
+
+
+def init_database(url=DATABASE_URL):
     # Create database engine
-    engine = create_engine("sqlite:///blocks.db")
+    engine = apply_storage_profile(create_engine(url))
 
     # Create all tables
     Base.metadata.create_all(engine)
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Boolean, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Boolean, Enum, Index, event
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import DDL
 import enum
 from lifeblocks.models.base import Base
 
@@ -23,6 +24,15 @@ class PickReason(enum.Enum):
 
 class TimeBlock(Base):
     __tablename__ = "history"
+    __table_args__ = (
+        # History view: non-deleted rows in a time range, newest first
+        Index("ix_history_deleted_start_time", "deleted", "start_time"),
+        # Per-block lookups: latest delay, last_picked recomputation
+        Index("ix_history_block_id_state_start_time", "block_id", "state", "start_time"),
+        Index("ix_history_block_id_deleted_start_time", "block_id", "deleted", "start_time"),
+        # Restoring an ACTIVE/PAUSED timer on startup
+        Index("ix_history_state_deleted", "state", "deleted"),
+    )
 
     id = Column(Integer, primary_key=True)
     block_id = Column(Integer, ForeignKey("blocks.id"))
@@ -72,3 +82,28 @@ class TimeBlock(Base):
         self.forced = forced
         self.pick_reason = pick_reason
         self.delay_hours = delay_hours
+
+
+# Full-text index over notes: an external-content FTS5 table (it stores only
+# the index, reading text from history) kept in sync by triggers, so every
+# write path, ORM or Core, is covered. SQLite only.
+NOTES_SEARCH_TABLE = "history_fts"
+NOTES_SEARCH_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {NOTES_SEARCH_TABLE} USING fts5("
+    "notes, content='history', content_rowid='id', tokenize='porter unicode61')",
+    f"CREATE TRIGGER IF NOT EXISTS {NOTES_SEARCH_TABLE}_insert AFTER INSERT ON history BEGIN "
+    f"INSERT INTO {NOTES_SEARCH_TABLE}(rowid, notes) VALUES (new.id, new.notes); END",
+    f"CREATE TRIGGER IF NOT EXISTS {NOTES_SEARCH_TABLE}_delete AFTER DELETE ON history BEGIN "
+    f"INSERT INTO {NOTES_SEARCH_TABLE}({NOTES_SEARCH_TABLE}, rowid, notes) VALUES ('delete', old.id, old.notes); END",
+    f"CREATE TRIGGER IF NOT EXISTS {NOTES_SEARCH_TABLE}_update AFTER UPDATE OF notes ON history BEGIN "
+    f"INSERT INTO {NOTES_SEARCH_TABLE}({NOTES_SEARCH_TABLE}, rowid, notes) VALUES ('delete', old.id, old.notes); "
+    f"INSERT INTO {NOTES_SEARCH_TABLE}(rowid, notes) VALUES (new.id, new.notes); END",
+)
+
+for _statement in NOTES_SEARCH_DDL:
+    event.listen(TimeBlock.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(
+    TimeBlock.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {NOTES_SEARCH_TABLE}").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,284 @@
+from typing import Dict, Optional, Set
+from sqlalchemy import case, event, func, inspect, select
+from lifeblocks.models import TimeBlock
+from lifeblocks.models.timeblock import TimeBlockState
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency: pip install lifeblocks[analytics]
+    np = None
+
+# State codes used in the state column: the index into this list
+STATES = list(TimeBlockState)
+# States that ended a session one way or another; the denominator of the completion rate
+FINISHED_STATES = [
+    TimeBlockState.COMPLETED,
+    TimeBlockState.ABANDONED,
+    TimeBlockState.EXPIRED,
+    TimeBlockState.CANCELLED_ON_COMPLETE,
+    TimeBlockState.RESTARTED,
+]
+
+# Loaded history columns, in select order
+COLUMN_NAMES = ("id", "block_id", "day", "duration", "pause", "resistance", "satisfaction", "state", "deleted")
+
+
+class AnalyticsService:
+    """Resistance, satisfaction and time-allocation statistics over history.
+
+    The relevant history columns are read once into NumPy arrays (one
+    raw columnar fetch) and every statistic is computed with vectorized
+    operations on them. Arrays and results are cached. Rows flushed
+    through the session afterwards are patched in by id on the next call,
+    so a saved session costs one small query rather than a reload; bulk
+    statements and rollbacks trigger a full reload.
+
+    ``day`` is the SQLite Julian day of ``start_time``; local hour of day
+    is derived from it. Deleted rows are ignored throughout, as are rows
+    left without a block when their block was deleted.
+
+    Requires NumPy (the ``analytics`` extra).
+    """
+
+    def __init__(self, session):
+        if np is None:
+            raise ImportError("Analytics require NumPy: pip install lifeblocks[analytics]")
+        self.session = session
+        self._columns: Optional[Dict[str, "np.ndarray"]] = None
+        self._changed_ids: Set[int] = set()
+        self._results = {}
+        self.loads = 0
+
+        event.listen(session, "after_flush", self._after_flush)
+        event.listen(session, "do_orm_execute", self._on_orm_execute)
+        event.listen(session, "after_soft_rollback", self._after_soft_rollback)
+
+    def invalidate(self):
+        self._columns = None
+        self._changed_ids.clear()
+        self._results.clear()
+
+    def _after_flush(self, session, flush_context):
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, TimeBlock):
+                timeblock_id = inspect(obj).dict.get("id")
+                if timeblock_id is None:
+                    self.invalidate()
+                    return
+                self._changed_ids.add(timeblock_id)
+                self._results.clear()
+
+    def _on_orm_execute(self, orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        if any(mapper.class_ is TimeBlock for mapper in orm_execute_state.all_mappers):
+            self.invalidate()
+
+    def _after_soft_rollback(self, session, previous_transaction):
+        self.invalidate()
+
+    def _fetch(self, *criteria) -> "np.ndarray":
+        """History rows as a float matrix with COLUMN_NAMES columns; NULL becomes NaN."""
+        query = (
+            select(
+                TimeBlock.id,
+                TimeBlock.block_id,
+                func.julianday(TimeBlock.start_time),
+                TimeBlock.duration_minutes,
+                TimeBlock.pause_duration_minutes,
+                TimeBlock.resistance_level,
+                TimeBlock.satisfaction_level,
+                case({state.name: code for code, state in enumerate(STATES)}, value=TimeBlock.state, else_=-1),
+                TimeBlock.deleted,
+            )
+            .where(TimeBlock.start_time.isnot(None), *criteria)
+            .order_by(TimeBlock.id)
+        )
+        connection = self.session.connection()
+        sql = str(query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+        # Straight from the DBAPI cursor: Row objects for a million rows would cost more than the fetch
+        cursor = connection.connection.cursor()
+        try:
+            rows = cursor.execute(sql).fetchall()
+        finally:
+            cursor.close()
+        return np.array(rows, dtype=float).reshape(len(rows), len(COLUMN_NAMES))
+
+    @staticmethod
+    def _kept(matrix: "np.ndarray") -> "np.ndarray":
+        """The rows statistics are computed on: not deleted, and still linked to a block."""
+        deleted = matrix[:, COLUMN_NAMES.index("deleted")]
+        block_ids = matrix[:, COLUMN_NAMES.index("block_id")]
+        return matrix[(deleted == 0) & ~np.isnan(block_ids)]
+
+    def _load(self) -> Dict[str, "np.ndarray"]:
+        """The cached columns of the kept rows (see _kept), sorted by block then start time."""
+        if self.session.autoflush:
+            # Pending edits should count; flushing records their ids for patching
+            self.session.flush()
+        if self._columns is None:
+            # Deleted and unlinked rows are dropped here: filtering them in SQL would steer
+            # SQLite onto the (deleted, start_time) index and a random-access walk of the table
+            matrix = self._kept(self._fetch())
+            order = np.lexsort((matrix[:, 2], matrix[:, 1]))
+            self._columns = {name: matrix[order, i] for i, name in enumerate(COLUMN_NAMES)}
+            self._changed_ids.clear()
+            self.loads += 1
+        elif self._changed_ids:
+            self._patch()
+        return self._columns
+
+    def _patch(self):
+        """Re-read the rows flushed since the last load and splice them in.
+
+        Only the changed rows are fetched; their old copies are dropped and
+        the current ones inserted at their sorted position, so the columns
+        never need a full re-sort.
+        """
+        changed = sorted(self._changed_ids)
+        self._changed_ids.clear()
+        fresh = self._kept(self._fetch(TimeBlock.id.in_(changed)))
+        # Rows landing at the same position are inserted in the given order, so it must be sorted too
+        fresh = fresh[np.lexsort((fresh[:, 2], fresh[:, 1]))]
+
+        columns = self._columns
+        stale = np.isin(columns["id"], changed)
+        if stale.any():
+            columns = {name: values[~stale] for name, values in columns.items()}
+
+        block_ids = columns["block_id"]
+        days = columns["day"]
+        positions = []
+        for block_id, day in zip(fresh[:, 1], fresh[:, 2]):
+            low = np.searchsorted(block_ids, block_id, side="left")
+            high = np.searchsorted(block_ids, block_id, side="right")
+            positions.append(low + np.searchsorted(days[low:high], day, side="right"))
+        if positions:
+            columns = {
+                name: np.insert(values, positions, fresh[:, i])
+                for i, (name, values) in enumerate(columns.items())
+            }
+        self._columns = columns
+
+    def _cached(self, key, compute):
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+
+    @staticmethod
+    def _block_bounds(block_ids):
+        """Unique block ids and the start offset of each in block-sorted columns."""
+        blocks, starts = np.unique(block_ids, return_index=True)
+        return blocks.astype(int), starts
+
+    def rolling_means(self, window: int = 7) -> Dict[int, Dict[str, "np.ndarray"]]:
+        """Per block, the mean resistance and satisfaction of each session's last ``window`` sessions.
+
+        Sessions are in start time order; unrated sessions are skipped in
+        the means (NaN until a rated one falls in the window). Returns
+        ``{block_id: {"day", "resistance", "satisfaction"}}``.
+        """
+
+        def compute():
+            columns = self._load()
+            size = len(columns["id"])
+            blocks, starts = self._block_bounds(columns["block_id"])
+            # Index of each row's first session within its block
+            group_start = np.repeat(starts, np.diff(np.append(starts, size)))
+            rows = np.arange(size)
+            low = np.maximum(rows + 1 - window, group_start)
+
+            result = {}
+            means = {}
+            for name in ("resistance", "satisfaction"):
+                values = columns[name]
+                rated = ~np.isnan(values)
+                value_sums = np.concatenate(([0.0], np.cumsum(np.where(rated, values, 0.0))))
+                rated_counts = np.concatenate(([0], np.cumsum(rated)))
+                total = value_sums[rows + 1] - value_sums[low]
+                count = rated_counts[rows + 1] - rated_counts[low]
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    means[name] = np.where(count > 0, total / count, np.nan)
+
+            bounds = np.append(starts, size)
+            for i, block_id in enumerate(blocks):
+                part = slice(bounds[i], bounds[i + 1])
+                result[int(block_id)] = {
+                    "day": columns["day"][part],
+                    "resistance": means["resistance"][part],
+                    "satisfaction": means["satisfaction"][part],
+                }
+            return result
+
+        return self._cached(("rolling_means", window), compute)
+
+    @staticmethod
+    def _pearson(n, sx, sy, sxy, sxx, syy):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            covariance = n * sxy - sx * sy
+            spread = np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+            return np.where(spread > 0, covariance / spread, np.nan)
+
+    def resistance_satisfaction_correlation(self) -> Dict[str, object]:
+        """Pearson correlation of resistance and satisfaction over sessions rated on both.
+
+        Returns ``{"overall": r, "by_block": {block_id: r}}``; NaN where undefined.
+        """
+
+        def compute():
+            columns = self._load()
+            both = ~np.isnan(columns["resistance"]) & ~np.isnan(columns["satisfaction"])
+            x = columns["resistance"][both]
+            y = columns["satisfaction"][both]
+            blocks, groups = np.unique(columns["block_id"][both], return_inverse=True)
+
+            def sums(weights=None):
+                return np.bincount(groups, weights=weights, minlength=len(blocks))
+
+            by_block = self._pearson(sums(), sums(x), sums(y), sums(x * y), sums(x * x), sums(y * y))
+            overall = self._pearson(len(x), x.sum(), y.sum(), (x * y).sum(), (x * x).sum(), (y * y).sum())
+            return {
+                "overall": float(overall),
+                "by_block": {int(block_id): float(r) for block_id, r in zip(blocks, by_block)},
+            }
+
+        return self._cached(("correlation",), compute)
+
+    def state_counts(self) -> Dict[TimeBlockState, int]:
+        """Number of sessions in each state."""
+
+        def compute():
+            codes = self._load()["state"]
+            counts = np.bincount(codes[codes >= 0].astype(int), minlength=len(STATES))
+            return {state: int(count) for state, count in zip(STATES, counts)}
+
+        return self._cached(("state_counts",), compute)
+
+    def completion_rate_by_block(self) -> Dict[int, float]:
+        """Share of each block's finished sessions (see FINISHED_STATES) that were completed."""
+
+        def compute():
+            columns = self._load()
+            finished = np.isin(columns["state"], [STATES.index(state) for state in FINISHED_STATES])
+            completed = columns["state"] == STATES.index(TimeBlockState.COMPLETED)
+            blocks, groups = np.unique(columns["block_id"][finished], return_inverse=True)
+            totals = np.bincount(groups, minlength=len(blocks))
+            completions = np.bincount(groups, weights=completed[finished], minlength=len(blocks))
+            return {int(block_id): float(done / total) for block_id, done, total in zip(blocks, completions, totals)}
+
+        return self._cached(("completion_rate",), compute)
+
+    def time_of_day_distribution(self, block_id: Optional[int] = None) -> "np.ndarray":
+        """Completed minutes by local starting hour (24 bins), overall or for one block."""
+
+        def compute():
+            columns = self._load()
+            selected = columns["state"] == STATES.index(TimeBlockState.COMPLETED)
+            if block_id is not None:
+                selected &= columns["block_id"] == block_id
+            # Julian days start at noon, so midnight is at .5
+            hours = np.floor(np.mod(columns["day"][selected] + 0.5, 1.0) * 24).astype(int) % 24
+            minutes = np.nan_to_num(columns["duration"][selected])
+            return np.bincount(hours, weights=minutes, minlength=24)
+
+        return self._cached(("time_of_day", block_id), compute)
@@ -0,0 +1,475 @@
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event, inspect, select
+from lifeblocks.models.block import Block
+from lifeblocks.utils.clock import SYSTEM_CLOCK
+from lifeblocks.utils.stride_queue import StrideQueue
+from lifeblocks.utils.weighted_sampler import DecayWeightedSampler
+
+# Reference point for turning datetimes into float hours for the samplers
+TIME_ORIGIN = datetime(2000, 1, 1)
+
+
+def to_hours(moment: datetime) -> float:
+    return (moment - TIME_ORIGIN).total_seconds() / 3600
+
+
+class BlockNode:
+    """The columns of a Block that selection needs, plus its place in the tree."""
+
+    __slots__ = (
+        "parent_id",
+        "active",
+        "weight",
+        "length_multiplier",
+        "max_interval_hours",
+        "last_picked",
+        "created_at",
+        "snoozed_until",
+        "stride_pass",
+        "children",
+        "active_chain",
+        "accumulated_weight",
+    )
+
+    def __init__(
+        self,
+        parent_id=None,
+        active=True,
+        weight=1,
+        length_multiplier=1.0,
+        max_interval_hours=None,
+        last_picked=None,
+        created_at=None,
+        snoozed_until=None,
+        stride_pass=None,
+    ):
+        self.parent_id = parent_id
+        self.active = bool(active)
+        self.weight = weight
+        self.length_multiplier = length_multiplier
+        self.max_interval_hours = max_interval_hours
+        self.last_picked = last_picked
+        self.created_at = created_at
+        self.snoozed_until = snoozed_until
+        self.stride_pass = stride_pass
+        self.children: Set[int] = set()
+        # True when every ancestor of the block is active (the block itself excluded)
+        self.active_chain = True
+        # The block's weight multiplied by the weights of all its ancestors
+        self.accumulated_weight = weight
+
+    def reset_time(self, now: datetime) -> datetime:
+        """When the block's time weight last started growing; ``now`` if it has no timestamps yet."""
+        return self.last_picked or self.created_at or now
+
+    def is_exceeded(self, now: datetime) -> bool:
+        """Whether the block has gone longer than its max interval without being picked."""
+        return (
+            self.max_interval_hours is not None
+            and self.last_picked is not None
+            and (now - self.last_picked).total_seconds() / 3600 > self.max_interval_hours
+        )
+
+    def is_snoozed(self, now: datetime) -> bool:
+        """Whether the block is still inside a delay the user asked for."""
+        return self.snoozed_until is not None and self.snoozed_until >= now
+
+
+class SelectionPool:
+    """The candidates for one selection step with their time-decayed weights.
+
+    ``primary`` holds the members that fit in a single block
+    (length_multiplier <= 1.0) and ``fractional`` the ones that can fill
+    a partial queue (length_multiplier < 1.0). ``stride`` and
+    ``stride_fractional`` put the same two groups in pass order for
+    stride selection; they are only built when that mode first asks.
+    """
+
+    def __init__(self, index: "BlockIndex", member_ids: Iterable[int]):
+        self.members = set(member_ids)
+        self.interval_ids = set()
+        now = index.clock.now()
+        primary = []
+        fractional = []
+        for block_id in self.members:
+            node = index.nodes[block_id]
+            entry = (block_id, node.accumulated_weight, to_hours(node.reset_time(now)))
+            if node.length_multiplier <= 1.0:
+                primary.append(entry)
+            if node.length_multiplier < 1.0:
+                fractional.append(entry)
+            if node.max_interval_hours is not None:
+                self.interval_ids.add(block_id)
+
+        self.primary = DecayWeightedSampler(primary)
+        self.fractional = DecayWeightedSampler(fractional)
+        self.stride: Optional[StrideQueue] = None
+        self.stride_fractional: Optional[StrideQueue] = None
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, block_id):
+        return block_id in self.members
+
+    def exceeded_ids(self, index: "BlockIndex", now: datetime) -> List[int]:
+        """Members past their max interval; only blocks with an interval are checked."""
+        return [block_id for block_id in self.interval_ids if index.nodes[block_id].is_exceeded(now)]
+
+    def overdue_ids(self, index: "BlockIndex", now: datetime) -> List[int]:
+        """Members past their max interval that haven't been delayed."""
+        return [
+            block_id for block_id in self.exceeded_ids(index, now)
+            if not index.nodes[block_id].is_snoozed(now)
+        ]
+
+    def stride_queues(self, index: "BlockIndex", virtual_time: float) -> Tuple[StrideQueue, StrideQueue]:
+        """Stride orders of the primary and fractional members, built on first use.
+
+        Members without a pass, or whose pass fell behind ``virtual_time``
+        while they were out of the pool, join at ``virtual_time``: due
+        soon, without credit saved up for the time they were away.
+        """
+        if self.stride is None:
+            primary = []
+            fractional = []
+            for block_id in self.members:
+                node = index.nodes[block_id]
+                entry = (block_id, node.accumulated_weight, max(node.stride_pass or virtual_time, virtual_time))
+                if node.length_multiplier <= 1.0:
+                    primary.append(entry)
+                if node.length_multiplier < 1.0:
+                    fractional.append(entry)
+            self.stride = StrideQueue(primary)
+            self.stride_fractional = StrideQueue(fractional)
+        return self.stride, self.stride_fractional
+
+    def update_weight(self, block_id: int, weight: float):
+        for sampler in (self.primary, self.fractional):
+            if sampler.entry(block_id) is not None:
+                sampler.update(block_id, weight=weight)
+        for order in (self.stride, self.stride_fractional):
+            if order is not None and block_id in order:
+                order.update(block_id, weight=weight)
+
+    def update_pass(self, block_id: int, stride_pass: Optional[float]):
+        if stride_pass is None:
+            return
+        for order in (self.stride, self.stride_fractional):
+            if order is not None and block_id in order:
+                order.update(block_id, pass_value=stride_pass)
+
+    def update_reset_time(self, block_id: int, reset_time: datetime):
+        hours = to_hours(reset_time)
+        for sampler in (self.primary, self.fractional):
+            if sampler.entry(block_id) is not None:
+                sampler.update(block_id, reset_time=hours)
+
+    @contextmanager
+    def withheld(self, sampler: DecayWeightedSampler, block_ids: Iterable[int]):
+        """Temporarily take blocks out of a sampler.
+
+        Yields a function that withholds further blocks; everything is put
+        back when the block exits.
+        """
+        removed = {}
+
+        def withhold(block_id):
+            if block_id not in removed and block_id in sampler:
+                removed[block_id] = sampler.remove(block_id)
+
+        for block_id in block_ids:
+            withhold(block_id)
+        try:
+            yield withhold
+        finally:
+            for block_id, (weight, _) in removed.items():
+                sampler.update(block_id, weight=weight)
+
+
+class BlockIndex:
+    """In-memory view of the block hierarchy.
+
+    Holds plain values rather than ORM objects so that it survives commits
+    (which expire every loaded Block). The index follows the session: any
+    Block flushed through it is applied incrementally, while bulk
+    ``query(Block).update()/delete()`` statements and rollbacks mark the
+    index stale so it is rebuilt with a single query on next use.
+
+    Accumulated (product-of-ancestor) weights are stored per node and
+    recomputed only for the subtree under a block whose weight or parent
+    changed.
+
+    Selection pools are built lazily from the index. A new ``last_picked``,
+    weight or stride pass only moves the affected entries in each pool
+    containing the block; edits to the tree's shape or to lengths drop the pools so they
+    are rebuilt on the next pick.
+    """
+
+    COLUMNS = (
+        "parent_id",
+        "active",
+        "weight",
+        "length_multiplier",
+        "max_interval_hours",
+        "last_picked",
+        "created_at",
+        "snoozed_until",
+        "stride_pass",
+    )
+
+    def __init__(self, session, clock=None):
+        self.session = session
+        self.clock = clock or SYSTEM_CLOCK
+        self.nodes: Dict[int, BlockNode] = {}
+        self.pools: Dict[object, SelectionPool] = {}
+        self._stale = True
+
+        event.listen(session, "after_flush", self._after_flush)
+        event.listen(session, "do_orm_execute", self._on_orm_execute)
+        event.listen(session, "after_soft_rollback", self._after_soft_rollback)
+
+    def invalidate(self):
+        self._stale = True
+        self.pools = {}
+
+    def ensure_current(self):
+        # Let pending edits reach the index through after_flush first
+        if self.session.autoflush:
+            self.session.flush()
+        if self._stale:
+            self.rebuild()
+
+    def rebuild(self):
+        """Rebuild the whole index from one SELECT over the blocks table."""
+        self.nodes = {}
+        self.pools = {}
+
+        # Executed on the connection so the rebuild doesn't autoflush into ourselves
+        rows = self.session.connection().execute(
+            select(Block.id, *(getattr(Block, column) for column in self.COLUMNS))
+        )
+        for row in rows:
+            self.nodes[row[0]] = BlockNode(*row[1:])
+        for block_id, node in self.nodes.items():
+            if node.parent_id in self.nodes:
+                self.nodes[node.parent_id].children.add(block_id)
+
+        self._stale = False
+        self._refresh_subtrees(
+            block_id for block_id, node in self.nodes.items()
+            if node.parent_id is None or node.parent_id not in self.nodes
+        )
+
+    # Queries
+
+    def is_leaf(self, block_id: int) -> bool:
+        self.ensure_current()
+        node = self.nodes.get(block_id)
+        return node is not None and not node.children
+
+    def leaf_ids(self) -> Set[int]:
+        self.ensure_current()
+        return {block_id for block_id, node in self.nodes.items() if not node.children}
+
+    def active_leaf_ids(self) -> Set[int]:
+        """Leaves that are active and whose whole parent chain is active."""
+        self.ensure_current()
+        return {
+            block_id
+            for block_id, node in self.nodes.items()
+            if not node.children and node.active and node.active_chain
+        }
+
+    def active_child_ids(self, parent_id: Optional[int]) -> Set[int]:
+        """Active children of a block, or active root blocks for ``None``."""
+        self.ensure_current()
+        if parent_id is None:
+            return {
+                block_id for block_id, node in self.nodes.items()
+                if node.parent_id is None and node.active
+            }
+        parent = self.nodes.get(parent_id)
+        if parent is None:
+            return set()
+        return {child_id for child_id in parent.children if self.nodes[child_id].active}
+
+    def has_active_parent_chain(self, block_id: int) -> bool:
+        self.ensure_current()
+        node = self.nodes.get(block_id)
+        return node is not None and node.active_chain
+
+    def accumulated_weight(self, block_id: int) -> float:
+        """A block's weight multiplied by the weights of all its ancestors."""
+        self.ensure_current()
+        return self.nodes[block_id].accumulated_weight
+
+    def leaf_pool(self) -> SelectionPool:
+        """Pool for leaf-based selection: every active leaf under an active chain."""
+        self.ensure_current()
+        if "leaves" not in self.pools:
+            self.pools["leaves"] = SelectionPool(self, self.active_leaf_ids())
+        return self.pools["leaves"]
+
+    def children_pool(self, parent_id: Optional[int]) -> SelectionPool:
+        """Pool for one level of hierarchical selection."""
+        self.ensure_current()
+        key = ("children", parent_id)
+        if key not in self.pools:
+            self.pools[key] = SelectionPool(self, self.active_child_ids(parent_id))
+        return self.pools[key]
+
+    # Maintenance
+
+    def _apply(self, block_id: int, values: dict, now: datetime):
+        """Apply a flushed block's values.
+
+        Returns (subtree_changed, pools_changed, new_reset_time), where
+        subtree_changed means descendants' active chains or accumulated
+        weights need recomputing.
+        """
+        node = self.nodes.get(block_id)
+        if node is None:
+            node = BlockNode(**values)
+            self.nodes[block_id] = node
+            if node.parent_id in self.nodes:
+                self.nodes[node.parent_id].children.add(block_id)
+            # Adopt children that were flushed before their parent
+            node.children = {
+                child_id for child_id, child in self.nodes.items() if child.parent_id == block_id
+            }
+            return True, True, None
+
+        old_parent = node.parent_id
+        structure_changed = old_parent != values["parent_id"] or node.active != bool(values["active"])
+        subtree_changed = structure_changed or node.weight != values["weight"]
+        pools_changed = structure_changed or any(
+            getattr(node, column) != values[column]
+            for column in ("length_multiplier", "max_interval_hours")
+        )
+        old_reset = node.reset_time(now)
+        for column, value in values.items():
+            setattr(node, column, value)
+        node.active = bool(node.active)
+
+        if old_parent != node.parent_id:
+            if old_parent in self.nodes:
+                self.nodes[old_parent].children.discard(block_id)
+            if node.parent_id in self.nodes:
+                self.nodes[node.parent_id].children.add(block_id)
+
+        new_reset = node.reset_time(now)
+        if new_reset == old_reset:
+            new_reset = None
+        return subtree_changed, pools_changed, new_reset
+
+    def _remove(self, block_id: int):
+        node = self.nodes.pop(block_id, None)
+        if node is not None and node.parent_id in self.nodes:
+            self.nodes[node.parent_id].children.discard(block_id)
+
+    def _refresh_subtrees(self, root_ids: Iterable[int]) -> Set[int]:
+        """Recompute active_chain and accumulated_weight below the given blocks.
+
+        Returns the ids of every block visited.
+        """
+        stack = []
+        for block_id in root_ids:
+            node = self.nodes.get(block_id)
+            if node is None:
+                continue
+            parent = self.nodes.get(node.parent_id)
+            if node.parent_id is None:
+                chain, parent_weight = True, 1
+            elif parent is not None:
+                chain, parent_weight = parent.active and parent.active_chain, parent.accumulated_weight
+            else:
+                chain, parent_weight = False, 1
+            stack.append((block_id, chain, parent_weight))
+
+        visited = set()
+        while stack:
+            block_id, chain, parent_weight = stack.pop()
+            if block_id in visited:
+                continue
+            visited.add(block_id)
+            node = self.nodes[block_id]
+            node.active_chain = chain
+            node.accumulated_weight = node.weight * parent_weight
+            for child_id in node.children:
+                if child_id in self.nodes:
+                    stack.append((child_id, chain and node.active, node.accumulated_weight))
+        return visited
+
+    # Session events
+
+    def _after_flush(self, session, flush_context):
+        if self._stale:
+            return
+
+        subtree_roots = []
+        pools_changed = False
+        reset_times = {}
+        passes = {}
+        now = self.clock.now()
+        for obj in list(session.new) + list(session.dirty):
+            if not isinstance(obj, Block):
+                continue
+            block_id = self._block_id(obj)
+            # Read from the instance dict: unloaded attributes are unchanged, and
+            # touching them here would issue a SELECT in the middle of the flush
+            loaded = inspect(obj).dict
+            node = self.nodes.get(block_id) or BlockNode()
+            values = {column: loaded.get(column, getattr(node, column)) for column in self.COLUMNS}
+            if values["stride_pass"] != node.stride_pass:
+                passes[block_id] = values["stride_pass"]
+            subtree, pools, reset_time = self._apply(block_id, values, now)
+            if subtree:
+                subtree_roots.append(block_id)
+            pools_changed = pools_changed or pools
+            if reset_time is not None:
+                reset_times[block_id] = reset_time
+        for obj in session.deleted:
+            if isinstance(obj, Block):
+                self._remove(self._block_id(obj))
+                pools_changed = True
+
+        reweighted = self._refresh_subtrees(subtree_roots) if subtree_roots else set()
+        if pools_changed:
+            self.pools = {}
+            return
+        for pool in self.pools.values():
+            for block_id in reweighted:
+                if block_id in pool:
+                    pool.update_weight(block_id, self.nodes[block_id].accumulated_weight)
+            for block_id, reset_time in reset_times.items():
+                if block_id in pool:
+                    pool.update_reset_time(block_id, reset_time)
+            for block_id, stride_pass in passes.items():
+                pool.update_pass(block_id, stride_pass)
+
+    @staticmethod
+    def _block_id(obj):
+        # New objects only get their identity key after after_flush has run
+        state = inspect(obj)
+        if "id" in state.dict:
+            return state.dict["id"]
+        return state.identity[0]
+
+    def _on_orm_execute(self, orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        if not any(mapper.class_ is Block for mapper in orm_execute_state.all_mappers):
+            return
+        self.invalidate()
+        synchronize = orm_execute_state.execution_options.get("synchronize_session", "auto")
+        if orm_execute_state.is_delete and synchronize == "auto":
+            # "auto" evaluates the criteria in Python, which passes over expired
+            # instances. Picks no longer load every block, so those are common;
+            # left in the identity map they collide with the ids SQLite reuses
+            orm_execute_state.update_execution_options(synchronize_session="fetch")
+
+    def _after_soft_rollback(self, session, previous_transaction):
+        self.invalidate()
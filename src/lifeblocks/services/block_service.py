@@ -1,15 +1,39 @@
+from collections import defaultdict
 from datetime import datetime, timedelta
+import heapq
+import math
 import random
-from typing import List, Tuple, Optional
+from typing import Dict, Iterable, List, NamedTuple, Set, Optional
+from sqlalchemy import delete, select, update
 from lifeblocks.models.block import Block
+from lifeblocks.models.block_ancestry import BlockAncestry
 from lifeblocks.models.block_queue import BlockQueue
+from lifeblocks.models.daily_rollup import DailyRollup
 from lifeblocks.models.timeblock import PickReason, TimeBlock, TimeBlockState
+from lifeblocks.services.block_index import BlockIndex, SelectionPool, to_hours
+from lifeblocks.utils.clock import SYSTEM_CLOCK
+
+# Same limit as the fill loop in _fill_fractional_queue
+MAX_FILL_ATTEMPTS = 10
+# Queue states pick_probabilities follows exactly before it estimates the fill instead
+MAX_FILL_STATES = 5000
+# Simulated fills behind that estimate
+FILL_SAMPLES = 2000
+
+
+class PickOdds(NamedTuple):
+    """A block's chance of being picked by pick_block_queue."""
+
+    primary: float  # as the queue's first block
+    fill: float  # as one of the fractional blocks filling the rest of the queue
 
 
 class BlockService:
-    def __init__(self, session, settings_service):
+    def __init__(self, session, settings_service, clock=None):
         self.session = session
         self.settings_service = settings_service
+        self.clock = clock or SYSTEM_CLOCK
+        self.index = BlockIndex(session, self.clock)
 
     def add_block(
         self,
@@ -34,6 +58,7 @@ class BlockService:
             length_multiplier=length_multiplier,
             min_duration_minutes=min_duration_minutes,
         )
+        new_block.created_at = self.clock.now()
         self.session.add(new_block)
         self.session.commit()
         return new_block
@@ -41,6 +66,25 @@ class BlockService:
     def get_all_blocks(self):
         return self.session.query(Block).all()
 
+    @staticmethod
+    def fetch_block_rows(session):
+        """Every block's displayed columns as plain rows, by id.
+
+        Takes any session, so it can run on a DataWorker.
+        """
+        columns = (
+            Block.id,
+            Block.name,
+            Block.parent_id,
+            Block.weight,
+            Block.max_interval_hours,
+            Block.length_multiplier,
+            Block.min_duration_minutes,
+            Block.last_picked,
+            Block.active,
+        )
+        return session.execute(select(*columns).order_by(Block.id)).all()
+
     def get_root_blocks(self):
         return self.session.query(Block).filter_by(parent_id=None).all()
 
@@ -67,17 +111,19 @@ class BlockService:
         if not block:
             return None
 
-        if name:
-            block.name = name
-        if weight:
-            block.weight = weight
         if parent_name is not None:
             parent_id = None
             if parent_name != "None":
                 parent = self.session.query(Block).filter_by(name=parent_name).first()
                 if parent:
                     parent_id = parent.id
+            if parent_id is not None and self.would_create_cycle(block_id, parent_id):
+                return None
             block.parent_id = parent_id
+        if name:
+            block.name = name
+        if weight:
+            block.weight = weight
         if max_interval_hours is not None:
             block.max_interval_hours = (
                 max_interval_hours if max_interval_hours >= 0 else None
@@ -93,60 +139,56 @@ class BlockService:
         return block
 
     def delete_block(self, block_id):
-        def delete_children(parent_id):
-            children = self.session.query(Block).filter_by(parent_id=parent_id).all()
-            for child in children:
-                delete_children(child.id)
-                self.session.delete(child)
-
+        """Delete a block and everything under it."""
         block = self.session.query(Block).get(block_id)
-        if block:
-            delete_children(block.id)
-            self.session.delete(block)
-            self.session.commit()
-            return True
-        return False
+        if not block:
+            return False
+
+        subtree = self._subtree_select(block_id)
+        # History outlives its blocks, unlinked; unlinked rows don't count towards the rollup
+        self.session.execute(update(TimeBlock).where(TimeBlock.block_id.in_(subtree)).values(block_id=None))
+        self.session.execute(delete(DailyRollup).where(DailyRollup.block_id.in_(subtree)))
+        self.session.query(Block).filter(Block.id.in_(subtree)).delete(synchronize_session="fetch")
+        self.session.commit()
+        return True
+
+    @staticmethod
+    def _subtree_select(block_id):
+        """IDs of a block and all its descendants, as a subquery."""
+        return select(BlockAncestry.descendant_id).where(BlockAncestry.ancestor_id == block_id)
+
+    def get_subtree_ids(self, block_id) -> Set[int]:
+        """IDs of a block and all its descendants (none of which can become its parent)."""
+        return set(self.session.scalars(self._subtree_select(block_id)))
+
+    def would_create_cycle(self, block_id, parent_id) -> bool:
+        """Whether moving block_id under parent_id would make it its own ancestor."""
+        link = select(BlockAncestry.depth).where(
+            BlockAncestry.ancestor_id == block_id, BlockAncestry.descendant_id == parent_id
+        )
+        return self.session.scalar(link) is not None
 
     def get_all_leaf_blocks(self):
         """Get all blocks that have no children."""
-        all_blocks = self.get_all_blocks()
-        return [block for block in all_blocks if not any(b.parent_id == block.id for b in all_blocks)]
+        # Query first: its autoflush brings the index up to date with pending edits
+        blocks = self.get_all_blocks()
+        leaf_ids = self.index.leaf_ids()
+        return [block for block in blocks if block.id in leaf_ids]
 
     def _has_active_parent_chain(self, block, all_blocks=None):
         """Check if all parents in a block's hierarchy are active."""
-        if all_blocks is None:
-            all_blocks = self.get_all_blocks()
-            
-        current_id = block.parent_id
-        while current_id is not None:
-            parent = next((b for b in all_blocks if b.id == current_id), None)
-            if not parent or not parent.active:
-                return False
-            current_id = parent.parent_id
-        return True
-        
+        return self.index.has_active_parent_chain(block.id)
+
     def get_active_leaf_blocks(self):
         """Get all active blocks that have no children and whose parents are all active."""
-        all_blocks = self.get_all_blocks()
-        
-        # First find all leaf blocks (blocks with no children)
-        leaf_blocks = [block for block in all_blocks if not any(b.parent_id == block.id for b in all_blocks)]
-        
-        # Then filter for active leaf blocks with active parent chain
-        return [block for block in leaf_blocks if block.active and self._has_active_parent_chain(block, all_blocks)]
+        blocks = self.get_all_active_blocks()
+        leaf_ids = self.index.active_leaf_ids()
+        return [block for block in blocks if block.id in leaf_ids]
 
     def calculate_accumulated_weight(self, block, time_weight_multiplier=1.0):
         """Calculate a block's weight including its parent's influence."""
-        weight = block.weight
-        current = block
-        
-        # Traverse up the parent chain, multiplying weights
-        while current.parent_id is not None:
-            parent = self.session.query(Block).get(current.parent_id)
-            if not parent:
-                break
-            weight *= parent.weight
-            current = parent
+        # Product of ancestor weights is maintained by the index
+        weight = self.index.accumulated_weight(block.id)
             
         # Apply time-based weight multiplier
         if time_weight_multiplier > 1.0:
@@ -154,66 +196,29 @@ class BlockService:
             
         return weight
 
-    def _calculate_weighted_blocks(self, blocks: List[Block], include_parent_weights: bool = False) -> List[Tuple[Block, float]]:
-        """Calculate weights for non-overdue blocks"""
-        now = datetime.now()
-        weighted_blocks = []
-
-        
-        # Check if debug mode is enabled
-        debug_mode = self.settings_service.get_setting("debug_mode", "false") == "true"
-
-        for block in blocks:
-            # Skip blocks that have exceeded max interval
-            if (
-                block.max_interval_hours is not None
-                and block.last_picked is not None
-                and (now - block.last_picked).total_seconds() / 3600
-                > block.max_interval_hours
-            ):
+    def _print_pool_weights(self, pool: SelectionPool, exceeded_ids: Iterable[int], now: datetime):
+        """Debug output: each primary candidate's weight as the pool's draw sees it."""
+        hours_until_double = float(self.settings_service.get_setting("hours_until_double_weight", "48"))
+        exceeded_ids = set(exceeded_ids)
+        for block_id in sorted(pool.members):
+            entry = pool.primary.entry(block_id)
+            if entry is None or block_id in exceeded_ids:
                 continue
-
-            hours_until_double = float(self.settings_service.get_setting("hours_until_double_weight", "48"))
-            time_multiplier = 1.0 / hours_until_double
-            # For unpicked blocks, use time since creation instead of a fixed value
-            hours_since_picked = (
-                (now - block.last_picked).total_seconds() / 3600 if block.last_picked
-                else (now - block.created_at).total_seconds() / 3600
-            )
-            time_weight = 1.0 + (hours_since_picked * time_multiplier)
-            
-            # Calculate weight including parent influence if requested
-            total_weight = self.calculate_accumulated_weight(block, time_weight) if include_parent_weights else block.weight * time_weight
-            weighted_blocks.append((block, total_weight))
-
-            if debug_mode:
-                base_weight = block.weight
-                time_factor = f"(1 + {hours_since_picked:.1f}h * {time_multiplier:.4f})"
-                if include_parent_weights:
-                    print(f"Block: {block.name:<30} | Base Weight: {base_weight:<5} | Time Factor: {time_factor:<20} | Final Weight: {total_weight:.2f}")
-                else:
-                    print(f"Block: {block.name:<30} | Weight: {base_weight:<5} | Time Factor: {time_factor:<20} | Final Weight: {total_weight:.2f}")
-
-
-        return weighted_blocks
-
-    def _select_weighted_block(self, weighted_blocks: List[Tuple[Block, float]]) -> Optional[Block]:
-        """Select a block using weighted random selection"""
-        if not weighted_blocks:
-            return None
-
-        total_weight = sum(weight for _, weight in weighted_blocks)
-        random_choice = random.uniform(0, total_weight)
-
-        cumulative_weight = 0
-        for block, weight in weighted_blocks:
-            cumulative_weight += weight
-            if cumulative_weight > random_choice:
-                return block
-
-        return weighted_blocks[-1][0] if weighted_blocks else None
-
-    def _fill_fractional_queue(self, queue: BlockQueue, blocks: List[Block], overdue_blocks: Optional[List[Block]] = None) -> None:
+            base_weight, reset_time = entry
+            hours_waited = to_hours(now) - reset_time
+            final_weight = pool.primary.value(block_id, to_hours(now), hours_until_double)
+            time_factor = f"(1 + {hours_waited:.1f}h / {hours_until_double:g}h)"
+            name = self.session.get(Block, block_id).name
+            print(f"Block: {name:<30} | Base Weight: {base_weight:<5} | Time Factor: {time_factor:<20} | Final Weight: {final_weight:.2f}")
+
+    def _fill_fractional_queue(
+        self,
+        queue: BlockQueue,
+        pool: SelectionPool,
+        overdue_blocks: Optional[List[Block]] = None,
+        exceeded_ids: Iterable[int] = (),
+        now: Optional[datetime] = None,
+    ) -> None:
         """Fill a queue with fractional blocks if enabled, prioritizing overdue blocks"""
         debug_mode = self.settings_service.get_setting("debug_mode", "false") == "true"
         should_fill_queues = self.settings_service.get_setting("fill_fractional_queues", "true") == "true"
@@ -248,58 +253,54 @@ class BlockService:
         if debug_mode and not queue.is_full():
             print("\nAttempting to fill remaining space with weighted blocks")
             
-        # Filter out blocks already in queue and non-fractional blocks
-        available_blocks = [b for b in blocks if b not in queue.blocks and b.length_multiplier < 1.0]
-        weighted_blocks = self._calculate_weighted_blocks(available_blocks, include_parent_weights=True)
-        
-        attempts = 0  # Add a counter to prevent infinite loops
-        max_attempts = 10  # Maximum number of attempts to fill the queue
-        
-        while not queue.is_full() and attempts < max_attempts:
-            attempts += 1
-            if not weighted_blocks:
-                if debug_mode:
-                    print("No more available blocks to fill queue")
-                break
-                
-            next_block = self._select_weighted_block(weighted_blocks)
-            if not next_block:
-                if debug_mode:
-                    print("No block selected")
-                break
-                
-            if debug_mode:
-                print(f"Selected block: {next_block.name} (length_multiplier: {next_block.length_multiplier})")
-                print(f"Queue has space: {queue.has_space_for(next_block)}")
+        now = now or self.clock.now()
+        hours_until_double = float(self.settings_service.get_setting("hours_until_double_weight", "48"))
+        sampler = pool.fractional
+
+        # Blocks already queued and blocks past their max interval don't take part in the draw
+        withheld_ids = [block.id for block in queue.blocks] + list(exceeded_ids)
+        with pool.withheld(sampler, withheld_ids) as withhold:
+            attempts = 0  # Add a counter to prevent infinite loops
+            max_attempts = MAX_FILL_ATTEMPTS  # Maximum number of attempts to fill the queue
             
-            if queue.has_space_for(next_block):
-                queue.add_block(next_block)
-                if debug_mode:
-                    print(f"Added block. New queue length: {queue.total_multiplier}")
-                # Remove the added block from weighted_blocks
-                weighted_blocks = [(b, w) for b, w in weighted_blocks if b != next_block]
-            else:
+            while not queue.is_full() and attempts < max_attempts:
+                attempts += 1
+                if not sampler:
+                    if debug_mode:
+                        print("No more available blocks to fill queue")
+                    break
+                    
+                next_id = sampler.sample(to_hours(now), hours_until_double)
+                next_block = self.session.get(Block, next_id) if next_id is not None else None
+                if not next_block:
+                    if debug_mode:
+                        print("No block selected")
+                    break
+                    
                 if debug_mode:
-                    print("Block wouldn't fit in remaining space")
-                break
+                    print(f"Selected block: {next_block.name} (length_multiplier: {next_block.length_multiplier})")
+                    print(f"Queue has space: {queue.has_space_for(next_block)}")
+                
+                if queue.has_space_for(next_block):
+                    queue.add_block(next_block)
+                    if debug_mode:
+                        print(f"Added block. New queue length: {queue.total_multiplier}")
+                    # Draw without replacement from here on
+                    withhold(next_block.id)
+                else:
+                    if debug_mode:
+                        print("Block wouldn't fit in remaining space")
+                    break
 
-    def _build_block_queue(self, blocks: List[Block]) -> Optional[BlockQueue]:
-        """Build a queue from candidate blocks, respecting length multipliers."""
+    def _build_block_queue(self, pool: SelectionPool, now: Optional[datetime] = None) -> Optional[BlockQueue]:
+        """Build a queue from a pool of candidate blocks, respecting length multipliers."""
         debug_mode = self.settings_service.get_setting("debug_mode", "false") == "true"
         
         # Check for overdue blocks
-        now = datetime.now()
-        overdue_blocks = [
-            block
-            for block in blocks
-            if (
-                block.max_interval_hours is not None
-                and block.last_picked is not None
-                and (now - block.last_picked).total_seconds() / 3600
-                > block.max_interval_hours
-                and not self.was_recently_delayed(block)
-            )
-        ]
+        now = now or self.clock.now()
+        exceeded_ids = pool.exceeded_ids(self.index, now)
+        # Delays are denormalized onto the block (snoozed_until), so this needs no history lookups
+        overdue_blocks = [self.session.get(Block, block_id) for block_id in pool.overdue_ids(self.index, now)]
 
         if debug_mode:
             print("\n=== Building Block Queue ===")
@@ -311,7 +312,7 @@ class BlockService:
             if debug_mode:
                 print(f"Selected overdue block: {selected_block.name} (length_multiplier: {selected_block.length_multiplier})")
             queue = BlockQueue(selected_block, pick_reason=PickReason.OVERDUE)
-            self._fill_fractional_queue(queue, blocks, overdue_blocks)
+            self._fill_fractional_queue(queue, pool, overdue_blocks, exceeded_ids, now)
             if debug_mode:
                 print("Final queue composition:")
                 for block in queue.blocks:
@@ -319,20 +320,24 @@ class BlockService:
                 print(f"Total queue length: {queue.total_multiplier}")
             return queue
 
-        # Calculate weighted blocks for selection
-        weighted_blocks = self._calculate_weighted_blocks(blocks, include_parent_weights=True)
-        
-        # Filter weighted blocks by those that would fit
-        fitting_weighted = [(b, w) for b, w in weighted_blocks if b.length_multiplier <= 1.0]
         if debug_mode:
-            print(f"Found {len(fitting_weighted)} blocks that could fit as primary block")
-        
-        if not fitting_weighted:
+            # Per-block weight breakdown; only computed when someone is reading it
+            self._print_pool_weights(pool, exceeded_ids, now)
+
+        # Draw from blocks that would fit as the primary block, skipping any past their max interval
+        hours_until_double = float(self.settings_service.get_setting("hours_until_double_weight", "48"))
+        with pool.withheld(pool.primary, exceeded_ids):
             if debug_mode:
-                print("No fitting blocks found")
-            return None
+                print(f"Found {len(pool.primary)} blocks that could fit as primary block")
+            
+            if not pool.primary:
+                if debug_mode:
+                    print("No fitting blocks found")
+                return None
 
-        selected_block = self._select_weighted_block(fitting_weighted)
+            selected_id = pool.primary.sample(to_hours(now), hours_until_double)
+
+        selected_block = self.session.get(Block, selected_id) if selected_id is not None else None
         if not selected_block:
             if debug_mode:
                 print("Failed to select a block")
@@ -342,7 +347,7 @@ class BlockService:
             print(f"Selected primary block: {selected_block.name} (length_multiplier: {selected_block.length_multiplier})")
 
         queue = BlockQueue(selected_block, pick_reason=PickReason.NORMAL)
-        self._fill_fractional_queue(queue, blocks, overdue_blocks)
+        self._fill_fractional_queue(queue, pool, overdue_blocks, exceeded_ids, now)
         
         if debug_mode:
             print("Final queue composition:")
@@ -352,49 +357,383 @@ class BlockService:
         
         return queue
 
-    def pick_block_queue_leaf_based(self):
+    def pick_block_queue_leaf_based(self, now: Optional[datetime] = None):
         """Pick a block queue by considering all leaf nodes together."""
-        leaf_blocks = self.get_active_leaf_blocks()
-        return self._build_block_queue(leaf_blocks)
+        return self._build_block_queue(self.index.leaf_pool(), now)
 
-    def pick_block_queue_hierarchical(self):
+    def pick_block_queue_hierarchical(self, now: Optional[datetime] = None):
         """Pick a block queue using the hierarchical method."""
-        def pick_block_queue_recursive(blocks):
-            if not blocks:
-                return None
+        # Every level is judged at the same moment
+        now = now or self.clock.now()
 
-            # Filter out inactive blocks
-            active_blocks = [block for block in blocks if block.active]
-            if not active_blocks:
+        def pick_block_queue_recursive(parent_id):
+            # Pools only hold active blocks
+            pool = self.index.children_pool(parent_id)
+            if not pool:
                 return None
 
             # Build queue at this level
-            selected_queue = self._build_block_queue(active_blocks)
+            selected_queue = self._build_block_queue(pool, now)
             if not selected_queue:
                 return None
                 
             selected_block = selected_queue.blocks[0]  # Get the primary block from the queue
-            children = self.session.query(Block).filter_by(parent_id=selected_block.id, active=True).all()
-
-            if not children:
+            if not self.index.children_pool(selected_block.id):
                 # If no children, return the queue we built
                 return selected_queue
 
             # Try to pick from children
-            child_queue = pick_block_queue_recursive(children)
+            child_queue = pick_block_queue_recursive(selected_block.id)
             return child_queue if child_queue else selected_queue
 
         # Start the recursive selection from root blocks
-        root_blocks = self.get_active_root_blocks()
-        return pick_block_queue_recursive(root_blocks)
-
-    def pick_block_queue(self):
-        """Pick a block queue using either the hierarchical or leaf-based method."""
-        use_leaf_based = self.settings_service.get_setting("use_leaf_based_selection", "true") == "true"
-        if use_leaf_based:
-            return self.pick_block_queue_leaf_based()
+        return pick_block_queue_recursive(None)
+
+    def pick_block_queue_stride(self, now: Optional[datetime] = None):
+        """Pick a block queue by stride scheduling over all leaf nodes.
+
+        Leaves take turns in proportion to their accumulated weights, in a
+        fixed order rather than by lottery, so no block waits much longer
+        than its share implies. Picking writes nothing: a block's turn is
+        used up by record_stride_turn once it is started.
+        """
+        now = now or self.clock.now()
+        return self._build_stride_queue(self.index.leaf_pool(), now)
+
+    def _build_stride_queue(self, pool: SelectionPool, now: datetime) -> Optional[BlockQueue]:
+        """Build a queue from a pool in stride order, without recording the turn.
+
+        Overdue blocks still go first, lowest pass first; otherwise the
+        lowest pass not past its max interval leads. The fill takes
+        overdue blocks that fit, then fractional blocks by pass until one
+        doesn't fit, as _fill_fractional_queue does with its draws. A
+        delayed block keeps its pass, so it is passed over until its
+        delay ends rather than offered again at once.
+        """
+        # The build only reads. Callers flush through the index first; a flush in
+        # here would move passes in the orders that in_order() is walking
+        with self.session.no_autoflush:
+            virtual_time = self._stride_virtual_time()
+            primary_order, fractional_order = pool.stride_queues(self.index, virtual_time)
+            exceeded_ids = set(pool.exceeded_ids(self.index, now))
+            nodes = self.index.nodes
+
+            def passed_over(block_id):
+                # Checked lazily, so a pick only looks at the front of the order
+                return block_id in exceeded_ids or nodes[block_id].is_snoozed(now)
+
+            # Few blocks are overdue at once, so sorting them is cheap
+            overdue_ids = sorted(
+                pool.overdue_ids(self.index, now),
+                key=lambda block_id: (
+                    virtual_time if block_id not in primary_order else primary_order.pass_value(block_id),
+                    block_id,
+                ),
+            )
+
+            if overdue_ids:
+                queue = BlockQueue(self.session.get(Block, overdue_ids[0]), pick_reason=PickReason.OVERDUE)
+            else:
+                first_id = next(
+                    (block_id for block_id in primary_order.in_order() if not passed_over(block_id)), None
+                )
+                if first_id is None:
+                    return None
+                queue = BlockQueue(self.session.get(Block, first_id), pick_reason=PickReason.NORMAL)
+
+            if self.settings_service.get_setting("fill_fractional_queues", "true") != "true":
+                return queue
+            queued_ids = {queue.blocks[0].id}
+            for block_id in overdue_ids:
+                block = self.session.get(Block, block_id)
+                if block_id not in queued_ids and block.length_multiplier < 1.0 and queue.has_space_for(block):
+                    queue.add_block(block)
+                    queued_ids.add(block_id)
+            attempts = 0
+            for block_id in fractional_order.in_order():
+                if queue.is_full() or attempts >= MAX_FILL_ATTEMPTS:
+                    break
+                if block_id in queued_ids or passed_over(block_id):
+                    continue
+                attempts += 1
+                block = self.session.get(Block, block_id)
+                if not queue.has_space_for(block):
+                    break
+                queue.add_block(block)
+                queued_ids.add(block_id)
+            return queue
+
+    def _stride_virtual_time(self) -> float:
+        """Pass of the latest block to lead a normal stride pick; where newcomers join."""
+        return float(self.settings_service.get_setting("stride_virtual_time", "0"))
+
+    def record_stride_turn(self, queue: BlockQueue, block: Block, forced: bool = False):
+        """Move a started block's pass on by the part of the queue's session it gets.
+
+        Called as each block of a queue is started, like last_picked is set
+        from the work done, so a delayed or cancelled pick keeps its place.
+        Starting the lead block of a normal pick also moves the virtual
+        time up to its pass; overdue and forced picks jump the order, so
+        they don't. Does nothing outside stride mode.
+        """
+        if self.selection_mode() != "stride":
+            return
+        virtual_time = self._stride_virtual_time()
+        primary_order, _ = self.index.leaf_pool().stride_queues(self.index, virtual_time)
+        if block.id not in primary_order:
+            return
+        leads = block is queue.blocks[0] and queue.pick_reason == PickReason.NORMAL and not forced
+        if leads:
+            virtual_time = max(virtual_time, primary_order.pass_value(block.id))
+        start = max(primary_order.pass_value(block.id), virtual_time)
+        block.stride_pass = start + queue.session_share(block) * primary_order.stride(block.id)
+        # Either way this commits; the flush moves the block along in the pool's stride orders
+        if leads:
+            self.settings_service.set_setting("stride_virtual_time", repr(virtual_time))
+        else:
+            self.session.commit()
+
+    def selection_mode(self) -> str:
+        """The configured selection mode: "stride", "leaf" or "hierarchical"."""
+        if self.settings_service.get_setting("use_stride_selection", "false") == "true":
+            return "stride"
+        if self.settings_service.get_setting("use_leaf_based_selection", "true") == "true":
+            return "leaf"
+        return "hierarchical"
+
+    def pick_block_queue(self, now: Optional[datetime] = None):
+        """Pick a block queue using the stride, leaf-based or hierarchical method.
+
+        The clock is read once; ``now`` overrides it.
+        """
+        now = now or self.clock.now()
+        mode = self.selection_mode()
+        if mode == "stride":
+            return self.pick_block_queue_stride(now)
+        if mode == "leaf":
+            return self.pick_block_queue_leaf_based(now)
+        else:
+            return self.pick_block_queue_hierarchical(now)
+
+    def pick_probabilities(
+        self, now: Optional[datetime] = None, leaf_based: Optional[bool] = None
+    ) -> Dict[int, PickOdds]:
+        """Exact odds of each block being picked by pick_block_queue right now.
+
+        Computed from the selection pools rather than by sampling: overdue
+        blocks are drawn uniformly, others in proportion to their decayed
+        weight, and the fractional fill is followed draw by draw. The fill
+        costs as many steps as there are ways to fit fractional blocks into
+        one queue; past MAX_FILL_STATES of them the fill odds are estimated
+        from FILL_SAMPLES simulated fills instead (within a couple of
+        percentage points), so large pools stay fast. ``leaf_based`` defaults to the
+        use_leaf_based_selection setting. Blocks that can't be picked are
+        left out.
+
+        Stride selection, when configured and ``leaf_based`` isn't given,
+        has nothing to chance: the next queue's blocks get odds of 1.
+        """
+        now = now or self.clock.now()
+        if leaf_based is None and self.selection_mode() == "stride":
+            queue = self._build_stride_queue(self.index.leaf_pool(), now)
+            if not queue:
+                return {}
+            odds = {block.id: PickOdds(0.0, 1.0) for block in queue.blocks[1:]}
+            odds[queue.blocks[0].id] = PickOdds(1.0, 0.0)
+            return odds
+        if leaf_based is None:
+            leaf_based = self.settings_service.get_setting("use_leaf_based_selection", "true") == "true"
+        hours_until_double = float(self.settings_service.get_setting("hours_until_double_weight", "48"))
+        fill_enabled = self.settings_service.get_setting("fill_fractional_queues", "true") == "true"
+
+        primary = defaultdict(float)
+        fill = defaultdict(float)
+
+        def settle(pool, standing):
+            """Count the queues built from a pool that stand, and their fill."""
+            for block_id, chance in standing.items():
+                primary[block_id] += chance
+            if fill_enabled and standing:
+                for block_id, chance in self._fill_odds(pool, standing, now, hours_until_double).items():
+                    fill[block_id] += chance
+
+        if leaf_based:
+            pool = self.index.leaf_pool()
+            settle(pool, self._primary_odds(pool, now, hours_until_double) or {})
         else:
-            return self.pick_block_queue_hierarchical()
+
+            def descend(parent_id, probability):
+                """Spread ``probability`` over the queues picked from parent_id's children.
+
+                Returns False when no queue can be built there, in which case
+                the parent's own queue stands.
+                """
+                pool = self.index.children_pool(parent_id)
+                odds = self._primary_odds(pool, now, hours_until_double)
+                if not odds:
+                    return False
+                standing = {}
+                for block_id, chance in odds.items():
+                    if not self.index.children_pool(block_id) or not descend(block_id, probability * chance):
+                        standing[block_id] = probability * chance
+                settle(pool, standing)
+                return True
+
+            descend(None, 1.0)
+
+        return {
+            block_id: PickOdds(primary.get(block_id, 0.0), fill.get(block_id, 0.0))
+            for block_id in set(primary) | set(fill)
+        }
+
+    def _primary_odds(self, pool: SelectionPool, now: datetime, hours_until_double: float) -> Optional[Dict[int, float]]:
+        """Chance of each block heading the queue _build_block_queue makes from a pool, or None if it makes none."""
+        overdue = pool.overdue_ids(self.index, now)
+        if overdue:
+            return {block_id: 1.0 / len(overdue) for block_id in overdue}
+
+        hours = to_hours(now)
+        exceeded = set(pool.exceeded_ids(self.index, now))
+        weights = {
+            block_id: max(0.0, pool.primary.value(block_id, hours, hours_until_double))
+            for block_id in pool.primary.items
+            if block_id in pool.primary and block_id not in exceeded
+        }
+        total = sum(weights.values())
+        if total <= 0:
+            return None
+        return {block_id: weight / total for block_id, weight in weights.items() if weight > 0}
+
+    def _fill_odds(
+        self, pool: SelectionPool, starts: Dict[int, float], now: datetime, hours_until_double: float
+    ) -> Dict[int, float]:
+        """Chance of each block joining the fractional fill of a queue from a pool.
+
+        ``starts`` maps primaries to the chance their queue is picked. The
+        fill is followed draw by draw, as _fill_fractional_queue makes it;
+        what happens next only depends on the blocks already queued, so
+        queues that reach the same blocks (from different primaries, or in
+        a different order) are carried on together. Once more than
+        MAX_FILL_STATES sets of queued blocks have been reached, the odds
+        are estimated by sampling instead.
+        """
+        nodes = self.index.nodes
+        hours = to_hours(now)
+        exceeded = set(pool.exceeded_ids(self.index, now))
+        overdue = [block_id for block_id in pool.overdue_ids(self.index, now) if nodes[block_id].length_multiplier < 1.0]
+        weights = {}
+        for block_id in pool.fractional.items:
+            if block_id in pool.fractional and block_id not in exceeded:
+                weight = pool.fractional.value(block_id, hours, hours_until_double)
+                if weight > 0:
+                    weights[block_id] = weight
+        fill = self._exact_fill_odds(starts, overdue, weights)
+        if fill is None:
+            fill = self._sampled_fill_odds(starts, overdue, weights)
+        return fill
+
+    def _exact_fill_odds(
+        self, starts: Dict[int, float], overdue: List[int], weights: Dict[int, float]
+    ) -> Optional[Dict[int, float]]:
+        """The fill odds over every reachable queue, or None past MAX_FILL_STATES queues."""
+        nodes = self.index.nodes
+        fill = defaultdict(float)
+        states = 0
+
+        def length(queued):
+            return sum(nodes[block_id].length_multiplier for block_id in queued)
+
+        # Overdue blocks are tried first, in random order; those that don't fit are passed over
+        layer = defaultdict(float)
+        for block_id, chance in starts.items():
+            remaining = frozenset(other for other in overdue if other != block_id)
+            layer[remaining, frozenset([block_id])] += chance
+        drawing = defaultdict(float)
+        while layer:
+            states += len(layer)
+            if states > MAX_FILL_STATES:
+                return None
+            next_layer = defaultdict(float)
+            for (remaining, queued), chance in layer.items():
+                total = length(queued)
+                if total >= 1.0 or not remaining:
+                    drawing[queued] += chance
+                    continue
+                share = chance / len(remaining)
+                for block_id in remaining:
+                    if total + nodes[block_id].length_multiplier <= 1.0:
+                        fill[block_id] += share
+                        next_layer[remaining - {block_id}, queued | {block_id}] += share
+                    else:
+                        next_layer[remaining - {block_id}, queued] += share
+            layer = next_layer
+
+        # Then weighted draws without replacement, until the queue is full or a draw doesn't fit
+        candidates = sorted(weights, key=lambda block_id: nodes[block_id].length_multiplier)
+        # Queued blocks -> [chance, queue length, weight left to draw from]
+        layer = {
+            queued: [chance, length(queued), sum(weight for block_id, weight in weights.items() if block_id not in queued)]
+            for queued, chance in drawing.items()
+        }
+        for _ in range(MAX_FILL_ATTEMPTS):
+            states += len(layer)
+            if states > MAX_FILL_STATES:
+                return None
+            next_layer = {}
+            for queued, (chance, total, weight_left) in layer.items():
+                if total >= 1.0 or weight_left <= 0:
+                    continue
+                for block_id in candidates:
+                    block_length = nodes[block_id].length_multiplier
+                    if total + block_length > 1.0:
+                        break  # Candidates are sorted by length, so none of the rest fit either
+                    if block_id in queued:
+                        continue
+                    share = chance * weights[block_id] / weight_left
+                    fill[block_id] += share
+                    key = queued | {block_id}
+                    if key in next_layer:
+                        next_layer[key][0] += share
+                    else:
+                        next_layer[key] = [share, total + block_length, weight_left - weights[block_id]]
+            layer = next_layer
+        return fill
+
+    def _sampled_fill_odds(
+        self, starts: Dict[int, float], overdue: List[int], weights: Dict[int, float]
+    ) -> Dict[int, float]:
+        """The fill odds estimated from FILL_SAMPLES fills simulated the way _fill_fractional_queue draws them."""
+        nodes = self.index.nodes
+        fill = defaultdict(float)
+        primaries = list(starts)
+        share = sum(starts.values()) / FILL_SAMPLES
+
+        for primary_id in random.choices(primaries, weights=[starts[block_id] for block_id in primaries], k=FILL_SAMPLES):
+            queued = {primary_id}
+            total = nodes[primary_id].length_multiplier
+            order = [block_id for block_id in overdue if block_id != primary_id]
+            random.shuffle(order)
+            for block_id in order:
+                if total >= 1.0:
+                    break
+                if total + nodes[block_id].length_multiplier <= 1.0:
+                    queued.add(block_id)
+                    total += nodes[block_id].length_multiplier
+                    fill[block_id] += share
+
+            # Sorting by log(u) / weight orders the blocks as successive weighted
+            # draws without replacement would (Efraimidis and Spirakis)
+            keys = [
+                (math.log(1.0 - random.random()) / weight, block_id)
+                for block_id, weight in weights.items()
+                if block_id not in queued
+            ]
+            for _, block_id in heapq.nlargest(MAX_FILL_ATTEMPTS, keys):
+                if total >= 1.0 or total + nodes[block_id].length_multiplier > 1.0:
+                    break
+                total += nodes[block_id].length_multiplier
+                fill[block_id] += share
+        return fill
 
     def initialize_default_categories(self):
         # Check if this is first run using settings
@@ -428,23 +767,13 @@ class BlockService:
 
     def get_category_path(self, block_id: int) -> str:
         """Get the category path for a block, excluding the block itself."""
-        block = self.session.query(Block).get(block_id)
-        if not block:
-            return ""
-
-        path = []
-        current = block
-
-        # Traverse up the parent chain
-        while current.parent_id is not None:
-            parent = self.session.query(Block).get(current.parent_id)
-            if not parent:
-                break
-            path.append(parent.name)
-            current = parent
-
-        # Return path from root to parent (excluding the block itself)
-        return " → ".join(reversed(path)) if path else ""
+        names = self.session.scalars(
+            select(Block.name)
+            .join(BlockAncestry, BlockAncestry.ancestor_id == Block.id)
+            .where(BlockAncestry.descendant_id == block_id, BlockAncestry.depth > 0)
+            .order_by(BlockAncestry.depth.desc())
+        )
+        return " → ".join(names)
 
     def create_single_block_queue(self, block_id):
         """Create a queue with just a single block."""
@@ -456,7 +785,7 @@ class BlockService:
 
     def create_delayed_timeblock(self, block_id, delay_hours=None):
         """Create a TimeBlock entry to record that a block was delayed."""
-        now = datetime.now()
+        now = self.clock.now()
         timeblock = TimeBlock(
             block_id=block_id,
             start_time=now,
@@ -465,35 +794,22 @@ class BlockService:
             delay_hours=delay_hours
         )
         self.session.add(timeblock)
+
+        # Keep the block's snooze in step with its most recent delay
+        block = self.session.get(Block, block_id)
+        if block:
+            block.snoozed_until = now + timedelta(hours=delay_hours or 4)
+
         self.session.commit()
         return timeblock
 
-    def was_recently_delayed(self, block: Block, hours: int = 4) -> bool:
-        """Check if a block was delayed within the last n hours."""
+    def was_recently_delayed(self, block: Block, hours: int = 4, now: Optional[datetime] = None) -> bool:
+        """Check if a block is still within its most recent delay."""
         if not block:
             return False
-            
-        now = datetime.now()
-        
-        # Get the most recent delay for this block
-        recent_delay = (
-            self.session.query(TimeBlock)
-            .filter(
-                TimeBlock.block_id == block.id,
-                TimeBlock.state == TimeBlockState.DELAYED
-            )
-            .order_by(TimeBlock.start_time.desc())
-            .first()
-        )
-        
-        if not recent_delay:
-            return False
-            
-        # Use the delay_hours from the TimeBlock, or fall back to 4 hours
-        delay_duration = recent_delay.delay_hours or 4
-        cutoff = now - timedelta(hours=delay_duration)
-        
-        return recent_delay.start_time >= cutoff
+
+        # snoozed_until is the most recent delay's start plus its delay_hours (or 4 hours)
+        return block.snoozed_until is not None and block.snoozed_until >= (now or self.clock.now())
 
     def toggle_block_active_status(self, block_id):
         """Toggle the active status of a block."""
@@ -510,18 +826,11 @@ class BlockService:
         if not block:
             return None
             
-        # Toggle the block's active status
+        # Toggle the block and everything under it to the block's new status
         new_status = not block.active
-        block.active = new_status
-        
-        # Recursively toggle all children
-        def toggle_children(parent_id, status):
-            children = self.session.query(Block).filter_by(parent_id=parent_id).all()
-            for child in children:
-                child.active = status
-                toggle_children(child.id, status)
-                
-        toggle_children(block_id, new_status)
+        self.session.query(Block).filter(Block.id.in_(self._subtree_select(block_id))).update(
+            {Block.active: new_status}, synchronize_session="fetch"
+        )
         self.session.commit()
         return block
 
@@ -1,14 +1,20 @@
+import gzip
 import json
-from datetime import datetime
-from typing import Dict, Any, List
-from sqlalchemy import Column, Enum, DateTime, inspect
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, Iterable, List, Optional, TextIO, Tuple
+from sqlalchemy import Column, Enum, DateTime, insert, inspect, select, text
 from sqlalchemy.orm import Session
 from sqlalchemy.schema import DDL
-from lifeblocks.models import Block, TimeBlock, Settings
-from lifeblocks.models.timeblock import TimeBlockState, PickReason
+from lifeblocks.models import Base, Block, BlockAncestry, TimeBlock, Settings
+from lifeblocks.models.block_ancestry import ANCESTRY_REBUILD
+from lifeblocks.models.timeblock import TimeBlockState, PickReason, NOTES_SEARCH_DDL, NOTES_SEARCH_TABLE
+from lifeblocks.services.rollup_service import RollupService
+from lifeblocks.utils.json_stream import JSONObjectStream
 
 class DataService:
-    CURRENT_VERSION = "1.14"
+    CURRENT_VERSION = "1.20"
 
     def __init__(self, session: Session):
         self.session = session
@@ -88,6 +94,42 @@ class DataService:
                     "ADD COLUMN active BOOLEAN DEFAULT TRUE"
                 ))
 
+            if 'snoozed_until' not in block_columns:
+                # Add snoozed_until column and its index
+                connection.execute(DDL(
+                    f"ALTER TABLE {Block.__tablename__} "
+                    "ADD COLUMN snoozed_until TIMESTAMP NULL"
+                ))
+
+            if 'stride_pass' not in block_columns:
+                # Add stride_pass column
+                connection.execute(DDL(
+                    f"ALTER TABLE {Block.__tablename__} "
+                    "ADD COLUMN stride_pass FLOAT NULL"
+                ))
+
+            if not inspector.has_table(BlockAncestry.__tablename__):
+                # Block ancestry (with its triggers); filled from the parent links below
+                BlockAncestry.__table__.create(connection)
+
+            # Create any index declared on the models that the database lacks
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(connection, checkfirst=True)
+            if connection.dialect.name == "sqlite":
+                if not inspector.has_table(NOTES_SEARCH_TABLE):
+                    # Notes search index and its sync triggers, filled from existing history
+                    for statement in NOTES_SEARCH_DDL:
+                        connection.execute(DDL(statement))
+                    connection.execute(DDL(
+                        f"INSERT INTO {NOTES_SEARCH_TABLE}({NOTES_SEARCH_TABLE}) VALUES ('rebuild')"
+                    ))
+                if self._version_tuple(settings.value if settings else "1.0") < (1, 19):
+                    for statement in ANCESTRY_REBUILD:
+                        connection.execute(DDL(statement))
+                # Refresh planner statistics for the new indexes
+                connection.execute(DDL("PRAGMA optimize"))
+
         # Now update data in a new transaction
         if 'state' not in timeblock_columns:
             self.session.query(TimeBlock).update(
@@ -106,6 +148,13 @@ class DataService:
                 {"active": True},
                 synchronize_session=False
             )
+
+        if 'snoozed_until' not in block_columns:
+            self._backfill_snoozed_until()
+
+        if self._version_tuple(settings.value if settings else "1.0") < (1, 17):
+            # The daily_rollup table is new; fill it from existing history
+            RollupService.for_session(self.session).rebuild()
         
         # Update schema version
         if settings:
@@ -115,120 +164,244 @@ class DataService:
         
         self.session.commit()
 
+    # Columns read for each exported record
+    BLOCK_EXPORT_COLUMNS = (
+        Block.id,
+        Block.name,
+        Block.weight,
+        Block.parent_id,
+        Block.max_interval_hours,
+        Block.length_multiplier,
+        Block.min_duration_minutes,
+        Block.last_picked,
+        Block.active,
+        Block.snoozed_until,
+        Block.stride_pass,
+    )
+    TIMEBLOCK_EXPORT_COLUMNS = (
+        TimeBlock.id,
+        TimeBlock.block_id,
+        TimeBlock.start_time,
+        TimeBlock.duration_minutes,
+        TimeBlock.resistance_level,
+        TimeBlock.satisfaction_level,
+        TimeBlock.pause_duration_minutes,
+        TimeBlock.notes,
+        TimeBlock.deleted,
+        TimeBlock.deleted_at,
+        TimeBlock.state,
+        TimeBlock.pause_start,
+        TimeBlock.forced,
+        TimeBlock.delay_hours,
+    )
+    SETTINGS_EXPORT_COLUMNS = (Settings.key, Settings.value)
+
+    @staticmethod
+    def _block_record(block) -> Dict[str, Any]:
+        return {
+            "id": block.id,
+            "name": block.name,
+            "weight": block.weight,
+            "parent_id": block.parent_id,
+            "max_interval_hours": block.max_interval_hours,
+            "length_multiplier": block.length_multiplier,
+            "min_duration_minutes": block.min_duration_minutes,
+            "last_picked": block.last_picked.isoformat()
+            if block.last_picked
+            else None,
+            "active": block.active,
+            "snoozed_until": block.snoozed_until.isoformat()
+            if block.snoozed_until
+            else None,
+            "stride_pass": block.stride_pass,
+        }
+
+    @staticmethod
+    def _timeblock_record(tb) -> Dict[str, Any]:
+        return {
+            "id": tb.id,
+            "block_id": tb.block_id,
+            "start_time": tb.start_time.isoformat(),
+            "duration_minutes": tb.duration_minutes,
+            "resistance_level": tb.resistance_level,
+            "satisfaction_level": tb.satisfaction_level,
+            "pause_duration_minutes": tb.pause_duration_minutes,
+            "notes": tb.notes,
+            "deleted": tb.deleted,
+            "deleted_at": tb.deleted_at.isoformat() if tb.deleted_at else None,
+            "state": tb.state.value if tb.state else TimeBlockState.COMPLETED.value,
+            "pause_start": tb.pause_start.isoformat() if tb.pause_start else None,
+            "forced": tb.forced,
+            "delay_hours": tb.delay_hours,
+        }
+
+    @staticmethod
+    def _settings_record(setting) -> Dict[str, Any]:
+        return {"key": setting.key, "value": setting.value}
+
+    def _export_sections(self, batch_size: int = 1000):
+        """Yield (section name, record iterator) pairs, streaming rows from the database.
+
+        Rows are read as plain column tuples in batches, so nothing is
+        loaded into the session's identity map.
+        """
+        sections = (
+            ("blocks", self.BLOCK_EXPORT_COLUMNS, Block.id, self._block_record),
+            ("timeblocks", self.TIMEBLOCK_EXPORT_COLUMNS, TimeBlock.id, self._timeblock_record),
+            ("settings", self.SETTINGS_EXPORT_COLUMNS, Settings.id, self._settings_record),
+        )
+        for name, columns, order_column, to_record in sections:
+            rows = self.session.execute(
+                select(*columns).order_by(order_column).execution_options(yield_per=batch_size)
+            )
+            yield name, (to_record(row) for row in rows)
+
     def export_data(self) -> Dict[str, Any]:
         """Export database to a dictionary."""
-        blocks = self.session.query(Block).all()
-        timeblocks = self.session.query(TimeBlock).all()
-        settings = self.session.query(Settings).all()
+        data: Dict[str, Any] = {"version": self.CURRENT_VERSION}
+        for name, records in self._export_sections():
+            data[name] = list(records)
+        return data
+
+    def export_to_stream(self, stream: TextIO, batch_size: int = 1000) -> Dict[str, int]:
+        """Write the database as JSON to a text stream, one record per line.
+
+        Memory use stays flat regardless of history size. The output is the
+        same document export_data produces. Returns the record count per section.
+        """
+        counts = {}
+        stream.write("{\n")
+        stream.write(f'  "version": {json.dumps(self.CURRENT_VERSION)}')
+        for name, records in self._export_sections(batch_size):
+            stream.write(f',\n  "{name}": [')
+            count = 0
+            for record in records:
+                stream.write(",\n    " if count else "\n    ")
+                stream.write(json.dumps(record))
+                count += 1
+            stream.write("\n  ]" if count else "]")
+            counts[name] = count
+        stream.write("\n}\n")
+        return counts
+
+    # Sections in the order they are inserted, and the tables they fill
+    IMPORT_SECTIONS = ("blocks", "timeblocks", "settings")
+
+    @staticmethod
+    def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+        return datetime.fromisoformat(value) if value else None
 
+    @classmethod
+    def _block_row(cls, block_data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
         return {
-            "version": self.CURRENT_VERSION,
-            "blocks": [
-                {
-                    "id": block.id,
-                    "name": block.name,
-                    "weight": block.weight,
-                    "parent_id": block.parent_id,
-                    "max_interval_hours": block.max_interval_hours,
-                    "length_multiplier": block.length_multiplier,
-                    "min_duration_minutes": block.min_duration_minutes,
-                    "last_picked": block.last_picked.isoformat()
-                    if block.last_picked
-                    else None,
-                    "active": block.active,
-                }
-                for block in blocks
-            ],
-            "timeblocks": [
-                {
-                    "id": tb.id,
-                    "block_id": tb.block_id,
-                    "start_time": tb.start_time.isoformat(),
-                    "duration_minutes": tb.duration_minutes,
-                    "resistance_level": tb.resistance_level,
-                    "satisfaction_level": tb.satisfaction_level,
-                    "pause_duration_minutes": tb.pause_duration_minutes,
-                    "notes": tb.notes,
-                    "deleted": tb.deleted,
-                    "deleted_at": tb.deleted_at.isoformat() if tb.deleted_at else None,
-                    "state": tb.state.value if tb.state else TimeBlockState.COMPLETED.value,
-                    "pause_start": tb.pause_start.isoformat() if tb.pause_start else None,
-                    "forced": tb.forced,
-                    "delay_hours": tb.delay_hours,
-                }
-                for tb in timeblocks
-            ],
-            "settings": [
-                {"key": setting.key, "value": setting.value} for setting in settings
-            ],
+            "id": block_data["id"],  # Preserve original IDs
+            "name": block_data["name"],
+            "weight": block_data["weight"],
+            "parent_id": block_data["parent_id"],
+            "max_interval_hours": block_data.get("max_interval_hours"),
+            "length_multiplier": block_data.get("length_multiplier", 1.0),
+            "min_duration_minutes": block_data.get("min_duration_minutes"),
+            "active": block_data.get("active", True),
+            "created_at": now,
+            "last_picked": cls._parse_datetime(block_data.get("last_picked")),
+            "snoozed_until": cls._parse_datetime(block_data.get("snoozed_until")),
+            "stride_pass": block_data.get("stride_pass"),
         }
 
-    def import_data(self, data: Dict[str, Any]) -> List[str]:
-        """Import data into the database with version checking and migration support."""
-        messages = []
+    @classmethod
+    def _timeblock_row(cls, timeblock_data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        return {
+            "id": timeblock_data["id"],  # Preserve original IDs
+            "block_id": timeblock_data["block_id"],
+            "start_time": datetime.fromisoformat(timeblock_data["start_time"]),
+            "duration_minutes": timeblock_data["duration_minutes"],
+            "resistance_level": timeblock_data.get("resistance_level"),
+            "satisfaction_level": timeblock_data.get("satisfaction_level"),
+            "pause_duration_minutes": timeblock_data.get("pause_duration_minutes", 0.0),
+            "notes": timeblock_data.get("notes"),
+            "deleted": timeblock_data.get("deleted", False),
+            "deleted_at": cls._parse_datetime(timeblock_data.get("deleted_at")),
+            "state": TimeBlockState(timeblock_data.get("state", "completed")),
+            "pause_start": cls._parse_datetime(timeblock_data.get("pause_start")),
+            "forced": timeblock_data.get("forced", False),
+            "pick_reason": PickReason.NORMAL,
+            "delay_hours": timeblock_data.get("delay_hours"),
+        }
 
-        # Version check
-        version = data.get("version", "1.0")  # Default to 1.0 for old exports
-        if version != self.CURRENT_VERSION:
-            messages.append(
-                f"Warning: Importing data from version {version} into version {self.CURRENT_VERSION}"
-            )
-            data = self._migrate_data(data, version)
+    @staticmethod
+    def _settings_row(setting_data: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        return {"key": setting_data["key"], "value": setting_data["value"]}
+
+    def _import_sections(
+        self,
+        sections: Iterable[Tuple[str, Any]],
+        chunk_size: int = 5000,
+        progress: Optional[Callable[[str, int, float], None]] = None,
+    ) -> List[str]:
+        """Replace the database contents with the given (section name, records) pairs.
+
+        Records are converted and inserted with Core executemany in chunks
+        of ``chunk_size``, so neither the input nor the ORM identity map has
+        to hold the whole import. Everything runs in a savepoint: a bad
+        record anywhere leaves the existing data untouched. ``progress`` is
+        called after each chunk with (section, rows so far, rows/sec).
+        """
+        messages = []
+        targets = {
+            "blocks": (Block.__table__, self._block_row),
+            "timeblocks": (TimeBlock.__table__, self._timeblock_row),
+            "settings": (Settings.__table__, self._settings_row),
+        }
+        now = datetime.now()
+        counts: Dict[str, int] = {}
+        started = time.perf_counter()
 
         try:
-            # Clear existing data
-            self.session.query(TimeBlock).delete()
-            self.session.query(Block).delete()
-            self.session.query(Settings).delete()
-
-            # Import blocks first (they're referenced by timeblocks)
-            for block_data in data["blocks"]:
-                block = Block(
-                    name=block_data["name"],
-                    weight=block_data["weight"],
-                    parent_id=block_data["parent_id"],
-                    max_interval_hours=block_data.get("max_interval_hours"),
-                    length_multiplier=block_data.get("length_multiplier", 1.0),
-                    min_duration_minutes=block_data.get("min_duration_minutes"),
-                    active=block_data.get("active", True),
-                )
-                block.id = block_data["id"]  # Preserve original IDs
-                if block_data.get("last_picked"):
-                    block.last_picked = datetime.fromisoformat(block_data["last_picked"])
-                self.session.add(block)
-
-            # Import timeblocks
-            for timeblock_data in data["timeblocks"]:
-                timeblock = TimeBlock(
-                    block_id=timeblock_data["block_id"],
-                    start_time=datetime.fromisoformat(timeblock_data["start_time"]),
-                    duration_minutes=timeblock_data["duration_minutes"],
-                    resistance_level=timeblock_data.get("resistance_level"),
-                    satisfaction_level=timeblock_data.get("satisfaction_level"),
-                    pause_duration_minutes=timeblock_data.get("pause_duration_minutes", 0.0),
-                    notes=timeblock_data.get("notes"),
-                    state=TimeBlockState(timeblock_data.get("state", "completed")),
-                    pause_start=datetime.fromisoformat(timeblock_data["pause_start"])
-                        if timeblock_data.get("pause_start")
-                        else None,
-                    forced=timeblock_data.get("forced", False),
-                    delay_hours=timeblock_data.get("delay_hours"),
-                )
-                timeblock.id = timeblock_data["id"]  # Preserve original IDs
-                timeblock.deleted = timeblock_data.get("deleted", False)
-                if timeblock_data.get("deleted_at"):
-                    timeblock.deleted_at = datetime.fromisoformat(
-                        timeblock_data["deleted_at"]
-                    )
-                self.session.add(timeblock)
-
-            # Import settings
-            for setting_data in data["settings"]:
-                setting = Settings(key=setting_data["key"], value=setting_data["value"])
-                self.session.add(setting)
+            with self.session.begin_nested():
+                # Clear existing data (bulk deletes also reset the block index and settings cache)
+                self.session.query(TimeBlock).delete()
+                self.session.query(Block).delete()
+                self.session.query(Settings).delete()
+
+                for name, records in sections:
+                    if name not in targets:
+                        continue
+                    table, to_row = targets[name]
+                    section_started = time.perf_counter()
+                    count = 0
+                    chunk = []
+                    for record in records:
+                        chunk.append(to_row(record, now))
+                        if len(chunk) >= chunk_size:
+                            self.session.execute(insert(table), chunk)
+                            count += len(chunk)
+                            chunk = []
+                            if progress:
+                                progress(name, count, self._rate(count, section_started))
+                    if chunk:
+                        self.session.execute(insert(table), chunk)
+                        count += len(chunk)
+                        if progress:
+                            progress(name, count, self._rate(count, section_started))
+                    counts[name] = count
+
+                missing = [name for name in self.IMPORT_SECTIONS if name not in counts]
+                if missing:
+                    raise KeyError(", ".join(missing))
+
+                # History was written with Core inserts, so derive the rollup in one pass
+                RollupService.for_session(self.session).rebuild()
+                # Blocks may have come in before their parents; derive their ancestry afresh
+                for statement in ANCESTRY_REBUILD:
+                    self.session.execute(text(statement))
 
             self.session.commit()
+            total = sum(counts.values())
             messages.append("Import completed successfully")
+            messages.append(
+                f"Imported {total} rows in {time.perf_counter() - started:.2f}s "
+                f"({self._rate(total, started):.0f} rows/sec)"
+            )
 
         except Exception as e:
             self.session.rollback()
@@ -236,6 +409,32 @@ class DataService:
 
         return messages
 
+    @staticmethod
+    def _rate(count: int, started: float) -> float:
+        elapsed = time.perf_counter() - started
+        return count / elapsed if elapsed > 0 else float(count)
+
+    def import_data(
+        self,
+        data: Dict[str, Any],
+        chunk_size: int = 5000,
+        progress: Optional[Callable[[str, int, float], None]] = None,
+    ) -> List[str]:
+        """Import data into the database with version checking and migration support."""
+        messages = []
+
+        # Version check
+        version = data.get("version", "1.0")  # Default to 1.0 for old exports
+        if version != self.CURRENT_VERSION:
+            messages.append(
+                f"Warning: Importing data from version {version} into version {self.CURRENT_VERSION}"
+            )
+            data = self._migrate_data(data, version)
+
+        sections = [(name, data[name]) for name in self.IMPORT_SECTIONS if name in data]
+        messages.extend(self._import_sections(sections, chunk_size, progress))
+        return messages
+
     def _migrate_data(self, data: Dict[str, Any], from_version: str) -> Dict[str, Any]:
         """Handle data migration between versions.
         This method should be expanded as new versions are created."""
@@ -245,19 +444,86 @@ class DataService:
         #     for block in data.get("blocks", []):
         #         if "active" not in block:
         #             block["active"] = True
-                    
+
+        # Derive snoozed_until from each block's most recent delay before version 1.15
+        if self._version_tuple(from_version) < (1, 15):
+            latest_delays = {}
+            for timeblock in data.get("timeblocks", []):
+                if timeblock.get("state") != TimeBlockState.DELAYED.value:
+                    continue
+                start_time = datetime.fromisoformat(timeblock["start_time"])
+                latest = latest_delays.get(timeblock["block_id"])
+                if latest is None or start_time >= latest[0]:
+                    latest_delays[timeblock["block_id"]] = (start_time, timeblock.get("delay_hours"))
+            for block in data.get("blocks", []):
+                if block["id"] in latest_delays and not block.get("snoozed_until"):
+                    start_time, delay_hours = latest_delays[block["id"]]
+                    block["snoozed_until"] = (start_time + timedelta(hours=delay_hours or 4)).isoformat()
+
         # Update version to current
         data["version"] = self.CURRENT_VERSION
         return data
 
-    def export_to_file(self, filepath: str) -> None:
-        """Export database to a JSON file."""
-        data = self.export_data()
-        with open(filepath, "w") as f:
-            json.dump(data, f, indent=2)
+    @staticmethod
+    def _version_tuple(version: str):
+        try:
+            return tuple(int(part) for part in version.split("."))
+        except ValueError:
+            return (0,)
+
+    def _backfill_snoozed_until(self):
+        """Set each block's snoozed_until from its most recent delay in history."""
+        latest_delays = {}
+        delays = (
+            self.session.query(TimeBlock.block_id, TimeBlock.start_time, TimeBlock.delay_hours)
+            .filter(TimeBlock.state == TimeBlockState.DELAYED)
+            .order_by(TimeBlock.start_time)
+        )
+        for block_id, start_time, delay_hours in delays:
+            latest_delays[block_id] = start_time + timedelta(hours=delay_hours or 4)
+
+        for block_id, snoozed_until in latest_delays.items():
+            self.session.query(Block).filter(Block.id == block_id).update(
+                {"snoozed_until": snoozed_until},
+                synchronize_session=False
+            )
+
+    @staticmethod
+    def _open_export(filepath: str, mode: str, compress: Optional[bool] = None):
+        """Open an export file, gzipped when asked to or when the name ends in .gz."""
+        if compress is None:
+            compress = filepath.endswith(".gz")
+        if compress:
+            return gzip.open(filepath, mode + "t", encoding="utf-8")
+        return open(filepath, mode, encoding="utf-8")
+
+    def export_to_file(self, filepath: str, compress: Optional[bool] = None) -> Dict[str, int]:
+        """Export database to a JSON file, optionally gzip-compressed.
+
+        A filepath of "-" writes to standard output.
+        """
+        if filepath == "-":
+            return self.export_to_stream(sys.stdout)
+        with self._open_export(filepath, "w", compress) as f:
+            return self.export_to_stream(f)
+
+    def import_from_file(
+        self,
+        filepath: str,
+        chunk_size: int = 5000,
+        progress: Optional[Callable[[str, int, float], None]] = None,
+    ) -> List[str]:
+        """Import database from a JSON file (gzip-compressed if it ends in .gz).
+
+        Exports from the current version are streamed record by record;
+        older ones are loaded whole so they can be migrated first.
+        """
+        with self._open_export(filepath, "r") as f:
+            members = JSONObjectStream(f).items()
+            key, version = next(members, (None, None))
+            if key == "version" and version == self.CURRENT_VERSION:
+                return self._import_sections(members, chunk_size, progress)
 
-    def import_from_file(self, filepath: str) -> List[str]:
-        """Import database from a JSON file."""
-        with open(filepath, "r") as f:
+        with self._open_export(filepath, "r") as f:
             data = json.load(f)
-        return self.import_data(data)
+        return self.import_data(data, chunk_size, progress)
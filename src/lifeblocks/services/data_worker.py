@@ -0,0 +1,102 @@
+import queue
+import threading
+from typing import Any, Callable, Optional
+
+# A unit of work: called on the worker thread with a fresh session
+Job = Callable[[Any], Any]
+
+
+class DataWorker:
+    """Runs database work off the Tk thread.
+
+    Jobs are queued to a single background thread. Each job gets its own
+    short-lived session from ``session_factory`` (so its own pooled
+    connection), inside a transaction that is committed when the job
+    returns and rolled back if it raises. The outcome is put on a
+    thread-safe queue; ``attach`` polls that queue from the Tk mainloop
+    with ``after``, only while jobs are outstanding, and invokes the
+    callbacks there, so callbacks may touch widgets freely.
+
+    Jobs should return plain values (rows, tuples, counts) rather than ORM
+    instances, which are detached once the job's session closes. The
+    factory must hand out sessions on a database that several connections
+    can share, i.e. not an in-memory SQLite database.
+    """
+
+    POLL_INTERVAL_MS = 50
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._jobs: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        # Submitted jobs whose callbacks have not run yet
+        self._outstanding = 0
+        self._widget = None
+        self._poll_job = None
+        self._thread = threading.Thread(target=self._run, name="lifeblocks-data", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        job: Job,
+        on_done: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ):
+        """Queue a job; on_done(result) or on_error(exception) runs on the polling thread."""
+        self._outstanding += 1
+        self._jobs.put((job, on_done, on_error))
+        self._arm()
+
+    def _run(self):
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                return
+            job, on_done, on_error = item
+            try:
+                with self.session_factory() as session, session.begin():
+                    result = job(session)
+            except Exception as e:
+                self._results.put((on_error, e))
+            else:
+                self._results.put((on_done, result))
+
+    def process_results(self) -> int:
+        """Invoke the callbacks of every finished job; returns how many ran."""
+        count = 0
+        while True:
+            try:
+                callback, value = self._results.get_nowait()
+            except queue.Empty:
+                return count
+            self._outstanding -= 1
+            if callback:
+                callback(value)
+            count += 1
+
+    def attach(self, widget):
+        """Deliver results on the Tk mainloop by polling from ``widget``.
+
+        Submit jobs from that mainloop too: polling is armed on submit and
+        stops once every submitted job has been delivered, so an idle
+        worker costs no wakeups.
+        """
+        self._widget = widget
+        self._arm()
+
+    def _arm(self):
+        if self._widget is not None and self._poll_job is None and self._outstanding:
+            self._poll_job = self._widget.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        self._poll_job = None
+        try:
+            self.process_results()
+        finally:
+            # Rearm even if a callback failed, so later results are still delivered
+            self._arm()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Finish the queued jobs and end the worker thread."""
+        self._jobs.put(None)
+        self._thread.join(timeout)
@@ -0,0 +1,241 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import column, func, literal_column, table, tuple_
+from sqlalchemy.engine import Row
+from lifeblocks.models import TimeBlock, Block
+from lifeblocks.models.timeblock import TimeBlockState, NOTES_SEARCH_TABLE
+from lifeblocks.services.rollup_service import RollupService
+from lifeblocks.utils.clock import SYSTEM_CLOCK
+
+# Position in the history ordering: the (start_time, id) of the last row read
+Cursor = Tuple[datetime, int]
+
+
+class HistoryService:
+    """Reads the history list one page at a time.
+
+    Rows come newest first, ordered by ``(start_time, id)`` so ties on
+    ``start_time`` still have a stable order. Each page continues after
+    the last row of the previous one (keyset pagination), which walks the
+    ``(deleted, start_time)`` index instead of counting skipped rows the
+    way OFFSET would, so page 100 costs the same as page 1.
+
+    Pages are plain rows holding only what the list displays, read with a
+    single joined SELECT: no TimeBlock entities, no lazy loads of the
+    block for its name, and only a preview of the notes.
+    """
+
+    PAGE_SIZE = 200
+
+    TIME_FILTERS = ["Today", "Yesterday", "Last 7 Days", "Last 30 Days", "All Time"]
+    CURRENT_AND_COMPLETED = "Current & Completed"
+    ALL_STATES = "All States"
+    # States hidden by the "Current & Completed" filter
+    EXCLUDED_STATES = [
+        TimeBlockState.ABANDONED,
+        TimeBlockState.EXPIRED,
+        TimeBlockState.CANCELLED_ON_COMPLETE,
+        TimeBlockState.RESTARTED,
+        TimeBlockState.DELAYED,
+    ]
+
+    # Characters of notes sent to the list; the edit dialog loads the full text
+    NOTES_PREVIEW_LENGTH = 120
+    # Markers around matched words in search snippets, and snippet length in words
+    SEARCH_HIGHLIGHT = ("[", "]")
+    SEARCH_SNIPPET_TOKENS = 12
+
+    # Columns of a history list row
+    ROW_COLUMNS = (
+        TimeBlock.id,
+        Block.name.label("block_name"),
+        TimeBlock.start_time,
+        TimeBlock.duration_minutes,
+        TimeBlock.pause_duration_minutes,
+        TimeBlock.resistance_level,
+        TimeBlock.satisfaction_level,
+        func.substr(TimeBlock.notes, 1, NOTES_PREVIEW_LENGTH).label("notes"),
+        TimeBlock.state,
+    )
+
+    def __init__(self, session, clock=None):
+        self.session = session
+        self.clock = clock or SYSTEM_CLOCK
+        # Edits to history rows flow into the daily rollup
+        self.rollup_service = RollupService.for_session(session)
+
+    @staticmethod
+    def time_range(filter_value: str, now: datetime) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """The [start, end) window for a time filter as of ``now``; None means unbounded."""
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if filter_value == "Today":
+            return midnight, None
+        if filter_value == "Yesterday":
+            return midnight - timedelta(days=1), midnight
+        if filter_value == "Last 7 Days":
+            return now - timedelta(days=7), None
+        if filter_value == "Last 30 Days":
+            return now - timedelta(days=30), None
+        return None, None  # All Time
+
+    def _filtered_query(self, filter_value: str, state_value: str, now: Optional[datetime] = None, columns=None):
+        query = (
+            self.session.query(*(columns or self.ROW_COLUMNS))
+            .join(Block, TimeBlock.block_id == Block.id)
+            .filter(TimeBlock.deleted.is_(False))
+        )
+
+        # Add state filter
+        if state_value == self.CURRENT_AND_COMPLETED:
+            query = query.filter(~TimeBlock.state.in_(self.EXCLUDED_STATES))
+        elif state_value != self.ALL_STATES:
+            query = query.filter(TimeBlock.state == TimeBlockState(state_value))
+
+        start_date, end_date = self.time_range(filter_value, now or self.clock.now())
+        if start_date is not None:
+            query = query.filter(TimeBlock.start_time >= start_date)
+        else:
+            query = query.filter(TimeBlock.start_time.isnot(None))
+        if end_date is not None:
+            query = query.filter(TimeBlock.start_time < end_date)
+        return query
+
+    def fetch_page(
+        self,
+        filter_value: str,
+        state_value: str,
+        after: Optional[Cursor] = None,
+        limit: Optional[int] = None,
+        now: Optional[datetime] = None,
+        before: Optional[Cursor] = None,
+    ) -> Tuple[List[Row], Optional[Cursor]]:
+        """Fetch the next page of history rows, newest first.
+
+        Rows are named tuples with the ROW_COLUMNS fields (block_name for
+        the block, notes cut to NOTES_PREVIEW_LENGTH). Returns them with
+        the cursor to pass as ``after`` for the page that follows, or None
+        when there are no more rows.
+
+        With ``before`` (the cursor of a row), fetches the page just newer
+        than that row instead, still newest first, for a view scrolling
+        back up. The cursor returned then is the ``after`` that would
+        fetch this same page, or None when it starts at the newest row.
+        """
+        limit = limit or self.PAGE_SIZE
+        query = self._filtered_query(filter_value, state_value, now)
+        if before is not None:
+            # Oldest first from the row up; the extra row is the one just above the page
+            rows = (
+                query.filter(tuple_(TimeBlock.start_time, TimeBlock.id) > tuple_(*before))
+                .order_by(TimeBlock.start_time, TimeBlock.id)
+                .limit(limit + 1)
+                .all()
+            )
+            above = rows[limit] if len(rows) > limit else None
+            rows = rows[:limit][::-1]
+            return rows, (above.start_time, above.id) if above is not None else None
+        if after is not None:
+            query = query.filter(tuple_(TimeBlock.start_time, TimeBlock.id) < tuple_(*after))
+
+        # Read one extra row to learn whether another page exists
+        rows = (
+            query.order_by(TimeBlock.start_time.desc(), TimeBlock.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1].start_time, rows[-1].id)
+
+    def delete_timeblocks(self, timeblock_ids: Iterable[int], now: Optional[datetime] = None) -> int:
+        """Soft-delete history rows by id and commit; returns how many were deleted.
+
+        The rows are marked in one UPDATE, and ``last_picked`` of every
+        affected block is reset to its most recent remaining row with one
+        grouped query, all in the same transaction.
+        """
+        timeblock_ids = list(timeblock_ids)
+        if not timeblock_ids:
+            return 0
+        now = now or self.clock.now()
+
+        try:
+            block_ids = [
+                block_id
+                for (block_id,) in self.session.query(TimeBlock.block_id)
+                .filter(TimeBlock.id.in_(timeblock_ids), TimeBlock.deleted.is_(False))
+                .distinct()
+            ]
+            # The bulk UPDATE bypasses flush events, so take the rows out of the rollup first
+            self.rollup_service.discount_timeblocks(timeblock_ids)
+            count = (
+                self.session.query(TimeBlock)
+                .filter(TimeBlock.id.in_(timeblock_ids), TimeBlock.deleted.is_(False))
+                .update({"deleted": True, "deleted_at": now}, synchronize_session="fetch")
+            )
+
+            latest = dict(
+                self.session.query(TimeBlock.block_id, func.max(TimeBlock.start_time))
+                .filter(TimeBlock.block_id.in_(block_ids), TimeBlock.deleted.is_(False))
+                .group_by(TimeBlock.block_id)
+            )
+            # Through the ORM so the block index updates the few changed entries in place
+            for block in self.session.query(Block).filter(Block.id.in_(block_ids)):
+                block.last_picked = latest.get(block.id)
+
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return count
+
+    @staticmethod
+    def notes_match_query(text: str) -> str:
+        """Turn free text into an FTS5 query: every word must appear, as a prefix.
+
+        Words are quoted, so punctuation and FTS operators typed by the
+        user are searched for literally instead of raising syntax errors.
+        """
+        words = text.split()
+        return " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+
+    def search_notes(
+        self,
+        text: str,
+        filter_value: str = "All Time",
+        state_value: str = ALL_STATES,
+        after: Optional[int] = None,
+        limit: Optional[int] = None,
+        now: Optional[datetime] = None,
+    ) -> Tuple[List[Row], Optional[int]]:
+        """Find history rows whose notes contain every word of ``text``, best matches first.
+
+        Uses the notes full-text index (BM25 ranking) and honours the same
+        time and state filters as fetch_page. Rows have the ROW_COLUMNS
+        fields, with ``notes`` replaced by a snippet around the matches,
+        which are wrapped in SEARCH_HIGHLIGHT. Pages are by offset: the
+        returned cursor is the offset of the next page, or None.
+        """
+        match = self.notes_match_query(text)
+        if not match:
+            return [], None
+        limit = limit or self.PAGE_SIZE
+        offset = after or 0
+
+        snippet = func.snippet(
+            literal_column(NOTES_SEARCH_TABLE), 0, *self.SEARCH_HIGHLIGHT, "…", self.SEARCH_SNIPPET_TOKENS
+        ).label("notes")
+        columns = [snippet if column.key == "notes" else column for column in self.ROW_COLUMNS]
+        notes_index = table(NOTES_SEARCH_TABLE, column("rowid"), column("rank"))
+
+        query = (
+            self._filtered_query(filter_value, state_value, now, columns=columns)
+            .join(notes_index, notes_index.c.rowid == TimeBlock.id)
+            .filter(literal_column(NOTES_SEARCH_TABLE).op("MATCH")(match))
+        )
+        # Read one extra row to learn whether another page exists
+        rows = query.order_by(notes_index.c.rank, TimeBlock.id).offset(offset).limit(limit + 1).all()
+        if len(rows) <= limit:
+            return rows, None
+        return rows[:limit], offset + limit
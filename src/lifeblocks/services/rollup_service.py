@@ -0,0 +1,210 @@
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, event, func, inspect, insert, select, update
+from lifeblocks.models import DailyRollup, TimeBlock
+from lifeblocks.models.timeblock import TimeBlockState
+
+# Rollup columns, in the order of a contribution vector
+ROLLUP_FIELDS = (
+    "completed_minutes",
+    "pause_minutes",
+    "session_count",
+    "resistance_sum",
+    "resistance_count",
+    "satisfaction_sum",
+    "satisfaction_count",
+)
+SESSION_COUNT = ROLLUP_FIELDS.index("session_count")
+
+# History columns that decide what a row contributes
+SOURCE_COLUMNS = (
+    "block_id",
+    "start_time",
+    "duration_minutes",
+    "pause_duration_minutes",
+    "resistance_level",
+    "satisfaction_level",
+    "state",
+    "deleted",
+)
+
+RollupKey = Tuple[int, date]
+
+
+def contribution(values) -> Optional[Tuple[RollupKey, Tuple]]:
+    """The rollup key and field values a history row adds, or None if it isn't counted."""
+    if (
+        values.get("state") != TimeBlockState.COMPLETED
+        or values.get("deleted")
+        or values.get("block_id") is None
+        or values.get("start_time") is None
+    ):
+        return None
+    resistance = values.get("resistance_level")
+    satisfaction = values.get("satisfaction_level")
+    return (values["block_id"], values["start_time"].date()), (
+        values.get("duration_minutes") or 0.0,
+        values.get("pause_duration_minutes") or 0.0,
+        1,
+        resistance or 0,
+        int(resistance is not None),
+        satisfaction or 0,
+        int(satisfaction is not None),
+    )
+
+
+class RollupService:
+    """Keeps ``daily_rollup`` in step with ``history``.
+
+    Installed once per session (use ``for_session``). Before each flush
+    the committed state of every touched TimeBlock is read in one query,
+    its old contribution is subtracted and the new one added; the net
+    change per (block, day) is written after the flush, in the same
+    transaction. Bulk statements bypass flush events, so callers issuing
+    them use ``discount_timeblocks`` (bulk soft delete) or ``rebuild``
+    (import) instead.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self._pending: Optional[Dict[RollupKey, List[float]]] = None
+
+        event.listen(session, "before_flush", self._before_flush)
+        event.listen(session, "after_flush", self._after_flush)
+        event.listen(session, "after_soft_rollback", self._after_soft_rollback)
+
+    @classmethod
+    def for_session(cls, session) -> "RollupService":
+        """The session's RollupService, installing it on first use."""
+        service = session.info.get("rollup_service")
+        if service is None:
+            service = session.info["rollup_service"] = cls(session)
+        return service
+
+    @staticmethod
+    def _add(deltas, entry, sign):
+        if entry is None:
+            return
+        key, values = entry
+        delta = deltas[key]
+        for i, value in enumerate(values):
+            delta[i] += sign * value
+
+    def _before_flush(self, session, flush_context, instances):
+        created = [obj for obj in session.new if isinstance(obj, TimeBlock)]
+        removed = [obj for obj in session.deleted if isinstance(obj, TimeBlock)]
+        changed = [
+            obj
+            for obj in session.dirty
+            if isinstance(obj, TimeBlock)
+            and any(inspect(obj).attrs[name].history.has_changes() for name in SOURCE_COLUMNS)
+        ]
+        if not (created or removed or changed):
+            return
+
+        # What the database holds for the rows being changed, read before the flush overwrites it
+        ids = [inspect(obj).identity[0] for obj in removed + changed]
+        old_rows = {}
+        if ids:
+            columns = [getattr(TimeBlock, name) for name in SOURCE_COLUMNS]
+            rows = session.connection().execute(
+                select(TimeBlock.id, *columns).where(TimeBlock.id.in_(ids))
+            )
+            old_rows = {row.id: dict(row._mapping) for row in rows}
+
+        deltas = self._pending if self._pending is not None else defaultdict(lambda: [0] * len(ROLLUP_FIELDS))
+        for obj in removed:
+            self._add(deltas, contribution(old_rows.get(inspect(obj).identity[0], {})), -1)
+        for obj in changed + created:
+            state = inspect(obj)
+            old = old_rows.get(state.identity[0], {}) if state.identity else {}
+            self._add(deltas, contribution(old), -1)
+            values = dict(old)
+            values.update((name, state.dict[name]) for name in SOURCE_COLUMNS if name in state.dict)
+            self._add(deltas, contribution(values), 1)
+        self._pending = deltas
+
+    def _after_flush(self, session, flush_context):
+        if self._pending is not None:
+            deltas, self._pending = self._pending, None
+            self._apply(deltas)
+
+    def _after_soft_rollback(self, session, previous_transaction):
+        self._pending = None
+
+    def _apply(self, deltas: Dict[RollupKey, List[float]]):
+        connection = self.session.connection()
+        for (block_id, day), delta in deltas.items():
+            if not any(delta):
+                continue
+            where = (DailyRollup.block_id == block_id, DailyRollup.date == day)
+            result = connection.execute(
+                update(DailyRollup)
+                .where(*where)
+                .values({name: getattr(DailyRollup, name) + value for name, value in zip(ROLLUP_FIELDS, delta)})
+            )
+            if result.rowcount == 0:
+                if delta[SESSION_COUNT] > 0:
+                    connection.execute(
+                        insert(DailyRollup).values(block_id=block_id, date=day, **dict(zip(ROLLUP_FIELDS, delta)))
+                    )
+            elif delta[SESSION_COUNT] < 0:
+                connection.execute(delete(DailyRollup).where(*where, DailyRollup.session_count <= 0))
+
+    def _grouped_history(self, *criteria):
+        """SELECT of rollup rows computed straight from history."""
+        day = func.date(TimeBlock.start_time)
+        return (
+            select(
+                TimeBlock.block_id,
+                day,
+                func.sum(func.coalesce(TimeBlock.duration_minutes, 0.0)),
+                func.sum(func.coalesce(TimeBlock.pause_duration_minutes, 0.0)),
+                func.count(),
+                func.sum(func.coalesce(TimeBlock.resistance_level, 0)),
+                func.count(TimeBlock.resistance_level),
+                func.sum(func.coalesce(TimeBlock.satisfaction_level, 0)),
+                func.count(TimeBlock.satisfaction_level),
+            )
+            .where(
+                TimeBlock.state == TimeBlockState.COMPLETED,
+                TimeBlock.deleted.is_(False),
+                TimeBlock.block_id.isnot(None),
+                TimeBlock.start_time.isnot(None),
+                *criteria,
+            )
+            .group_by(TimeBlock.block_id, day)
+        )
+
+    def discount_timeblocks(self, timeblock_ids: Iterable[int]):
+        """Take rows out of the rollup ahead of a bulk soft delete."""
+        timeblock_ids = list(timeblock_ids)
+        if not timeblock_ids:
+            return
+        rows = self.session.execute(self._grouped_history(TimeBlock.id.in_(timeblock_ids)))
+        deltas = {
+            (block_id, date.fromisoformat(day)): [-value for value in values]
+            for block_id, day, *values in rows
+        }
+        self._apply(deltas)
+
+    def rebuild(self):
+        """Recompute the whole rollup from history (no commit)."""
+        connection = self.session.connection()
+        connection.execute(delete(DailyRollup))
+        connection.execute(
+            insert(DailyRollup).from_select(("block_id", "date") + ROLLUP_FIELDS, self._grouped_history())
+        )
+
+    def totals_by_block(self, start_date: Optional[date] = None, end_date: Optional[date] = None):
+        """Summed rollup fields per block over [start_date, end_date), keyed by block id."""
+        query = select(
+            DailyRollup.block_id,
+            *(func.sum(getattr(DailyRollup, name)).label(name) for name in ROLLUP_FIELDS),
+        ).group_by(DailyRollup.block_id)
+        if start_date is not None:
+            query = query.where(DailyRollup.date >= start_date)
+        if end_date is not None:
+            query = query.where(DailyRollup.date < end_date)
+        return {row.block_id: row for row in self.session.execute(query)}
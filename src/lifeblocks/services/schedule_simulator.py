@@ -0,0 +1,457 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+from sqlalchemy import select
+from lifeblocks.models.block import Block
+
+# Same attempt limit as BlockService._fill_fractional_queue
+MAX_FILL_ATTEMPTS = 10
+# Times a session's pick may be delayed before the session is skipped
+MAX_DELAYS_PER_SESSION = 5
+DAY_SECONDS = 24 * 3600.0
+
+
+class TreeSnapshot(NamedTuple):
+    """The block tree as plain, picklable arrays; entry i describes block ids[i].
+
+    Times are seconds relative to the simulation start, None where unset.
+    ``child_pools`` maps None (the roots) or a block's position to the
+    positions of its active children, as hierarchical selection sees them.
+    """
+
+    ids: List[int]
+    names: List[str]
+    weights: List[float]  # accumulated (product of ancestor) weights
+    lengths: List[float]
+    max_intervals: List[Optional[float]]
+    last_picked: List[Optional[float]]
+    created: List[float]
+    snoozed_until: List[Optional[float]]
+    stride_passes: List[Optional[float]]
+    leaf_pool: List[int]
+    child_pools: Dict[Optional[int], List[int]]
+    use_leaf_based: bool
+    use_stride: bool
+    stride_virtual_time: float
+    fill_fractional: bool
+    doubling_seconds: float
+
+
+class SimulatedDay(NamedTuple):
+    """How the simulated user works: back-to-back sessions in a daily window."""
+
+    session_minutes: float
+    day_start_hour: float = 9.0
+    hours_per_day: float = 8.0
+    # Chance the user delays an offered block instead of starting it
+    delay_probability: float = 0.0
+    delay_hours: float = 4.0
+
+
+@dataclass
+class BlockReport:
+    block_id: int
+    name: str
+    picks: int
+    worked_seconds: float
+    share: float
+    # Seconds between consecutive picks, pooled over all runs
+    gap_mean: Optional[float]
+    gap_p50: Optional[float]
+    gap_p90: Optional[float]
+    gap_p99: Optional[float]
+    gap_max: Optional[float]
+    max_interval_seconds: Optional[float]
+    violations: int
+    violation_seconds: float
+    longest_violation_seconds: float
+
+
+@dataclass
+class SimulationReport:
+    runs: int
+    days: int
+    simulated_seconds: float
+    worked_seconds: float
+    overdue_picks: int
+    normal_picks: int
+    skipped_sessions: int
+    blocks: Dict[int, BlockReport]
+
+
+def snapshot_tree(block_service, now: datetime) -> TreeSnapshot:
+    """Copy what selection needs out of a BlockService's index and settings."""
+    index = block_service.index
+    settings = block_service.settings_service
+    index.ensure_current()
+    ids = sorted(index.nodes)
+    position = {block_id: i for i, block_id in enumerate(ids)}
+    nodes = [index.nodes[block_id] for block_id in ids]
+    names = dict(block_service.session.execute(select(Block.id, Block.name)).all())
+
+    def seconds(moment):
+        return None if moment is None else (moment - now).total_seconds()
+
+    child_pools = {}
+    for parent_id in [None] + ids:
+        children = index.active_child_ids(parent_id)
+        if children:
+            child_pools[None if parent_id is None else position[parent_id]] = sorted(
+                position[child_id] for child_id in children
+            )
+
+    return TreeSnapshot(
+        ids=ids,
+        names=[names.get(block_id, str(block_id)) for block_id in ids],
+        weights=[float(node.accumulated_weight) for node in nodes],
+        lengths=[float(node.length_multiplier) for node in nodes],
+        max_intervals=[
+            None if node.max_interval_hours is None else node.max_interval_hours * 3600.0 for node in nodes
+        ],
+        last_picked=[seconds(node.last_picked) for node in nodes],
+        created=[seconds(node.created_at) or 0.0 for node in nodes],
+        snoozed_until=[seconds(node.snoozed_until) for node in nodes],
+        stride_passes=[node.stride_pass for node in nodes],
+        leaf_pool=sorted(position[block_id] for block_id in index.active_leaf_ids()),
+        child_pools=child_pools,
+        use_leaf_based=settings.get_setting("use_leaf_based_selection", "true") == "true",
+        use_stride=settings.get_setting("use_stride_selection", "false") == "true",
+        stride_virtual_time=float(settings.get_setting("stride_virtual_time", "0")),
+        fill_fractional=settings.get_setting("fill_fractional_queues", "true") == "true",
+        doubling_seconds=float(settings.get_setting("hours_until_double_weight", "48")) * 3600.0,
+    )
+
+
+class _Run:
+    """One simulated history; mirrors BlockService's queue building on the snapshot."""
+
+    def __init__(self, tree: TreeSnapshot, seed: int):
+        self.tree = tree
+        self.rng = random.Random(seed)
+        self.last_picked = list(tree.last_picked)
+        self.snoozed_until = list(tree.snoozed_until)
+        size = len(tree.ids)
+        # Stride state; leaves join at the virtual time, as they do in a new pool
+        self.virtual_time = tree.stride_virtual_time
+        self.passes = [
+            max(self.virtual_time if stride_pass is None else stride_pass, self.virtual_time)
+            for stride_pass in tree.stride_passes
+        ]
+        self.served_order = [0] * size  # breaks ties between equal passes, earliest update first
+        self.serves = 0
+        self.picks = [0] * size
+        self.worked = [0.0] * size
+        self.gaps: List[List[float]] = [[] for _ in range(size)]
+        self.overdue_picks = 0
+        self.normal_picks = 0
+        self.skipped_sessions = 0
+
+    def _exceeded(self, members, now):
+        tree = self.tree
+        return [
+            i for i in members
+            if tree.max_intervals[i] is not None
+            and self.last_picked[i] is not None
+            and now - self.last_picked[i] > tree.max_intervals[i]
+        ]
+
+    def _weight(self, i, now):
+        reset = self.last_picked[i] if self.last_picked[i] is not None else self.tree.created[i]
+        return self.tree.weights[i] * (1.0 + (now - reset) / self.tree.doubling_seconds)
+
+    def _draw(self, candidates, now):
+        weights = [max(0.0, self._weight(i, now)) for i in candidates]
+        total = sum(weights)
+        if total <= 0:
+            return None
+        remaining = self.rng.uniform(0, total)
+        for i, weight in zip(candidates, weights):
+            if weight > 0:
+                chosen = i
+                remaining -= weight
+                if remaining < 0:
+                    break
+        return chosen
+
+    def _fill(self, queue, total, members, overdue, exceeded, now):
+        lengths = self.tree.lengths
+        if not self.tree.fill_fractional:
+            return total
+        remaining_overdue = [i for i in overdue if i not in queue and lengths[i] < 1.0]
+        while total < 1.0 and remaining_overdue:
+            i = self.rng.choice(remaining_overdue)
+            if total + lengths[i] <= 1.0:
+                queue.append(i)
+                total += lengths[i]
+            remaining_overdue.remove(i)
+
+        withheld = set(queue) | set(exceeded)
+        for _ in range(MAX_FILL_ATTEMPTS):
+            if total >= 1.0:
+                break
+            candidates = [i for i in members if lengths[i] < 1.0 and i not in withheld]
+            i = self._draw(candidates, now)
+            if i is None or total + lengths[i] > 1.0:
+                break
+            queue.append(i)
+            total += lengths[i]
+            withheld.add(i)
+        return total
+
+    def _build_queue(self, members, now):
+        """(queue positions, total multiplier, overdue?) or None, like _build_block_queue."""
+        exceeded = self._exceeded(members, now)
+        overdue = [i for i in exceeded if self.snoozed_until[i] is None or self.snoozed_until[i] < now]
+        if overdue:
+            first = self.rng.choice(overdue)
+            queue = [first]
+            total = self._fill(queue, self.tree.lengths[first], members, overdue, exceeded, now)
+            return queue, total, True
+
+        excluded = set(exceeded)
+        primary = [i for i in members if self.tree.lengths[i] <= 1.0 and i not in excluded]
+        first = self._draw(primary, now)
+        if first is None:
+            return None
+        queue = [first]
+        total = self._fill(queue, self.tree.lengths[first], members, overdue, exceeded, now)
+        return queue, total, False
+
+    def _build_stride_queue(self, members, now):
+        """Like _build_queue, in stride order as BlockService.pick_block_queue_stride."""
+        tree = self.tree
+        lengths = tree.lengths
+        exceeded = set(self._exceeded(members, now))
+        snoozed = {i for i in members if self.snoozed_until[i] is not None and self.snoozed_until[i] >= now}
+        overdue = sorted(exceeded - snoozed, key=lambda i: (self.passes[i], i))
+        passed_over = exceeded | snoozed
+        ranked = sorted(
+            (i for i in members if lengths[i] <= 1.0 and tree.weights[i] > 0),
+            key=lambda i: (self.passes[i], 1.0 / tree.weights[i], self.served_order[i]),
+        )
+        if overdue:
+            first = overdue[0]
+        else:
+            first = next((i for i in ranked if i not in passed_over), None)
+            if first is None:
+                return None
+        queue = [first]
+        total = lengths[first]
+
+        if tree.fill_fractional:
+            for i in overdue:
+                if i not in queue and lengths[i] < 1.0 and total + lengths[i] <= 1.0:
+                    queue.append(i)
+                    total += lengths[i]
+            attempts = 0
+            for i in ranked:
+                if total >= 1.0 or attempts >= MAX_FILL_ATTEMPTS:
+                    break
+                if lengths[i] >= 1.0 or i in queue or i in passed_over:
+                    continue
+                attempts += 1
+                if total + lengths[i] > 1.0:
+                    break
+                queue.append(i)
+                total += lengths[i]
+        return queue, total, bool(overdue)
+
+    def _record_stride_turn(self, queue, total, overdue):
+        """Move a started queue's passes on, as BlockService.record_stride_turn does."""
+        tree = self.tree
+        if not overdue:
+            self.virtual_time = max(self.virtual_time, self.passes[queue[0]])
+        for i in queue:
+            if tree.weights[i] > 0:
+                share = tree.lengths[i] / total if len(queue) > 1 else tree.lengths[i]
+                self.passes[i] = max(self.passes[i], self.virtual_time) + share / tree.weights[i]
+                self.serves += 1
+                self.served_order[i] = self.serves
+
+    def _pick(self, now):
+        tree = self.tree
+        if tree.use_stride:
+            return self._build_stride_queue(tree.leaf_pool, now) if tree.leaf_pool else None
+        if tree.use_leaf_based:
+            return self._build_queue(tree.leaf_pool, now) if tree.leaf_pool else None
+
+        picked = None
+        parent = None
+        while parent in tree.child_pools:
+            built = self._build_queue(tree.child_pools[parent], now)
+            if built is None:
+                break
+            picked = built
+            parent = built[0][0]
+        return picked
+
+    def _work(self, queue, total, start, session_seconds):
+        """Run a queue's blocks back to back, as TimerFrame does; returns the end time."""
+        lengths = self.tree.lengths
+        now = start
+        for i in queue:
+            share = lengths[i] / total if len(queue) > 1 else lengths[i]
+            if self.last_picked[i] is not None:
+                self.gaps[i].append(now - self.last_picked[i])
+            self.picks[i] += 1
+            self.last_picked[i] = now
+            duration = session_seconds * share
+            self.worked[i] += duration
+            now += duration
+        return now
+
+    def simulate(self, days: int, day: SimulatedDay):
+        session_seconds = day.session_minutes * 60.0
+        for day_number in range(days):
+            now = day_number * DAY_SECONDS + day.day_start_hour * 3600.0
+            day_end = now + day.hours_per_day * 3600.0
+            while now < day_end:
+                built = None
+                for _ in range(MAX_DELAYS_PER_SESSION):
+                    built = self._pick(now)
+                    if built is None or self.rng.random() >= day.delay_probability:
+                        break
+                    # Delayed: snooze the offered block and pick again
+                    self.snoozed_until[built[0][0]] = now + day.delay_hours * 3600.0
+                    built = None
+                if built is None:
+                    self.skipped_sessions += 1
+                    now += session_seconds
+                    continue
+                queue, total, overdue = built
+                if self.tree.use_stride:
+                    self._record_stride_turn(queue, total, overdue)
+                if overdue:
+                    self.overdue_picks += 1
+                else:
+                    self.normal_picks += 1
+                now = self._work(queue, total, now, session_seconds)
+        return self
+
+    def result(self, end):
+        # A block still waiting at the end has an open gap too
+        open_gaps = [None if picked is None else end - picked for picked in self.last_picked]
+        return {
+            "picks": self.picks,
+            "worked": self.worked,
+            "gaps": self.gaps,
+            "open_gaps": open_gaps,
+            "overdue_picks": self.overdue_picks,
+            "normal_picks": self.normal_picks,
+            "skipped_sessions": self.skipped_sessions,
+        }
+
+
+def _simulate_runs(tree: TreeSnapshot, days: int, day: SimulatedDay, seeds: List[int]):
+    """Worker entry point: simulate one run per seed."""
+    return [_Run(tree, seed).simulate(days, day).result(days * DAY_SECONDS) for seed in seeds]
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _report(tree: TreeSnapshot, days: int, results) -> SimulationReport:
+    size = len(tree.ids)
+    picks = [sum(result["picks"][i] for result in results) for i in range(size)]
+    worked = [sum(result["worked"][i] for result in results) for i in range(size)]
+    total_worked = sum(worked)
+
+    blocks = {}
+    for i, block_id in enumerate(tree.ids):
+        gaps = sorted(gap for result in results for gap in result["gaps"][i])
+        interval = tree.max_intervals[i]
+        violations = []
+        if interval is not None:
+            candidates = gaps + [result["open_gaps"][i] for result in results if result["open_gaps"][i] is not None]
+            violations = [gap - interval for gap in candidates if gap > interval]
+        blocks[block_id] = BlockReport(
+            block_id=block_id,
+            name=tree.names[i],
+            picks=picks[i],
+            worked_seconds=worked[i],
+            share=worked[i] / total_worked if total_worked else 0.0,
+            gap_mean=sum(gaps) / len(gaps) if gaps else None,
+            gap_p50=_percentile(gaps, 0.5),
+            gap_p90=_percentile(gaps, 0.9),
+            gap_p99=_percentile(gaps, 0.99),
+            gap_max=gaps[-1] if gaps else None,
+            max_interval_seconds=interval,
+            violations=len(violations),
+            violation_seconds=sum(violations),
+            longest_violation_seconds=max(violations, default=0.0),
+        )
+
+    return SimulationReport(
+        runs=len(results),
+        days=days,
+        simulated_seconds=len(results) * days * DAY_SECONDS,
+        worked_seconds=total_worked,
+        overdue_picks=sum(result["overdue_picks"] for result in results),
+        normal_picks=sum(result["normal_picks"] for result in results),
+        skipped_sessions=sum(result["skipped_sessions"] for result in results),
+        blocks=blocks,
+    )
+
+
+class ScheduleSimulator:
+    """Monte Carlo replay of block selection over simulated days.
+
+    The block tree and selection settings are snapshotted into plain
+    arrays (TreeSnapshot), then each run replays pick_block_queue's rules
+    (time-decayed weights, overdue blocks first, max-interval exclusion,
+    fractional fill, snoozes) for ``days`` of sessions with its own seed,
+    without touching the database. Runs are independent and spread over a
+    ProcessPoolExecutor; the report pools them. All durations are seconds.
+    """
+
+    def __init__(self, block_service):
+        self.block_service = block_service
+
+    def snapshot(self, now: Optional[datetime] = None) -> TreeSnapshot:
+        return snapshot_tree(self.block_service, now or self.block_service.clock.now())
+
+    def run(
+        self,
+        days: int = 365,
+        runs: int = 32,
+        workers: Optional[int] = None,
+        session_minutes: Optional[float] = None,
+        day_start_hour: float = 9.0,
+        hours_per_day: float = 8.0,
+        delay_probability: float = 0.0,
+        delay_hours: float = 4.0,
+        seed: Optional[int] = None,
+        now: Optional[datetime] = None,
+    ) -> SimulationReport:
+        """Simulate ``runs`` independent histories of ``days`` days each.
+
+        Sessions last ``session_minutes`` (default: the default_duration
+        setting) and run back to back for ``hours_per_day`` from
+        ``day_start_hour``. With workers=0 everything runs in this process.
+        """
+        if session_minutes is None:
+            session_minutes = float(self.block_service.settings_service.get_setting("default_duration", "60"))
+        day = SimulatedDay(session_minutes, day_start_hour, hours_per_day, delay_probability, delay_hours)
+        tree = self.snapshot(now)
+        master = random.Random(seed)
+        seeds = [master.getrandbits(63) for _ in range(runs)]
+
+        if workers is None:
+            workers = min(runs, os.cpu_count() or 1)
+        if workers <= 0 or runs <= 1:
+            return _report(tree, days, _simulate_runs(tree, days, day, seeds))
+
+        # One batch per worker, so the snapshot is pickled once per worker rather than per run
+        batches = [seeds[i::workers] for i in range(workers)]
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_simulate_runs, tree, days, day, batch) for batch in batches if batch]
+            for future in futures:
+                results.extend(future.result())
+        return _report(tree, days, results)
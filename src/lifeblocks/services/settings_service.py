@@ -1,13 +1,46 @@
+from typing import Dict, Optional
+from sqlalchemy import event, inspect, select
 from lifeblocks.models.settings import Settings
 
 
 class SettingsService:
+    """Key/value settings served from memory.
+
+    The whole ``settings`` table is read in one query on first use and
+    reads are answered from that copy. ``set_setting`` writes through, and
+    the cache follows the session so Settings rows changed elsewhere (e.g.
+    by an import) are picked up: flushed rows are applied directly, bulk
+    statements and rollbacks trigger a reload on the next read.
+    """
+
     def __init__(self, session):
         self.session = session
+        self._cache: Optional[Dict[str, str]] = None
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+        event.listen(session, "after_flush", self._after_flush)
+        event.listen(session, "do_orm_execute", self._on_orm_execute)
+        event.listen(session, "after_soft_rollback", self._after_soft_rollback)
+
+    def _load(self) -> Dict[str, str]:
+        if self._cache is None:
+            rows = self.session.execute(select(Settings.key, Settings.value))
+            self._cache = {key: value for key, value in rows}
+            self.loads += 1
+        return self._cache
+
+    def invalidate(self):
+        self._cache = None
 
     def get_setting(self, key, default=None):
-        setting = self.session.query(Settings).filter_by(key=key).first()
-        return setting.value if setting else default
+        cache = self._load()
+        if key in cache:
+            self.hits += 1
+            return cache[key]
+        self.misses += 1
+        return default
 
     def set_setting(self, key, value):
         setting = self.session.query(Settings).filter_by(key=key).first()
@@ -17,3 +50,35 @@ class SettingsService:
             setting = Settings(key=key, value=value)
             self.session.add(setting)
         self.session.commit()
+
+    def cache_stats(self):
+        """Hit/miss counters; a miss is a key with no stored value (the default was returned)."""
+        return {"hits": self.hits, "misses": self.misses, "loads": self.loads}
+
+    def _after_flush(self, session, flush_context):
+        if self._cache is None:
+            return
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Settings):
+                values = inspect(obj).dict
+                if "key" in values and "value" in values:
+                    self._cache[values["key"]] = values["value"]
+                else:
+                    self.invalidate()
+                    return
+        for obj in session.deleted:
+            if isinstance(obj, Settings):
+                values = inspect(obj).dict
+                if "key" not in values:
+                    self.invalidate()
+                    return
+                self._cache.pop(values["key"], None)
+
+    def _on_orm_execute(self, orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        if any(mapper.class_ is Settings for mapper in orm_execute_state.all_mappers):
+            self.invalidate()
+
+    def _after_soft_rollback(self, session, previous_transaction):
+        self.invalidate()
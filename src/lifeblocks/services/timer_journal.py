@@ -0,0 +1,114 @@
+import os
+import struct
+import zlib
+from typing import List, NamedTuple, Optional
+
+# Event codes
+START = 1  # value: planned duration in seconds
+PAUSE = 2
+RESUME = 3  # value: seconds the pause lasted
+ADJUST = 4  # value: seconds added to (or taken off) the end time
+UNFOCUS = 5  # value: seconds of unfocused time
+
+# code, timeblock id, wall-clock time (epoch seconds), value, CRC32 of the preceding fields
+_RECORD = struct.Struct("<Bxxxqdd")
+_CHECKSUM = struct.Struct("<I")
+RECORD_SIZE = _RECORD.size + _CHECKSUM.size
+
+
+class TimerEvent(NamedTuple):
+    code: int
+    timeblock_id: int
+    timestamp: float
+    value: float
+
+
+class TimerJournal:
+    """Append-only log of the running timer's events, for crash recovery.
+
+    Each event is one fixed-size binary record (RECORD_SIZE bytes, with a
+    CRC32) appended with a single write, so it survives the process dying
+    as soon as append returns; sync() fsyncs it for power loss. The log
+    only covers the current timer: start() truncates it and clear() empties
+    it when the timer ends. A torn or corrupt tail (a crash mid-write) ends
+    the replay at the last intact record.
+    """
+
+    SUFFIX = ".timer-journal"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+
+    @classmethod
+    def for_database(cls, engine) -> Optional["TimerJournal"]:
+        """The journal kept next to an engine's SQLite file; None for in-memory databases."""
+        database = engine.url.database
+        if engine.url.get_backend_name() != "sqlite" or not database or database == ":memory:":
+            return None
+        return cls(database + cls.SUFFIX)
+
+    def append(self, code: int, timeblock_id: int, timestamp: float, value: float = 0.0):
+        record = _RECORD.pack(code, timeblock_id, timestamp, value)
+        os.write(self._fd, record + _CHECKSUM.pack(zlib.crc32(record)))
+
+    def start(self, timeblock_id: int, timestamp: float, duration_seconds: float):
+        """Begin the log of a new timer, dropping the previous one."""
+        os.ftruncate(self._fd, 0)
+        self.append(START, timeblock_id, timestamp, duration_seconds)
+
+    def clear(self):
+        """Forget the log once its timer has ended."""
+        os.ftruncate(self._fd, 0)
+
+    def sync(self):
+        os.fsync(self._fd)
+
+    def events(self) -> List[TimerEvent]:
+        """The intact records, oldest first."""
+        with open(self.path, "rb") as journal:
+            data = journal.read()
+        events = []
+        for offset in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+            record = data[offset : offset + _RECORD.size]
+            (checksum,) = _CHECKSUM.unpack_from(data, offset + _RECORD.size)
+            if zlib.crc32(record) != checksum:
+                break
+            events.append(TimerEvent(*_RECORD.unpack(record)))
+        return events
+
+    def close(self):
+        os.close(self._fd)
+
+
+class ReplayedTimer(NamedTuple):
+    timeblock_id: int
+    end_time: float  # wall-clock time the timer runs out, as of the last event
+    total_pause_duration: float  # seconds
+    pause_start: Optional[float]  # wall-clock time of the open pause, if paused
+
+
+def replay(events: List[TimerEvent]) -> Optional[ReplayedTimer]:
+    """Rebuild the timer state the events describe, or None without a start."""
+    starts = [i for i, event in enumerate(events) if event.code == START]
+    if not starts:
+        return None
+    start = events[starts[-1]]
+    end_time = start.timestamp + start.value
+    total_pause = 0.0
+    pause_start = None
+    for event in events[starts[-1] + 1 :]:
+        if event.timeblock_id != start.timeblock_id:
+            continue
+        if event.code == PAUSE and pause_start is None:
+            pause_start = event.timestamp
+        elif event.code == RESUME and pause_start is not None:
+            total_pause += event.value
+            end_time += event.value
+            pause_start = None
+        elif event.code == ADJUST:
+            end_time += event.value
+        elif event.code == UNFOCUS:
+            total_pause += event.value
+            end_time += event.value
+    return ReplayedTimer(start.timeblock_id, end_time, total_pause, pause_start)
@@ -1,16 +1,26 @@
 from datetime import datetime
-import time
 from lifeblocks.models.block import Block
 from lifeblocks.models.timeblock import TimeBlock, TimeBlockState
+from lifeblocks.services.rollup_service import RollupService
+from lifeblocks.services import timer_journal
+from lifeblocks.utils.clock import SYSTEM_CLOCK
 
 
 class TimerService:
-    def __init__(self, session, settings_service):
+    # Longest a buffered pause/resume/unfocus change waits before it is committed
+    FLUSH_INTERVAL_MS = 2000
+
+    def __init__(self, session, settings_service, journal=None, clock=None):
         self.session = session
         self.settings_service = settings_service
+        self.clock = clock or SYSTEM_CLOCK
+        # Optional TimerJournal: every timer event is logged there for exact recovery
+        self.journal = journal
         self.timer_active = False
         self.session_start = None
         self.session_duration = 0
+        # started_at, end_time and pause_start are clock.monotonic() readings
+        self.started_at = 0.0
         self.end_time = 0.0
         self.current_block = None
         self.resistance_level = None
@@ -18,7 +28,14 @@ class TimerService:
         self.pause_start = 0.0
         self.total_pause_duration = 0
         self.active_timeblock = None
+        self._expiry_handled = False
         self.on_state_change = None  # Callback for state changes
+        # Write-behind: without an attached widget every change is committed at once
+        self._flush_widget = None
+        self._flush_job = None
+        self._pending_writes = False
+        # Completed sessions are added to the daily rollup as they are flushed
+        RollupService.for_session(session)
         
         # Check for any incomplete timeblocks and resume them
         self._restore_active_timer()
@@ -32,6 +49,65 @@ class TimerService:
         if self.on_state_change:
             self.on_state_change()
 
+    def attach(self, widget):
+        """Buffer timer state changes, committing them from ``widget``'s mainloop.
+
+        Pauses, resumes and unfocused-time adjustments then cost one commit
+        per FLUSH_INTERVAL_MS however many there are. Starting, finishing,
+        abandoning and expiring a timeblock still commit immediately (and
+        take any buffered changes with them). Call flush() before exit.
+        """
+        self._flush_widget = widget
+
+    @property
+    def has_pending_writes(self):
+        """Whether timer changes are waiting to be committed."""
+        return self._pending_writes
+
+    def _write_behind(self):
+        """Commit the changes just made to the active timeblock, now or at the next flush."""
+        if self._flush_widget is None:
+            self.session.commit()
+            return
+        self._pending_writes = True
+        if self._flush_job is None:
+            self._flush_job = self._flush_widget.after(self.FLUSH_INTERVAL_MS, self._flush_later)
+
+    def _flush_later(self):
+        self._flush_job = None
+        if self._pending_writes:
+            self.flush()
+            # Observers that read through other sessions can now see the change
+            self._notify_state_change()
+
+    def flush(self):
+        """Commit now, including any buffered timer changes."""
+        if self._flush_job is not None:
+            self._flush_widget.after_cancel(self._flush_job)
+            self._flush_job = None
+        self._pending_writes = False
+        self.session.commit()
+        if self.journal:
+            self.journal.sync()
+
+    def _log(self, code, value=0.0):
+        """Append a timer event for the active timeblock to the journal."""
+        if self.journal and self.active_timeblock is not None and self.active_timeblock.id is not None:
+            self.journal.append(code, self.active_timeblock.id, self.clock.time(), value)
+
+    def _end_log(self):
+        if self.journal:
+            self.journal.clear()
+
+    def _replayed_timer(self, timeblock):
+        """The journal's account of a timeblock's timer, or None if it has none."""
+        if not self.journal:
+            return None
+        replayed = timer_journal.replay(self.journal.events())
+        if replayed is None or replayed.timeblock_id != timeblock.id:
+            return None
+        return replayed
+
     def _restore_active_timer(self):
         """Restore timer state from any incomplete timeblock"""
         incomplete = self.session.query(TimeBlock).filter(
@@ -39,32 +115,61 @@ class TimerService:
             TimeBlock.deleted.is_(False)
         ).first()
         
-        if incomplete:
-            self.timer_active = True
-            self.session_start = incomplete.start_time
-            self.session_duration = incomplete.duration_minutes
-            self.current_block = incomplete.block
-            self.resistance_level = incomplete.resistance_level
+        if not incomplete:
+            self._end_log()
+            return
+
+        self.timer_active = True
+        self.session_start = incomplete.start_time
+        self.session_duration = incomplete.duration_minutes
+        self.current_block = incomplete.block
+        self.resistance_level = incomplete.resistance_level
+        now = self.clock.now()
+        monotonic_now = self.clock.monotonic()
+        self.started_at = monotonic_now - (now - incomplete.start_time).total_seconds()
+
+        replayed = self._replayed_timer(incomplete)
+        if replayed is not None:
+            # The journal has every event, including adjustments and buffered
+            # changes the row never received; bring the row up to date with it
+            timestamp = now.timestamp()
+            self.total_pause_duration = replayed.total_pause_duration
+            remaining_seconds = replayed.end_time - timestamp
+            paused_seconds = None if replayed.pause_start is None else timestamp - replayed.pause_start
+            incomplete.pause_duration_minutes = self.total_pause_duration / 60
+            if paused_seconds is None:
+                incomplete.state = TimeBlockState.ACTIVE
+                incomplete.pause_start = None
+            else:
+                incomplete.state = TimeBlockState.PAUSED
+                incomplete.pause_start = datetime.fromtimestamp(replayed.pause_start)
+        else:
             self.total_pause_duration = incomplete.pause_duration_minutes * 60  # Convert to seconds
-            
+
             # Calculate end_time based on start time, duration, and pauses
-            elapsed_seconds = (datetime.now() - incomplete.start_time).total_seconds()
+            elapsed_seconds = (now - incomplete.start_time).total_seconds()
             remaining_seconds = (incomplete.duration_minutes * 60) - (elapsed_seconds - self.total_pause_duration)
-            
-            # If the timer has expired while we were away, mark it as such
-            if remaining_seconds <= 0:
-                incomplete.state = TimeBlockState.EXPIRED
-                self.session.commit()
-                return
-            
-            self.end_time = time.time() + remaining_seconds
-            
-            # Check if we were paused
+            paused_seconds = None
             if incomplete.state == TimeBlockState.PAUSED:
-                self.paused = True
-                self.pause_start = time.time() - (datetime.now() - incomplete.pause_start).total_seconds()
-            
-            self.active_timeblock = incomplete
+                paused_seconds = (now - incomplete.pause_start).total_seconds()
+
+        # If the timer has expired while we were away, mark it as such; an open
+        # pause counts in remaining_seconds above but doesn't use up the timer
+        if remaining_seconds + (paused_seconds or 0) <= 0:
+            incomplete.state = TimeBlockState.EXPIRED
+            self.session.commit()
+            return
+
+        self.end_time = monotonic_now + remaining_seconds
+
+        # Check if we were paused
+        if paused_seconds is not None:
+            self.paused = True
+            self.pause_start = monotonic_now - paused_seconds
+
+        self.active_timeblock = incomplete
+        if self.session.dirty:
+            self.session.commit()
 
     def get_default_duration(self):
         return int(self.settings_service.get_setting("default_duration", "60"))
@@ -74,9 +179,11 @@ class TimerService:
 
     def start_timer(self, block, minutes, resistance_level, forced=False, pick_reason=None):
         self.timer_active = True
-        self.session_start = datetime.now()
+        self.session_start = self.clock.now()
         self.session_duration = minutes
-        self.end_time = time.time() + (minutes * 60)
+        self.started_at = self.clock.monotonic()
+        self.end_time = self.started_at + (minutes * 60)
+        self._expiry_handled = False
         self.current_block = block
         self.resistance_level = resistance_level
         self.paused = False
@@ -94,71 +201,103 @@ class TimerService:
             pick_reason=pick_reason
         )
         self.session.add(self.active_timeblock)
-        self.session.commit()
+        self.flush()
+        if self.journal:
+            self.journal.start(self.active_timeblock.id, self.session_start.timestamp(), minutes * 60)
         self._notify_state_change()
         return True
 
     def pause_timer(self):
         if self.timer_active and not self.paused:
             self.paused = True
-            self.pause_start = time.time()
+            self.pause_start = self.clock.monotonic()
+            self._log(timer_journal.PAUSE)
             if self.active_timeblock:
                 self.active_timeblock.state = TimeBlockState.PAUSED
-                self.active_timeblock.pause_start = datetime.now()
-                self.session.commit()
+                self.active_timeblock.pause_start = self.clock.now()
+                self._write_behind()
                 self._notify_state_change()
             return True
         return False
 
     def resume_timer(self):
         if self.timer_active and self.paused:
-            pause_duration = time.time() - self.pause_start
+            pause_duration = self.clock.monotonic() - self.pause_start
             self.total_pause_duration += pause_duration
             self.end_time += pause_duration
+            self._log(timer_journal.RESUME, pause_duration)
             if self.active_timeblock:
                 self.active_timeblock.state = TimeBlockState.ACTIVE
                 self.active_timeblock.pause_duration_minutes = self.total_pause_duration / 60
                 self.active_timeblock.pause_start = None
-                self.session.commit()
+                self._write_behind()
                 self._notify_state_change()
             self.paused = False
             self.pause_start = 0.0
             return True
         return False
 
+    def _remaining_seconds(self):
+        if self.paused:
+            return self.end_time - self.pause_start
+        return self.end_time - self.clock.monotonic()
+
     def get_remaining_time(self):
         if not self.timer_active:
             return 0, 0, False
 
-        if self.paused:
-            remaining = max(0, self.end_time - self.pause_start)
-        else:
-            remaining = max(0, self.end_time - time.time())
+        remaining = max(0, self._remaining_seconds())
 
         minutes = int(remaining // 60)
         seconds = int(remaining % 60)
         is_finished = remaining <= 0
 
-        if is_finished and self.active_timeblock:
-            self.active_timeblock.state = TimeBlockState.EXPIRED
-            self.session.commit()
-
         return minutes, seconds, is_finished
 
+    def seconds_until_display_change(self):
+        """Seconds until get_remaining_time shows a different value.
+
+        None while nothing will change on its own (no timer, or paused);
+        0 once the timer has run out and check_expired has yet to act.
+        """
+        if not self.timer_active or self.paused:
+            return None
+        remaining = self._remaining_seconds()
+        if remaining <= 0:
+            return None if self._expiry_handled else 0.0
+        # The display shows whole seconds, so it next changes when the fraction runs out
+        return remaining % 1.0
+
+    def check_expired(self):
+        """Mark the running timeblock expired once it has run out.
+
+        Returns True only the first time it is called after expiry, so
+        the expiry is handled once however often the timer is checked.
+        """
+        if not self.timer_active or self._expiry_handled or self._remaining_seconds() > 0:
+            return False
+        self._expiry_handled = True
+        self._end_log()
+        if self.active_timeblock and self.active_timeblock.state != TimeBlockState.EXPIRED:
+            self.active_timeblock.state = TimeBlockState.EXPIRED
+            self.flush()
+        return True
+
     def stop_timer(self):
         if not self.timer_active:
             return 0
 
         self.timer_active = False
-        current_time = self.pause_start if self.paused else time.time()
-        total_elapsed_minutes = (current_time - self.session_start.timestamp()) / 60
+        self._end_log()
+        current_time = self.pause_start if self.paused else self.clock.monotonic()
+        total_elapsed_minutes = (current_time - self.started_at) / 60
         
         # Subtract pause duration to get actual working time
         active_elapsed_minutes = total_elapsed_minutes - (self.total_pause_duration / 60)
         
         if self.active_timeblock:
             self.active_timeblock.state = TimeBlockState.ABANDONED
-            self.session.commit()
+            self.flush()
             self._notify_state_change()
         
         return active_elapsed_minutes
@@ -173,10 +312,9 @@ class TimerService:
         duration = self.session_duration
         resistance = self.resistance_level
         
-        # Stop current timer and mark as restarted
+        # Stop current timer and mark as restarted; committed along with the new timeblock
         if self.active_timeblock:
             self.active_timeblock.state = TimeBlockState.RESTARTED
-            self.session.commit()
             
         # Start fresh timer with same parameters
         return self.start_timer(block, duration, resistance, forced=False)
@@ -191,12 +329,14 @@ class TimerService:
             new_end = self.end_time + seconds
             if new_end > self.pause_start:
                 self.end_time = new_end
+                self._log(timer_journal.ADJUST, seconds)
                 return True
         else:
             # If running, adjust from current time
             new_end = self.end_time + seconds
-            if new_end > time.time():
+            if new_end > self.clock.monotonic():
                 self.end_time = new_end
+                self._log(timer_journal.ADJUST, seconds)
                 return True
         return False
 
@@ -209,11 +349,12 @@ class TimerService:
             
         # Add the unfocused time to total pause duration
         self.total_pause_duration += seconds
+        self._log(timer_journal.UNFOCUS, seconds)
         
         # Update timeblock pause duration if we have an active timeblock
         if self.active_timeblock:
             self.active_timeblock.pause_duration_minutes = self.total_pause_duration / 60
-            self.session.commit()
+            self._write_behind()
             self._notify_state_change()
             
         # Move the end time forward by the same amount to maintain the same total working time
@@ -246,7 +387,8 @@ class TimerService:
             )
             self.session.add(self.active_timeblock)
 
-        self.session.commit()
+        self._end_log()
+        self.flush()
 
         # Update block's last_picked time
         self.current_block.last_picked = self.session_start
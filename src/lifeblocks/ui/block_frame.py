@@ -1,15 +1,22 @@
 import tkinter as tk
+from collections import deque
 from tkinter import ttk, messagebox
+from lifeblocks.services.block_service import BlockService
 from .dialogs.edit_block_dialog import EditBlockDialog
 from .dialogs.add_block_dialog import AddBlockDialog
 
 
 class BlockFrame(ttk.Frame):
-    def __init__(self, parent, block_service, timer_frame, history_frame):
+    def __init__(self, parent, block_service, timer_frame, history_frame, data_worker=None):
         super().__init__(parent)
         self.block_service = block_service
         self.timer_frame = timer_frame
         self.history_frame = history_frame
+        self.data_worker = data_worker
+        # What the tree currently shows: item id -> (parent, text, values, tags)
+        # and parent id -> ordered child ids
+        self._rows = {}
+        self._children = {}
         self.setup_ui()
 
         # Set minimum height
@@ -146,101 +153,123 @@ class BlockFrame(ttk.Frame):
             self.refresh_blocks()
 
     def refresh_blocks(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        blocks = self.block_service.get_all_blocks()
-        row_count = 0
-
-        # First add root blocks
-        for block in blocks:
-            if block.parent_id is None:
-                # Create tags list
-                tags = ["evenrow" if row_count % 2 == 0 else "oddrow"]
-                # Add inactive tag if block is not active
-                if not block.active:
-                    tags.append("inactive")
-                    
-                last_picked = (
-                    block.last_picked.strftime("%Y-%m-%d %H:%M")
-                    if block.last_picked
-                    else "Never"
-                )
-                max_interval = (
-                    f"{block.max_interval_hours}h"
-                    if block.max_interval_hours is not None
-                    else "-"
-                )
-                min_duration = (
-                    f"{block.min_duration_minutes}m"
-                    if block.min_duration_minutes is not None
-                    else "-"
-                )
-                status = "Active" if block.active else "Inactive"
-                
-                self.tree.insert(
-                    "",
-                    "end",
-                    str(block.id),
-                    text=block.name,
-                    values=(
-                        block.weight,
-                        max_interval,
-                        f"{block.length_multiplier:.2f}x",
-                        min_duration,
-                        last_picked,
-                        status,
-                    ),
-                    tags=tags,
-                )
-                row_count += 1
-
-        # Then add child blocks
-        for block in blocks:
-            if block.parent_id is not None:
-                # Create tags list
-                tags = ["evenrow" if row_count % 2 == 0 else "oddrow"]
-                # Add inactive tag if block is not active
-                if not block.active:
-                    tags.append("inactive")
-                    
-                last_picked = (
-                    block.last_picked.strftime("%Y-%m-%d %H:%M")
-                    if block.last_picked
-                    else "Never"
-                )
-                max_interval = (
-                    f"{block.max_interval_hours}h"
-                    if block.max_interval_hours is not None
-                    else "-"
-                )
-                min_duration = (
-                    f"{block.min_duration_minutes}m"
-                    if block.min_duration_minutes is not None
-                    else "-"
-                )
-                status = "Active" if block.active else "Inactive"
-                
-                self.tree.insert(
-                    str(block.parent_id),
-                    "end",
-                    str(block.id),
-                    text=block.name,
-                    values=(
-                        block.weight,
-                        max_interval,
-                        f"{block.length_multiplier:.2f}x",
-                        min_duration,
-                        last_picked,
-                        status,
-                    ),
-                    tags=tags,
-                )
-                row_count += 1
-
-        # Expand all items
-        for item in self.tree.get_children():
-            self.tree.item(item, open=True)
+        """Bring the tree in line with the current blocks.
+
+        Only rows whose content, parent or position changed are touched, so
+        the scroll position, selection and expanded state survive a refresh.
+        The blocks are read on the data worker when there is one; edits are
+        committed before a refresh, so the worker's session sees them.
+        """
+
+        def fail(error):
+            messagebox.showerror("Error", f"Failed to load blocks: {str(error)}")
+
+        if self.data_worker:
+            self.data_worker.submit(BlockService.fetch_block_rows, on_done=self._show_blocks, on_error=fail)
+        else:
+            self._show_blocks(BlockService.fetch_block_rows(self.block_service.session))
+
+    def _show_blocks(self, blocks):
+        # Root blocks first, then children, each in query order
+        ordered = [block for block in blocks if block.parent_id is None]
+        ordered += [block for block in blocks if block.parent_id is not None]
+
+        rows = {}
+        children = {"": []}
+        for row_count, block in enumerate(ordered):
+            item_id = str(block.id)
+            parent = "" if block.parent_id is None else str(block.parent_id)
+            rows[item_id] = (parent,) + self._render_block(block, row_count)
+            children.setdefault(parent, []).append(item_id)
+
+        self._sync_tree(rows, children)
+
+    def _render_block(self, block, row_count):
+        """The (text, values, tags) shown for a block (a Block or a fetch_block_rows row)."""
+        # Create tags list
+        tags = ["evenrow" if row_count % 2 == 0 else "oddrow"]
+        # Add inactive tag if block is not active
+        if not block.active:
+            tags.append("inactive")
+
+        last_picked = (
+            block.last_picked.strftime("%Y-%m-%d %H:%M")
+            if block.last_picked
+            else "Never"
+        )
+        max_interval = (
+            f"{block.max_interval_hours}h"
+            if block.max_interval_hours is not None
+            else "-"
+        )
+        min_duration = (
+            f"{block.min_duration_minutes}m"
+            if block.min_duration_minutes is not None
+            else "-"
+        )
+        status = "Active" if block.active else "Inactive"
+
+        values = (
+            block.weight,
+            max_interval,
+            f"{block.length_multiplier:.2f}x",
+            min_duration,
+            last_picked,
+            status,
+        )
+        return block.name, values, tuple(tags)
+
+    def _sync_tree(self, rows, children):
+        """Apply the difference between the displayed rows and ``rows``.
+
+        ``rows`` maps item id to (parent id, text, values, tags) and
+        ``children`` maps parent id ("" for the root) to its ordered item
+        ids. What is displayed is tracked in ``self._rows`` and
+        ``self._children`` rather than read back from Tk.
+        """
+        displayed = dict(self._rows)
+
+        # Deleting an item takes its subtree with it; anything in there that
+        # should stay has to be inserted again
+        for item_id in displayed.keys() - rows.keys():
+            if self.tree.exists(item_id):
+                self.tree.delete(item_id)
+            for descendant in self._displayed_descendants(item_id):
+                displayed.pop(descendant, None)
+            displayed.pop(item_id, None)
+
+        # Parents before children, so every insert has its parent in place
+        pending = deque([""])
+        while pending:
+            parent = pending.popleft()
+            order = children.get(parent, [])
+            previous = [item_id for item_id in self._children.get(parent, []) if item_id in displayed]
+            reorder = previous != order
+
+            for index, item_id in enumerate(order):
+                row = rows[item_id]
+                _, text, values, tags = row
+                old_row = displayed.get(item_id)
+                if old_row is None:
+                    self.tree.insert(
+                        parent, index, item_id, text=text, values=values, tags=tags, open=not parent
+                    )
+                else:
+                    if reorder:
+                        self.tree.move(item_id, parent, index)
+                    if old_row[1:] != row[1:]:
+                        self.tree.item(item_id, text=text, values=values, tags=tags)
+                pending.append(item_id)
+
+        self._rows = rows
+        self._children = children
+
+    def _displayed_descendants(self, item_id):
+        stack = list(self._children.get(item_id, []))
+        while stack:
+            child = stack.pop()
+            yield child
+            stack.extend(self._children.get(child, []))
 
     def edit_block(self):
         selected = self.tree.selection()
@@ -1,15 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+from lifeblocks.services.data_service import DataService
 
 
 class DataDialog:
-    def __init__(self, parent, data_service):
+    def __init__(self, parent, data_service, data_worker=None):
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("Import/Export Data")
         self.dialog.transient(parent)
         self.dialog.grab_set()
 
         self.data_service = data_service
+        # Exports run on the worker's thread when one is given
+        self.data_worker = data_worker
         self.setup_ui()
 
         # Center dialog
@@ -64,15 +67,33 @@ class DataDialog:
     def export_data(self):
         filename = filedialog.asksaveasfilename(
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=[
+                ("JSON files", "*.json"),
+                ("Compressed JSON files", "*.json.gz"),
+                ("All files", "*.*"),
+            ],
             title="Export Data",
         )
-        if filename:
-            try:
-                self.data_service.export_to_file(filename)
-                messagebox.showinfo("Success", "Data exported successfully!")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to export data: {str(e)}")
+        if not filename:
+            return
+
+        def on_done(counts):
+            messagebox.showinfo("Success", "Data exported successfully!")
+
+        def on_error(e):
+            messagebox.showerror("Error", f"Failed to export data: {str(e)}")
+
+        if self.data_worker:
+            self.data_worker.submit(
+                lambda session: DataService(session).export_to_file(filename),
+                on_done=on_done,
+                on_error=on_error,
+            )
+            return
+        try:
+            on_done(self.data_service.export_to_file(filename))
+        except Exception as e:
+            on_error(e)
 
     def import_data(self):
         if not messagebox.askyesno(
@@ -82,7 +103,11 @@ class DataDialog:
             return
 
         filename = filedialog.askopenfilename(
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            filetypes=[
+                ("JSON files", "*.json"),
+                ("Compressed JSON files", "*.json.gz"),
+                ("All files", "*.*"),
+            ],
             title="Import Data",
         )
         if filename:
@@ -29,7 +29,7 @@ class EditBlockDialog(BlockDialog):
 
         # Set up parent combo with valid parents
         all_blocks = self.block_service.get_all_blocks()
-        invalid_parents = self._get_invalid_parents(all_blocks, self.block.id)
+        invalid_parents = self.block_service.get_subtree_ids(self.block.id)
         valid_parents = ["None"] + [
             p.name for p in all_blocks if p.id not in invalid_parents
         ]
@@ -46,19 +46,6 @@ class EditBlockDialog(BlockDialog):
 
         parent.wait_window(self.dialog)
 
-    def _get_invalid_parents(self, blocks, block_id):
-        """Get IDs of self and all child blocks (invalid as parents)"""
-        invalid_ids = {block_id}
-
-        def add_children(parent_id):
-            for block in blocks:
-                if block.parent_id == parent_id:
-                    invalid_ids.add(block.id)
-                    add_children(block.id)
-
-        add_children(block_id)
-        return invalid_ids
-
     def get_action_button_text(self):
         return "Save"
 
@@ -37,9 +37,13 @@ class SettingsDialog:
             font=('TkDefaultFont', 10, 'bold')
         ).pack(anchor="w")
 
-        self.leaf_based_var = tk.BooleanVar(
-            value=self.settings_service.get_setting("use_leaf_based_selection", "true") == "true"
-        )
+        if self.settings_service.get_setting("use_stride_selection", "false") == "true":
+            selection_mode = "stride"
+        elif self.settings_service.get_setting("use_leaf_based_selection", "true") == "true":
+            selection_mode = "leaf"
+        else:
+            selection_mode = "hierarchical"
+        self.selection_mode_var = tk.StringVar(value=selection_mode)
         
         modes_frame = ttk.Frame(queue_frame)
         modes_frame.pack(fill="x", pady=(0, 10))
@@ -47,8 +51,8 @@ class SettingsDialog:
         ttk.Radiobutton(
             modes_frame,
             text="Leaf-based Selection",
-            variable=self.leaf_based_var,
-            value=True,
+            variable=self.selection_mode_var,
+            value="leaf",
             command=self.save_selection_mode
         ).pack(anchor="w", pady=(5, 0))
         
@@ -63,8 +67,8 @@ class SettingsDialog:
         ttk.Radiobutton(
             modes_frame,
             text="Hierarchical Selection",
-            variable=self.leaf_based_var,
-            value=False,
+            variable=self.selection_mode_var,
+            value="hierarchical",
             command=self.save_selection_mode
         ).pack(anchor="w")
         
@@ -75,6 +79,21 @@ class SettingsDialog:
             foreground='gray'
         ).pack(anchor="w", padx=(20, 0))
 
+        ttk.Radiobutton(
+            modes_frame,
+            text="Stride Selection",
+            variable=self.selection_mode_var,
+            value="stride",
+            command=self.save_selection_mode
+        ).pack(anchor="w")
+
+        ttk.Label(
+            modes_frame,
+            text="End-tasks take turns in proportion to their weights, in a fixed order instead of by chance",
+            font=('TkDefaultFont', 9, 'italic'),
+            foreground='gray'
+        ).pack(anchor="w", padx=(20, 0))
+
         # Separator
         ttk.Separator(queue_frame, orient="horizontal").pack(fill="x", pady=(0, 10))
 
@@ -209,4 +228,7 @@ class SettingsDialog:
             self.settings_service.set_setting("hours_until_double_weight", "48") 
 
     def save_selection_mode(self):
-        self.settings_service.set_setting("use_leaf_based_selection", str(self.leaf_based_var.get()).lower())
\ No newline at end of file
+        mode = self.selection_mode_var.get()
+        self.settings_service.set_setting("use_stride_selection", str(mode == "stride").lower())
+        if mode != "stride":
+            self.settings_service.set_setting("use_leaf_based_selection", str(mode == "leaf").lower())
\ No newline at end of file
@@ -1,18 +1,40 @@
 from tkinter import ttk
 import tkinter as tk
-from datetime import datetime, timedelta
-from lifeblocks.models import TimeBlock, Block
+from lifeblocks.models import TimeBlock
 from lifeblocks.models.timeblock import TimeBlockState
 import tkinter.messagebox as messagebox
-from sqlalchemy import tuple_
+from lifeblocks.services.history_service import HistoryService
 from .dialogs.edit_timeblock_dialog import EditTimeBlockDialog
 from .dialogs.add_timeblock_dialog import AddTimeBlockDialog
 
 
 class HistoryFrame(ttk.Frame):
-    def __init__(self, parent, session):
+    # Scroll fraction at which the next page is loaded (and, mirrored, the previous one)
+    LOAD_MORE_THRESHOLD = 0.9
+    # Rows kept as Tk items; pages scrolled further away are dropped and fetched again
+    MAX_LOADED_ROWS = 3 * HistoryService.PAGE_SIZE
+    # Typing pause before the search is run
+    SEARCH_DELAY_MS = 300
+
+    def __init__(self, parent, session, data_worker=None):
         super().__init__(parent)
         self.session = session
+        self.history_service = HistoryService(session)
+        # Pages are read on the worker's thread when one is given
+        self.data_worker = data_worker
+        # The shown rows are a window onto the list. _cursor continues it below;
+        # _window_start is the ``after`` that fetches its first row, None at the
+        # top. Both are (start_time, id) keys, or row offsets for a search
+        self._cursor = None
+        self._has_more = False
+        self._window_start = None
+        self._by_offset = False
+        # List position of the first shown row, for striping; the offset while searching
+        self._first_number = 0
+        self._keys = {}
+        self._loading = False
+        self._generation = 0
+        self._search_job = None
         self.setup_ui()
 
         # Set minimum height
@@ -41,13 +63,21 @@ class HistoryFrame(ttk.Frame):
         filter_frame = ttk.Frame(header_frame)
         filter_frame.pack(side="right")
 
+        # Notes search
+        ttk.Label(filter_frame, text="Search:").pack(side="left", padx=(0, 10))
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(filter_frame, textvariable=self.search_var, width=20)
+        search_entry.pack(side="left", padx=(0, 20))
+        search_entry.bind("<Return>", lambda e: self._search_now())
+        search_entry.bind("<KeyRelease>", lambda e: self._schedule_search())
+
         # Time filter
         ttk.Label(filter_frame, text="Time:").pack(side="left", padx=(0, 10))
         self.filter_var = tk.StringVar(value="Today")
         filter_combo = ttk.Combobox(
             filter_frame,
             textvariable=self.filter_var,
-            values=["Today", "Yesterday", "Last 7 Days", "Last 30 Days", "All Time"],
+            values=HistoryService.TIME_FILTERS,
             state="readonly",
             width=15,
         )
@@ -56,9 +86,10 @@ class HistoryFrame(ttk.Frame):
 
         # State filter
         ttk.Label(filter_frame, text="State:").pack(side="left", padx=(0, 10))
-        self.state_var = tk.StringVar(value="Current & Completed")
-        excluded_states = [TimeBlockState.ABANDONED, TimeBlockState.EXPIRED, TimeBlockState.CANCELLED_ON_COMPLETE]
-        state_values = ["Current & Completed", "All States"] + [state.value for state in TimeBlockState]
+        self.state_var = tk.StringVar(value=HistoryService.CURRENT_AND_COMPLETED)
+        state_values = [HistoryService.CURRENT_AND_COMPLETED, HistoryService.ALL_STATES] + [
+            state.value for state in TimeBlockState
+        ]
         state_combo = ttk.Combobox(
             filter_frame,
             textvariable=self.state_var,
@@ -169,101 +200,205 @@ class HistoryFrame(ttk.Frame):
 
     def _update_scrollbar(self, scrollbar, first, last):
         scrollbar.set(first, last)
+        # Fetch the next page once the view nears the end of the loaded rows,
+        # or the previous one once it nears the top of a window that was trimmed
+        if not self._loading:
+            if self._has_more and float(last) >= self.LOAD_MORE_THRESHOLD:
+                self.after_idle(self._load_more)
+            elif self._window_start is not None and float(first) <= 1 - self.LOAD_MORE_THRESHOLD:
+                self.after_idle(self._load_previous)
         if float(first) <= 0 and float(last) >= 1:
             scrollbar.grid_remove()
         else:
             scrollbar.grid()
 
-    def refresh_history(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        blocks = self._get_filtered_blocks()
-        row_count = 0
-
-        for block in blocks:
-            tag = "evenrow" if row_count % 2 == 0 else "oddrow"
-
-            # Convert resistance level to lightning bolts (repeated based on level)
-            resistance_text = (
-                "⚡" * block.resistance_level if block.resistance_level else "-"
-            )
-
-            # Convert satisfaction level to stars (repeated based on level)
-            satisfaction_text = (
-                "★" * block.satisfaction_level if block.satisfaction_level else "-"
-            )
+    def refresh_history(self, keep_loaded=False):
+        """Reload the list from the first page.
+
+        With keep_loaded, reload the rows currently shown, from the same
+        first row, and keep the scroll position (used after editing or
+        deleting rows).
+        """
+        after = None
+        limit = None
+        scroll_position = None
+        if keep_loaded:
+            after = self._window_start
+            limit = max(HistoryService.PAGE_SIZE, len(self.tree.get_children()))
+            scroll_position = self.tree.yview()[0]
+
+        # Pages requested before this refresh are dropped when they arrive
+        self._generation += 1
+        self._request_page(after, limit, replace=True, scroll_position=scroll_position)
+
+    def _schedule_search(self):
+        """Search once typing pauses, rather than on every key."""
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(self.SEARCH_DELAY_MS, self._search_now)
+
+    def _search_now(self):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+            self._search_job = None
+        self.refresh_history()
 
-            pause_text = (
-                f"{block.pause_duration_minutes:.1f} min"
-                if block.pause_duration_minutes > 0
-                else "-"
-            )
+    def _load_more(self):
+        """Append the next page of rows to the list."""
+        if self._has_more and not self._loading:
+            self._request_page(self._cursor, None, replace=False)
 
-            self.tree.insert(
-                "",
-                "end",
-                values=(
-                    block.block.name,
-                    block.start_time.strftime("%Y-%m-%d %H:%M"),
-                    f"{block.duration_minutes:.1f} min",
-                    pause_text,
-                    resistance_text,
-                    satisfaction_text,
-                    block.notes or "",
-                    block.state.value if block.state else "-",
-                    block.id,
-                ),
-                tags=(tag,),
-            )
-            row_count += 1
+    def _load_previous(self):
+        """Fetch back the page above a trimmed window."""
+        if self._window_start is not None and not self._loading:
+            self._request_page(None, None, replace=False, upward=True)
 
-    def _get_filtered_blocks(self):
+    def _request_page(self, after, limit, replace, scroll_position=None, upward=False):
         filter_value = self.filter_var.get()
         state_value = self.state_var.get()
-        now = datetime.now()
+        search_text = self.search_var.get().strip()
+        generation = self._generation
+        before = None
+        if upward:
+            if self._by_offset:
+                # Offsets make the page above plain arithmetic
+                after = max(0, self._first_number - HistoryService.PAGE_SIZE)
+                limit = self._first_number - after
+            else:
+                first = self.tree.get_children()[0]
+                before = self._keys[first]
+        self._loading = True
+
+        def fetch(session):
+            service = HistoryService(session)
+            if search_text:
+                # Matches come best first, with the matched words marked in the notes
+                return service.search_notes(search_text, filter_value, state_value, after=after, limit=limit)
+            return service.fetch_page(filter_value, state_value, after=after, limit=limit, before=before)
+
+        def show(result):
+            if generation != self._generation:
+                return
+            if upward:
+                self._show_previous_page(result, after)
+            else:
+                if replace:
+                    self._by_offset = bool(search_text)
+                    self._window_start = after or None
+                self._show_page(result, replace, scroll_position)
+
+        def fail(error):
+            if generation == self._generation:
+                self._loading = False
+                messagebox.showerror("Error", f"Failed to load history: {str(error)}")
+
+        if self.data_worker:
+            self.data_worker.submit(fetch, on_done=show, on_error=fail)
+        else:
+            show(fetch(self.session))
+
+    def _show_page(self, result, replace, scroll_position=None):
+        rows, self._cursor = result
+        self._has_more = self._cursor is not None
+        self._loading = False
+        if replace:
+            self.tree.delete(*self.tree.get_children())
+            self._keys = {}
+            if self._window_start is None:
+                self._first_number = 0
+            elif self._by_offset:
+                self._first_number = self._window_start
+        anchor = self._first_visible_item()
+        number = self._first_number + len(self.tree.get_children())
+
+        for row in rows:
+            self._insert_row(row, "end", number)
+            number += 1
+
+        if scroll_position is not None:
+            self.tree.yview_moveto(scroll_position)
+        elif not replace:
+            self._trim(from_top=True, anchor=anchor)
+
+    def _show_previous_page(self, result, offset):
+        rows, above = result
+        self._loading = False
+        anchor = self._first_visible_item()
+        self._first_number -= len(rows)
+        for index, row in enumerate(rows):
+            self._insert_row(row, index, self._first_number + index)
+        if self._by_offset:
+            self._window_start = offset or None
+        else:
+            self._window_start = above
+        self._trim(from_top=False, anchor=anchor)
 
-        if filter_value == "Today":
-            start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        elif filter_value == "Yesterday":
-            start_date = (now - timedelta(days=1)).replace(
-                hour=0, minute=0, second=0, microsecond=0
-            )
-            end_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        elif filter_value == "Last 7 Days":
-            start_date = now - timedelta(days=7)
-        elif filter_value == "Last 30 Days":
-            start_date = now - timedelta(days=30)
-        else:  # All Time
-            start_date = datetime.min
-
-        query = (
-            self.session.query(TimeBlock)
-            .join(Block)
-            .filter(TimeBlock.deleted.is_(False))
+    def _insert_row(self, row, index, number):
+        tag = "evenrow" if number % 2 == 0 else "oddrow"
+
+        # Convert resistance level to lightning bolts (repeated based on level)
+        resistance_text = (
+            "⚡" * row.resistance_level if row.resistance_level else "-"
         )
 
-        # Add state filter
-        if state_value == "Current & Completed":
-            excluded_states = [
-                TimeBlockState.ABANDONED,
-                TimeBlockState.EXPIRED,
-                TimeBlockState.CANCELLED_ON_COMPLETE,
-                TimeBlockState.RESTARTED,
-                TimeBlockState.DELAYED,
-            ]
-            query = query.filter(~TimeBlock.state.in_(excluded_states))
-        elif state_value != "All States":
-            query = query.filter(TimeBlock.state == TimeBlockState(state_value))
-
-        if filter_value == "Yesterday":
-            query = query.filter(
-                TimeBlock.start_time >= start_date, TimeBlock.start_time < end_date
-            )
-        else:
-            query = query.filter(TimeBlock.start_time >= start_date)
+        # Convert satisfaction level to stars (repeated based on level)
+        satisfaction_text = (
+            "★" * row.satisfaction_level if row.satisfaction_level else "-"
+        )
+
+        pause_text = (
+            f"{row.pause_duration_minutes:.1f} min"
+            if row.pause_duration_minutes
+            else "-"
+        )
 
-        return query.order_by(TimeBlock.start_time.desc()).all()
+        item_id = self.tree.insert(
+            "",
+            index,
+            values=(
+                row.block_name,
+                row.start_time.strftime("%Y-%m-%d %H:%M"),
+                f"{row.duration_minutes:.1f} min",
+                pause_text,
+                resistance_text,
+                satisfaction_text,
+                row.notes or "",
+                row.state.value if row.state else "-",
+                row.id,
+            ),
+            tags=(tag,),
+        )
+        self._keys[item_id] = (row.start_time, row.id)
+
+    def _first_visible_item(self):
+        items = self.tree.get_children()
+        if not items:
+            return None
+        return items[min(len(items) - 1, int(self.tree.yview()[0] * len(items)))]
+
+    def _trim(self, from_top, anchor):
+        """Drop the rows beyond MAX_LOADED_ROWS at one end and keep ``anchor`` in place.
+
+        The window's cursors move past the dropped rows, so scrolling back
+        fetches them again.
+        """
+        items = self.tree.get_children()
+        excess = len(items) - self.MAX_LOADED_ROWS
+        if excess > 0:
+            if from_top:
+                dropped = items[:excess]
+                self._first_number += excess
+                self._window_start = self._first_number if self._by_offset else self._keys[dropped[-1]]
+            else:
+                dropped = items[-excess:]
+                kept = len(items) - excess
+                self._cursor = self._first_number + kept if self._by_offset else self._keys[items[kept - 1]]
+                self._has_more = True
+            self.tree.delete(*dropped)
+            for item_id in dropped:
+                del self._keys[item_id]
+        if anchor is not None and self.tree.exists(anchor):
+            self.tree.yview_moveto(self.tree.index(anchor) / len(self.tree.get_children()))
 
     def delete_selected(self):
         selected_items = self.tree.selection()
@@ -295,35 +430,8 @@ class HistoryFrame(ttk.Frame):
                 timeblock_id = item["values"][id_column_index]
                 timeblock_ids.append(timeblock_id)
 
-            # Fetch and update the timeblocks
-            timeblocks = (
-                self.session.query(TimeBlock)
-                .filter(TimeBlock.id.in_(timeblock_ids))
-                .all()
-            )
-
-            # Mark all matched timeblocks as deleted
-            now = datetime.now()
-            for timeblock in timeblocks:
-                timeblock.deleted = True
-                timeblock.deleted_at = now
-                
-                # Update the block's last_picked to the most recent non-deleted timeblock
-                latest_timeblock = (
-                    self.session.query(TimeBlock)
-                    .filter(
-                        TimeBlock.block_id == timeblock.block_id,
-                        TimeBlock.deleted.is_(False),
-                        TimeBlock.id != timeblock.id
-                    )
-                    .order_by(TimeBlock.start_time.desc())
-                    .first()
-                )
-                
-                timeblock.block.last_picked = latest_timeblock.start_time if latest_timeblock else None
-
-            self.session.commit()
-            self.refresh_history()
+            self.history_service.delete_timeblocks(timeblock_ids)
+            self.refresh_history(keep_loaded=True)
 
         except Exception as e:
             self.session.rollback()
@@ -356,7 +464,7 @@ class HistoryFrame(ttk.Frame):
         # Show edit dialog
         dialog = EditTimeBlockDialog(self, self.session, timeblock)
         if dialog.result:
-            self.refresh_history()
+            self.refresh_history(keep_loaded=True)
 
     def add_timeblock(self):
         dialog = AddTimeBlockDialog(self, self.session)
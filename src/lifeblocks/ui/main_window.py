@@ -1,5 +1,6 @@
 import tkinter as tk
 from tkinter import ttk
+from sqlalchemy.orm import sessionmaker
 from .theme_manager import ThemeManager
 from .block_frame import BlockFrame
 from .history_frame import HistoryFrame
@@ -9,9 +10,11 @@ from .dialogs.settings_dialog import SettingsDialog
 from .dialogs.hotkeys_dialog import HotkeysDialog
 from lifeblocks.services.block_service import BlockService
 from lifeblocks.services.timer_service import TimerService
+from lifeblocks.services.timer_journal import TimerJournal
 from lifeblocks.services.notification_service import NotificationService
 from lifeblocks.services.settings_service import SettingsService
 from lifeblocks.services.data_service import DataService
+from lifeblocks.services.data_worker import DataWorker
 
 
 class MainWindow:
@@ -23,10 +26,20 @@ class MainWindow:
         # Initialize services
         self.settings_service = SettingsService(session)
         self.block_service = BlockService(session, self.settings_service)
-        self.timer_service = TimerService(session, self.settings_service)
+        self.timer_service = TimerService(
+            session, self.settings_service, journal=TimerJournal.for_database(session.get_bind())
+        )
         self.notification_service = NotificationService(self.settings_service)
         self.data_service = DataService(session)
 
+        # Heavy reads (history pages, exports) run on a worker thread with
+        # its own sessions; results come back through the Tk mainloop
+        self.data_worker = DataWorker(sessionmaker(bind=session.get_bind()))
+        self.data_worker.attach(self.root)
+        # Pause/resume/unfocus changes are committed in batches from the mainloop
+        self.timer_service.attach(self.root)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
         # Initialize theme manager
         self.theme_manager = ThemeManager(self.root)
 
@@ -88,7 +101,7 @@ class MainWindow:
         self.main_container.grid_columnconfigure(0, weight=1)
 
         # Create frames
-        self.history_frame = HistoryFrame(self.main_container, session)
+        self.history_frame = HistoryFrame(self.main_container, session, self.data_worker)
         self.timer_frame = TimerFrame(
             self.main_container,
             self.timer_service,
@@ -100,7 +113,8 @@ class MainWindow:
             self.main_container,
             self.block_service,
             self.timer_frame,
-            self.history_frame
+            self.history_frame,
+            self.data_worker,
         )
 
         # Timer at the top
@@ -122,7 +136,7 @@ class MainWindow:
         SettingsDialog(self.root, self.settings_service)
 
     def show_data_dialog(self):
-        DataDialog(self.root, self.data_service)
+        DataDialog(self.root, self.data_service, self.data_worker)
 
     def show_hotkeys_dialog(self):
         HotkeysDialog(self.root, self.settings_service)
@@ -155,7 +169,14 @@ class MainWindow:
         # Bind to root window to catch all events
         self.root.bind('<Key>', handle_hotkey)
 
+    def on_close(self):
+        # Commit buffered timer changes while the mainloop can still cancel their flush
+        self.timer_service.flush()
+        self.root.destroy()
+
     def run(self):
         # Initialize default categories if needed
         self.block_service.initialize_default_categories()
         self.root.mainloop()
+        # Let a running export finish before the process exits
+        self.data_worker.stop()
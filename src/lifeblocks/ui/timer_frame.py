@@ -72,6 +72,9 @@ class DurationDialog:
 
 
 class TimerFrame(ttk.Frame):
+    # Delay past each second boundary before redrawing, so a tick never lands early
+    TICK_SLACK_MS = 5
+
     def __init__(
         self,
         parent,
@@ -89,8 +92,10 @@ class TimerFrame(ttk.Frame):
         self.current_block_index = 0
         self.current_block = None
         
+        self._tick_job = None
+
         # Set up state change callback
-        self.timer_service.set_state_change_callback(self.history_frame.refresh_history)
+        self.timer_service.set_state_change_callback(self._on_timer_state_change)
         
         self.setup_ui()
         
@@ -255,7 +260,13 @@ class TimerFrame(ttk.Frame):
         )
         self.restart_button.pack(side="top")
 
-        self.update_timer()
+        self.schedule_tick()
+
+    def _on_timer_state_change(self):
+        # History is read through other sessions, so wait until buffered changes are committed
+        if not self.timer_service.has_pending_writes:
+            self.history_frame.refresh_history()
+        self.schedule_tick()
 
     def restart_timer(self):
         """Restart the current time block."""
@@ -284,6 +295,7 @@ class TimerFrame(ttk.Frame):
         self.block_var.set("")
         self.current_block_queue = None
         self.current_block_index = 0
+        self.schedule_tick()
 
     def handle_session_completion(self, elapsed, was_stopped_manually=False):
         """Handle completion of a time block, showing dialog"""
@@ -302,7 +314,7 @@ class TimerFrame(ttk.Frame):
             else:
                 # Mark the timeblock as cancelled without saving satisfaction/notes
                 self.timer_service.active_timeblock.state = TimeBlockState.CANCELLED_ON_COMPLETE
-                self.timer_service.session.commit()
+                self.timer_service.flush()
 
         if not was_stopped_manually and self.current_block_queue:
             self.current_block_index += 1
@@ -410,11 +422,7 @@ class TimerFrame(ttk.Frame):
             # Always respect the block's length_multiplier
             # Only use queue proportions if we have multiple blocks
             #@REVISIT seems hacky
-            if len(self.current_block_queue.blocks) > 1:
-                block_proportion = block.length_multiplier / self.current_block_queue.total_multiplier
-                adjusted_duration = base_duration * block_proportion
-            else:
-                adjusted_duration = base_duration * block.length_multiplier
+            adjusted_duration = base_duration * self.current_block_queue.session_share(block)
 
         self.current_block = block
         self.block_var.set(
@@ -427,6 +435,8 @@ class TimerFrame(ttk.Frame):
             forced=was_force_started,
             pick_reason=self.current_block_queue.pick_reason
         )
+        # Only a started block uses up its stride turn
+        self.block_service.record_stride_turn(self.current_block_queue, block, forced=was_force_started)
         self.start_button.configure(text="Stop")
         self.pause_button.configure(state="normal")
         self.restart_button.configure(state="normal")
@@ -435,11 +445,33 @@ class TimerFrame(ttk.Frame):
         self.unfocus_minus_button.configure(state="normal")
         self.unfocus_plus_button.configure(state="normal")
 
+    def schedule_tick(self):
+        """Redraw the timer now and wake again only when the shown value changes.
+
+        Nothing is scheduled while idle or paused; timer state changes
+        call this again to pick the ticking back up.
+        """
+        self._cancel_tick()
+        self.update_timer()
+        # Session completion dialogs run inside update_timer and may have scheduled a tick already
+        self._cancel_tick()
+
+        delay = self.timer_service.seconds_until_display_change()
+        if delay is not None:
+            self._tick_job = self.after(int(delay * 1000) + self.TICK_SLACK_MS, self._tick)
+
+    def _cancel_tick(self):
+        if self._tick_job is not None:
+            self.after_cancel(self._tick_job)
+            self._tick_job = None
+
+    def _tick(self):
+        self._tick_job = None
+        self.schedule_tick()
+
     def update_timer(self):
         if self.timer_service.timer_active:
-            _, _, is_finished = self.timer_service.get_remaining_time()
-
-            if is_finished and self.current_block:
+            if self.timer_service.check_expired() and self.current_block:
                 elapsed = self.timer_service.stop_timer()
                 self.notification_service.alert_time_up(self.current_block.name)
                 self.handle_session_completion(elapsed)
@@ -452,8 +484,6 @@ class TimerFrame(ttk.Frame):
             except ValueError:
                 self.update_timer_display(0, 0)
 
-        self.after(1000, self.update_timer)
-
     def update_timer_display(self, minutes=None, seconds=None):
         """Update the timer display with the given minutes and seconds.
         If no arguments provided, gets the current time from timer_service."""
@@ -481,10 +511,10 @@ class TimerFrame(ttk.Frame):
         """Adjust the timer by the given number of seconds."""
         if self.timer_service.timer_active:
             if self.timer_service.adjust_timer(seconds):
-                self.update_timer_display()
+                self.schedule_tick()
 
     def track_unfocused_time(self, seconds):
         """Track unfocused time by adjusting the timer"""
         if self.timer_service.timer_active:
             if self.timer_service.track_unfocused_time(seconds):
-                self.update_timer_display()
+                self.schedule_tick()
@@ -0,0 +1,58 @@
+import time
+from datetime import datetime, timedelta
+
+
+class Clock:
+    """The time sources services read, in one injectable place.
+
+    ``monotonic`` measures durations and deadlines: it never jumps when the
+    system clock is set. ``now`` and ``time`` are the local wall clock, for
+    timestamps that are stored or compared with stored ones; an operation
+    should read the wall clock once and pass the value along.
+    """
+
+    def now(self) -> datetime:
+        """Local wall-clock time (naive, like the stored timestamps)."""
+        return datetime.now()
+
+    def time(self) -> float:
+        """Wall-clock time as epoch seconds."""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """Seconds from an arbitrary fixed point; only differences are meaningful."""
+        return time.monotonic()
+
+
+SYSTEM_CLOCK = Clock()
+
+
+class ManualClock(Clock):
+    """A clock that only moves when told to, for tests and simulations.
+
+    ``advance`` moves wall and monotonic time together, as time passing
+    would; ``set_wall_time`` moves only the wall clock, like a manual clock
+    change or an NTP correction.
+    """
+
+    def __init__(self, start: datetime = datetime(2024, 1, 1, 9, 0)):
+        self._wall = start
+        self._monotonic = 0.0
+
+    def now(self) -> datetime:
+        return self._wall
+
+    def time(self) -> float:
+        return self._wall.timestamp()
+
+    def monotonic(self) -> float:
+        return self._monotonic
+
+    def advance(self, seconds: float = 0.0, **kwargs):
+        """Let time pass; keyword arguments are those of timedelta (hours=, days=, ...)."""
+        step = timedelta(seconds=seconds, **kwargs)
+        self._wall += step
+        self._monotonic += step.total_seconds()
+
+    def set_wall_time(self, wall: datetime):
+        self._wall = wall
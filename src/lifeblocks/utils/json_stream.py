@@ -0,0 +1,105 @@
+import json
+from typing import Any, Iterator, TextIO, Tuple
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]}"
+
+
+class JSONObjectStream:
+    """Incrementally read the members of a top-level JSON object.
+
+    Scalar and object members are decoded whole; array members are
+    returned as iterators that decode one element at a time, so a
+    document with huge arrays can be processed in constant memory. Each
+    array iterator must be consumed before moving on to the next member
+    (anything left unread is skipped).
+    """
+
+    def __init__(self, stream: TextIO, chunk_size: int = 64 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Read another chunk; returns False at end of input."""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what has been consumed so the buffer stays chunk-sized
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of input)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, *chars: str) -> str:
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f"Expected {' or '.join(chars)!r} at offset {self.pos}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def _decode(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut off by the chunk boundary ("12" of "12.5e3") still decodes;
+            # only trust it once a delimiter has been read after it
+            if self._may_be_truncated(value, end) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _may_be_truncated(self, value: Any, end: int) -> bool:
+        if self.eof or isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        return not any(char in _DELIMITERS for char in self.buffer[end:])
+
+    def _iter_array(self) -> Iterator[Any]:
+        self._expect("[")
+        if self._peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._decode()
+            if self._expect(",", "]") == "]":
+                return
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Yield (key, value) for each member, with arrays as lazy iterators."""
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self._decode()
+            self._expect(":")
+            if self._peek() == "[":
+                elements = self._iter_array()
+                yield key, elements
+                # Skip whatever the caller didn't read
+                for _ in elements:
+                    pass
+            else:
+                yield key, self._decode()
+            if self._expect(",", "}") == "}":
+                return
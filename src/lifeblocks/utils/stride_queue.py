@@ -0,0 +1,112 @@
+import heapq
+from typing import Dict, Generic, Hashable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T", bound=Hashable)
+
+
+class StrideQueue(Generic[T]):
+    """Stride scheduling: deterministic proportional share.
+
+    Each item has a stride, ``1 / weight``, and a pass value. The item
+    with the lowest pass goes next, and serving it moves its pass on by
+    its stride times the amount of service. Every item's service then
+    stays within about one stride of its weight's share at all times,
+    where a weighted draw only converges on it in the long run. Ties go
+    to the heavier item.
+
+    Backed by a binary heap with lazy deletion: finding the next item,
+    changing a pass or weight and removing an item are O(log n).
+    """
+
+    def __init__(self, entries: Iterable[Tuple[T, float, float]] = ()):
+        # Heap entries are [pass, stride, sequence, item, live]; the sequence keeps
+        # comparisons away from items and makes the order stable
+        self._heap: List[list] = []
+        self._entries: Dict[T, list] = {}
+        self._sequence = 0
+        for item, weight, pass_value in entries:
+            if weight > 0:
+                entry = self._entry(item, pass_value, 1.0 / weight)
+                self._heap.append(entry)
+        heapq.heapify(self._heap)
+
+    def _entry(self, item: T, pass_value: float, stride: float) -> list:
+        self._sequence += 1
+        entry = [float(pass_value), stride, self._sequence, item, True]
+        self._entries[item] = entry
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, item):
+        return item in self._entries
+
+    def pass_value(self, item: T) -> Optional[float]:
+        entry = self._entries.get(item)
+        return entry[0] if entry else None
+
+    def stride(self, item: T) -> Optional[float]:
+        entry = self._entries.get(item)
+        return entry[1] if entry else None
+
+    def update(self, item: T, weight: Optional[float] = None, pass_value: Optional[float] = None):
+        """Change an item's weight and/or pass; unknown items are added (with both given)."""
+        old = self._entries.get(item)
+        if old is None and (weight is None or pass_value is None):
+            return
+        if weight is not None and weight <= 0:
+            self.remove(item)
+            return
+        stride = 1.0 / weight if weight is not None else old[1]
+        if pass_value is None:
+            pass_value = old[0]
+        if old is not None:
+            old[-1] = False
+        heapq.heappush(self._heap, self._entry(item, pass_value, stride))
+        self._compact()
+
+    def remove(self, item: T):
+        entry = self._entries.pop(item, None)
+        if entry is not None:
+            entry[-1] = False
+            self._compact()
+
+    def serve(self, item: T, amount: float = 1.0, floor: float = float("-inf")) -> float:
+        """Move an item's pass on by ``amount`` strides, from no lower than ``floor``; returns the new pass."""
+        entry = self._entries[item]
+        pass_value = max(entry[0], floor) + amount * entry[1]
+        self.update(item, pass_value=pass_value)
+        return pass_value
+
+    def first(self) -> Optional[T]:
+        """The item with the lowest pass."""
+        heap = self._heap
+        while heap and not heap[0][-1]:
+            heapq.heappop(heap)
+        return heap[0][3] if heap else None
+
+    def in_order(self) -> Iterator[T]:
+        """Items by increasing pass, without disturbing the queue.
+
+        Walks the heap as a tree, so taking the first k items costs
+        O(k log k) however long the queue is. The queue must not change
+        while the iterator is in use.
+        """
+        heap = self._heap
+        if not heap:
+            return
+        frontier = [(heap[0], 0)]
+        while frontier:
+            entry, position = heapq.heappop(frontier)
+            if entry[-1]:
+                yield entry[3]
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def _compact(self):
+        """Drop dead entries once they outnumber the live ones."""
+        if len(self._heap) > 2 * len(self._entries) + 16:
+            self._heap = [entry for entry in self._heap if entry[-1]]
+            heapq.heapify(self._heap)
@@ -0,0 +1,144 @@
+import random
+from typing import Generic, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T", bound=Hashable)
+
+
+class DecayWeightedSampler(Generic[T]):
+    """Weighted sampling where weights grow linearly with time.
+
+    An item with base weight ``w`` last reset at time ``t`` weighs
+    ``w * (1 + (now - t) / doubling_time)``. That is linear in ``now``, so
+    every Fenwick node keeps just two sums, ``Σw`` and ``Σw·t``, and the
+    weight of any node at any ``now`` is ``Σw + (Σw·now - Σw·t) / doubling_time``.
+    Totals and draws are O(log n) without re-weighting each item per pick;
+    only a change to ``w`` or ``t`` touches the tree.
+
+    Times are plain floats in whatever unit ``doubling_time`` uses.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[T, float, float]] = ()):
+        self.items: List[T] = []
+        self.weights: List[float] = []
+        self.times: List[float] = []
+        self.positions = {}
+        for item, weight, reset_time in entries:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+            self.weights.append(max(0.0, float(weight)))
+            self.times.append(float(reset_time))
+
+        self._positive = sum(1 for weight in self.weights if weight > 0)
+        self._build()
+
+    def _build(self):
+        size = len(self.weights)
+        self.weight_tree = [0.0] * (size + 1)
+        self.moment_tree = [0.0] * (size + 1)
+        for i in range(1, size + 1):
+            self.weight_tree[i] += self.weights[i - 1]
+            self.moment_tree[i] += self.weights[i - 1] * self.times[i - 1]
+            parent = i + (i & -i)
+            if parent <= size:
+                self.weight_tree[parent] += self.weight_tree[i]
+                self.moment_tree[parent] += self.moment_tree[i]
+        self._top_bit = 1 << (size.bit_length() - 1) if size else 0
+
+    def __len__(self):
+        return self._positive
+
+    def __contains__(self, item):
+        position = self.positions.get(item)
+        return position is not None and self.weights[position] > 0
+
+    def entry(self, item: T) -> Optional[Tuple[float, float]]:
+        """The (weight, reset_time) pair stored for an item."""
+        position = self.positions.get(item)
+        if position is None:
+            return None
+        return self.weights[position], self.times[position]
+
+    def value(self, item: T, now: float, doubling_time: float) -> float:
+        """An item's decayed weight at ``now``."""
+        position = self.positions.get(item)
+        if position is None:
+            return 0.0
+        weight = self.weights[position]
+        return weight + weight * (now - self.times[position]) / doubling_time
+
+    def total(self, now: float, doubling_time: float) -> float:
+        """Sum of all decayed weights at ``now``."""
+        weight_sum = 0.0
+        moment_sum = 0.0
+        i = len(self.weights)
+        while i > 0:
+            weight_sum += self.weight_tree[i]
+            moment_sum += self.moment_tree[i]
+            i -= i & -i
+        return max(0.0, weight_sum + (weight_sum * now - moment_sum) / doubling_time)
+
+    def update(self, item: T, weight: Optional[float] = None, reset_time: Optional[float] = None):
+        """Change an item's base weight and/or reset time; unknown items are appended."""
+        position = self.positions.get(item)
+        if position is None:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+            self.weights.append(max(0.0, float(weight or 0.0)))
+            self.times.append(float(reset_time or 0.0))
+            if self.weights[-1] > 0:
+                self._positive += 1
+            self._build()
+            return
+
+        old_weight = self.weights[position]
+        old_time = self.times[position]
+        new_weight = old_weight if weight is None else max(0.0, float(weight))
+        new_time = old_time if reset_time is None else float(reset_time)
+
+        if old_weight > 0 and new_weight <= 0:
+            self._positive -= 1
+        elif old_weight <= 0 and new_weight > 0:
+            self._positive += 1
+        self.weights[position] = new_weight
+        self.times[position] = new_time
+
+        weight_delta = new_weight - old_weight
+        moment_delta = new_weight * new_time - old_weight * old_time
+        i = position + 1
+        while i < len(self.weight_tree):
+            self.weight_tree[i] += weight_delta
+            self.moment_tree[i] += moment_delta
+            i += i & -i
+
+    def remove(self, item: T) -> Optional[Tuple[float, float]]:
+        """Take an item out of the draw, returning its entry so it can be restored."""
+        entry = self.entry(item)
+        if entry is not None:
+            self.update(item, weight=0.0)
+        return entry
+
+    def sample(self, now: float, doubling_time: float, rng=random) -> Optional[T]:
+        """Draw one item with probability proportional to its decayed weight at ``now``."""
+        if not self._positive:
+            return None
+
+        remaining = rng.uniform(0, self.total(now, doubling_time))
+        position = 0
+        step = self._top_bit
+        while step:
+            next_position = position + step
+            if next_position < len(self.weight_tree):
+                weight_sum = self.weight_tree[next_position]
+                node_value = weight_sum + (weight_sum * now - self.moment_tree[next_position]) / doubling_time
+                if node_value <= remaining:
+                    position = next_position
+                    remaining -= node_value
+            step >>= 1
+
+        position = min(position, len(self.weights) - 1)
+        if self.weights[position] <= 0:
+            for candidate in list(range(position, -1, -1)) + list(range(position + 1, len(self.weights))):
+                if self.weights[candidate] > 0:
+                    position = candidate
+                    break
+        return self.items[position]
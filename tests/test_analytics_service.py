@@ -0,0 +1,151 @@
+import math
+import random
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from lifeblocks.models import Base, Block, TimeBlock
+from lifeblocks.models.timeblock import TimeBlockState
+from lifeblocks.services.block_service import BlockService
+from lifeblocks.services.settings_service import SettingsService
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+if np is not None:
+    from lifeblocks.services.analytics_service import FINISHED_STATES, AnalyticsService
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestAnalyticsService(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        Session = sessionmaker(bind=self.engine)
+        self.session = Session()
+
+        rng = random.Random(3)
+        self.blocks = [Block(name, 1) for name in ("Reading", "Writing", "Exercise")]
+        self.session.add_all(self.blocks)
+        self.session.flush()
+        start = datetime(2024, 1, 1)
+        for _ in range(300):
+            self.session.add(
+                TimeBlock(
+                    block_id=rng.choice(self.blocks).id,
+                    start_time=start + timedelta(minutes=rng.randrange(60 * 24 * 30)),
+                    duration_minutes=rng.choice([15.0, 30.0, 45.0]),
+                    resistance_level=rng.choice([None, 1, 2, 3, 4, 5]),
+                    satisfaction_level=rng.choice([None, 1, 2, 3, 4, 5]),
+                    state=rng.choice(list(TimeBlockState)),
+                )
+            )
+        self.session.commit()
+        self.analytics = AnalyticsService(self.session)
+
+    def tearDown(self):
+        self.session.close()
+
+    def timeblocks(self, block_id=None):
+        query = self.session.query(TimeBlock).filter(TimeBlock.deleted.is_(False))
+        if block_id is not None:
+            query = query.filter(TimeBlock.block_id == block_id)
+        return query.order_by(TimeBlock.start_time).all()
+
+    def test_rolling_means_match_a_direct_computation(self):
+        means = self.analytics.rolling_means(window=5)
+        for block in self.blocks:
+            timeblocks = self.timeblocks(block.id)
+            expected = []
+            for i in range(len(timeblocks)):
+                rated = [tb.satisfaction_level for tb in timeblocks[max(0, i - 4): i + 1] if tb.satisfaction_level is not None]
+                expected.append(sum(rated) / len(rated) if rated else math.nan)
+            np.testing.assert_allclose(means[block.id]["satisfaction"], expected)
+
+    def test_correlation_completion_and_time_of_day(self):
+        timeblocks = self.timeblocks()
+        pairs = [(tb.resistance_level, tb.satisfaction_level) for tb in timeblocks
+                 if tb.resistance_level is not None and tb.satisfaction_level is not None]
+        expected_r = np.corrcoef([x for x, _ in pairs], [y for _, y in pairs])[0, 1]
+        self.assertAlmostEqual(self.analytics.resistance_satisfaction_correlation()["overall"], expected_r)
+
+        block = self.blocks[0]
+        finished = [tb for tb in self.timeblocks(block.id) if tb.state in FINISHED_STATES]
+        completed = [tb for tb in finished if tb.state == TimeBlockState.COMPLETED]
+        self.assertAlmostEqual(self.analytics.completion_rate_by_block()[block.id], len(completed) / len(finished))
+
+        hours = np.zeros(24)
+        for tb in timeblocks:
+            if tb.state == TimeBlockState.COMPLETED:
+                hours[tb.start_time.hour] += tb.duration_minutes
+        np.testing.assert_allclose(self.analytics.time_of_day_distribution(), hours)
+        self.assertEqual(sum(self.analytics.state_counts().values()), len(timeblocks))
+
+    def test_flushed_changes_are_patched_in_without_reloading(self):
+        self.analytics.state_counts()
+        timeblocks = self.timeblocks()
+        timeblocks[0].state = TimeBlockState.COMPLETED
+        timeblocks[1].start_time += timedelta(days=3)
+        timeblocks[2].deleted = True
+        self.session.delete(timeblocks[3])
+        self.session.add(
+            TimeBlock(block_id=self.blocks[1].id, start_time=datetime(2024, 1, 15, 7), duration_minutes=60.0,
+                      satisfaction_level=5, state=TimeBlockState.COMPLETED)
+        )
+        self.session.commit()
+
+        patched = self.analytics.rolling_means(window=3)
+        counts = self.analytics.state_counts()
+        self.assertEqual(self.analytics.loads, 1)
+
+        fresh = AnalyticsService(self.session)
+        self.assertEqual(counts, fresh.state_counts())
+        for block in self.blocks:
+            for name in ("day", "resistance", "satisfaction"):
+                np.testing.assert_allclose(patched[block.id][name], fresh.rolling_means(window=3)[block.id][name])
+
+    def test_patched_rows_keep_start_time_order_within_a_block(self):
+        block = self.blocks[0]
+        self.analytics.rolling_means()
+        first, second = sorted(self.timeblocks(block.id), key=lambda tb: tb.id)[:2]
+        # Both back-dated before every other session, the later id to the earlier time
+        first.start_time = datetime(2023, 12, 31, 12)
+        second.start_time = datetime(2023, 12, 31, 8)
+        self.session.commit()
+
+        days = self.analytics.rolling_means()[block.id]["day"]
+        self.assertEqual(self.analytics.loads, 1)
+        self.assertTrue(np.all(np.diff(days) >= 0))
+        np.testing.assert_allclose(days, AnalyticsService(self.session).rolling_means()[block.id]["day"])
+
+    def test_history_of_deleted_blocks_is_left_out(self):
+        reading, writing, exercise = self.blocks
+        self.analytics.rolling_means()
+        # Unlinked through the ORM: patched in
+        self.timeblocks(writing.id)[0].block_id = None
+        self.session.commit()
+        self.assertEqual(sorted(self.analytics.rolling_means()), sorted([reading.id, writing.id, exercise.id]))
+        self.assertEqual(self.analytics.loads, 1)
+
+        # Unlinked in bulk by deleting the block: reloaded
+        BlockService(self.session, SettingsService(self.session)).delete_block(reading.id)
+        expected = sorted([writing.id, exercise.id])
+        self.assertEqual(sorted(self.analytics.rolling_means()), expected)
+        self.assertEqual(sorted(self.analytics.completion_rate_by_block()), expected)
+        self.assertEqual(sorted(self.analytics.resistance_satisfaction_correlation()["by_block"]), expected)
+        linked = [tb for tb in self.timeblocks() if tb.block_id is not None]
+        self.assertEqual(sum(self.analytics.state_counts().values()), len(linked))
+
+    def test_bulk_updates_reload(self):
+        self.analytics.state_counts()
+        self.session.query(TimeBlock).update({"state": TimeBlockState.ABANDONED})
+        self.session.commit()
+
+        self.assertEqual(self.analytics.state_counts()[TimeBlockState.ABANDONED], len(self.timeblocks()))
+        self.assertEqual(self.analytics.loads, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
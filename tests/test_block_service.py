@@ -1,11 +1,17 @@
+import time
 import unittest
+import warnings
 from datetime import datetime, timedelta
 from collections import Counter
 from sqlalchemy import create_engine
+from sqlalchemy.exc import SAWarning
 from sqlalchemy.orm import sessionmaker
 from lifeblocks.models.block import Base, Block
+from lifeblocks.models.timeblock import PickReason, TimeBlock, TimeBlockState
+from lifeblocks.services.block_index import to_hours
 from lifeblocks.services.block_service import BlockService
 from lifeblocks.services.settings_service import SettingsService
+from lifeblocks.utils.clock import ManualClock
 
 class TestBlockPicking(unittest.TestCase):
     def setUp(self):
@@ -370,6 +376,344 @@ class TestBlockPicking(unittest.TestCase):
         for block in blocks:
             self.assertTrue(block.active)
 
+    def test_leaf_index_tracks_edits(self):
+        """Test that leaf lookup follows adds, reparents, toggles and deletes"""
+        parent = self.block_service.add_block("Parent", 1)
+        child = self.block_service.add_block("Child", 1, "Parent")
+        other = self.block_service.add_block("Other", 1)
+
+        def active_leaf_names():
+            return sorted(b.name for b in self.block_service.get_active_leaf_blocks())
+
+        self.assertEqual(active_leaf_names(), ["Child", "Other"])
+
+        # Reparenting turns the old parent back into a leaf
+        self.block_service.update_block(child.id, parent_name="Other")
+        self.assertEqual(active_leaf_names(), ["Child", "Parent"])
+
+        # Deactivating an ancestor directly on the model hides its leaves
+        other.active = False
+        self.session.commit()
+        self.assertEqual(active_leaf_names(), ["Parent"])
+
+        self.block_service.delete_block(other.id)
+        self.assertEqual(active_leaf_names(), ["Parent"])
+        self.assertEqual([b.name for b in self.block_service.get_all_leaf_blocks()], ["Parent"])
+
+    def test_bulk_delete_leaves_no_stale_blocks(self):
+        """Test that a bulk delete also drops expired blocks the picks never loaded"""
+        self.block_service.add_block("Kept", 1)
+        dropped = self.block_service.add_block("Dropped", 1)
+        dropped.active = False
+        self.session.commit()
+        self.block_service.pick_block_queue()
+
+        self.session.query(Block).delete()
+        self.session.commit()
+        self.assertEqual(list(self.session.identity_map.keys()), [])
+        with warnings.catch_warnings():
+            # Reused ids would otherwise meet the stale instance in the identity map
+            warnings.simplefilter("error", SAWarning)
+            self.block_service.add_block("First", 1)
+            self.block_service.add_block("Second", 1)
+
+    def test_stride_selection_keeps_shares_close(self):
+        """Test that stride picks follow the weights within one turn, across restarts"""
+        self.settings_service.set_setting("use_stride_selection", "true")
+        weights = {"A": 1, "B": 2, "C": 4}
+        self.block_service.add_block("Project", 1)
+        for name, weight in weights.items():
+            self.block_service.add_block(name, weight, "Project")
+
+        counts = Counter()
+        for turn in range(1, 71):
+            if turn == 35:
+                # A restarted app carries on from the stored passes
+                self.block_service = BlockService(self.session, self.settings_service)
+            queue = self.block_service.pick_block_queue()
+            self.assertEqual(len(queue.blocks), 1)
+            self.block_service.record_stride_turn(queue, queue.blocks[0])
+            counts[queue.blocks[0].name] += 1
+            for name, weight in weights.items():
+                self.assertLessEqual(abs(counts[name] - turn * weight / 7), 1.0)
+
+        self.assertEqual(counts, {"A": 10, "B": 20, "C": 40})
+
+    def test_stride_selection_honors_overdue_and_fill(self):
+        """Test that stride picks let overdue blocks preempt and fill by pass order"""
+        self.settings_service.set_setting("use_stride_selection", "true")
+        clock = ManualClock(datetime(2024, 5, 1, 9, 0))
+        self.block_service = BlockService(self.session, self.settings_service, clock=clock)
+        self.block_service.add_block("Deep work", 4)
+        self.block_service.add_block("Email", 1, length_multiplier=0.25)
+        self.block_service.add_block("Stretch", 2, length_multiplier=0.25)
+        chores = self.block_service.add_block("Chores", 1, length_multiplier=0.5, max_interval_hours=2)
+        chores.last_picked = clock.now() - timedelta(hours=3)
+        self.session.commit()
+
+        odds = self.block_service.pick_probabilities()
+        queue = self.block_service.pick_block_queue()
+        self.assertEqual(queue.pick_reason, PickReason.OVERDUE)
+        self.assertEqual([b.name for b in queue.blocks], ["Chores", "Stretch", "Email"])
+        self.assertEqual({b.id for b in queue.blocks}, set(odds))
+        self.assertEqual(odds[chores.id].primary, 1.0)
+        for block in queue.blocks:
+            self.block_service.record_stride_turn(queue, block)
+        chores.last_picked = clock.now()
+        self.session.commit()
+
+        # Blocks that were just served move back in the order, by their share of the session
+        names = []
+        for _ in range(2):
+            queue = self.block_service.pick_block_queue()
+            for block in queue.blocks:
+                self.block_service.record_stride_turn(queue, block)
+            names.append([b.name for b in queue.blocks])
+        self.assertEqual(names, [["Deep work"], ["Stretch", "Email", "Chores"]])
+        self.assertEqual(self.block_service.selection_mode(), "stride")
+
+    def test_stride_turn_is_used_up_only_by_starting(self):
+        """Test that a picked but delayed stride block keeps its pass and its place"""
+        self.settings_service.set_setting("use_stride_selection", "true")
+        clock = ManualClock(datetime(2024, 5, 1, 9, 0))
+        self.block_service = BlockService(self.session, self.settings_service, clock=clock)
+        self.block_service.add_block("Write", 2)
+        self.block_service.add_block("Read", 1)
+
+        queue = self.block_service.pick_block_queue()
+        write = queue.blocks[0]
+        self.assertEqual(write.name, "Write")
+        self.assertEqual(self.block_service.pick_block_queue().blocks, [write])  # Picking alone writes nothing
+
+        self.block_service.create_delayed_timeblock(write.id, delay_hours=1)
+        self.assertIsNone(write.stride_pass)
+        self.assertEqual(self.settings_service.get_setting("stride_virtual_time", "0"), "0")
+        # Passed over while delayed, then first again
+        self.assertEqual(self.block_service.pick_block_queue().blocks[0].name, "Read")
+        clock.advance(hours=2)
+        queue = self.block_service.pick_block_queue()
+        self.assertEqual(queue.blocks, [write])
+
+        self.block_service.record_stride_turn(queue, write)
+        self.assertEqual(write.stride_pass, 0.5)
+        self.assertEqual(self.block_service.pick_block_queue().blocks[0].name, "Read")
+
+    def test_stride_queue_is_built_without_flushing(self):
+        """Test that loading the queued blocks doesn't flush edits into the orders being walked"""
+        self.settings_service.set_setting("use_stride_selection", "true")
+        self.block_service.add_block("Plan", 4, length_multiplier=0.25)
+        email = self.block_service.add_block("Email", 1, length_multiplier=0.25)
+        self.block_service.add_block("Stretch", 2, length_multiplier=0.25)
+        self.block_service.add_block("Tidy", 1, length_multiplier=0.25)
+        pool = self.block_service.index.leaf_pool()
+        pool.stride_queues(self.block_service.index, 0.0)
+
+        # Expired blocks are loaded with a SELECT, which would autoflush the pending pass
+        self.session.expire_all()
+        email.stride_pass = 100.0
+        queue = self.block_service._build_stride_queue(pool, datetime.now())
+
+        self.assertIn(email, self.session.dirty)
+        # Every block is still at its first pass, so the pending one is queued too
+        self.assertEqual(sorted(b.name for b in queue.blocks), ["Email", "Plan", "Stretch", "Tidy"])
+
+    def test_zero_weight_blocks_are_never_picked(self):
+        """Test that zero-weight candidates give no pick rather than the last one"""
+        idle = self.block_service.add_block("Idle", 0)
+        paused = self.block_service.add_block("Paused", 0, length_multiplier=0.5)
+
+        # Members of the pool, but never drawn
+        pool = self.block_service.index.leaf_pool()
+        self.assertEqual(pool.members, {idle.id, paused.id})
+        self.assertEqual(len(pool.primary), 0)
+        self.assertIsNone(pool.primary.sample(to_hours(datetime.now()), 48.0))
+        for leaf_based in ("false", "true"):
+            self.settings_service.set_setting("use_leaf_based_selection", leaf_based)
+            self.assertIsNone(self.block_service.pick_block_queue())
+
+        self.block_service.add_block("Active", 1, length_multiplier=0.5)
+        for _ in range(50):
+            self.assertEqual([b.name for b in self.block_service.pick_block_queue().blocks], ["Active"])
+
+    def test_ancestry_follows_moves_and_deletes(self):
+        """Test that paths, subtrees and cycle checks track reparenting and deletes"""
+        root = self.block_service.add_block("Root", 1)
+        branch = self.block_service.add_block("Branch", 1, "Root")
+        leaf = self.block_service.add_block("Leaf", 1, "Branch")
+        other = self.block_service.add_block("Other", 1)
+
+        self.assertEqual(self.block_service.get_category_path(leaf.id), "Root → Branch")
+        self.assertEqual(self.block_service.get_category_path(root.id), "")
+        self.assertEqual(self.block_service.get_subtree_ids(root.id), {root.id, branch.id, leaf.id})
+        self.assertTrue(self.block_service.would_create_cycle(root.id, leaf.id))
+        self.assertFalse(self.block_service.would_create_cycle(leaf.id, root.id))
+
+        # A move under its own subtree is refused and changes nothing
+        self.assertIsNone(self.block_service.update_block(root.id, name="Renamed", parent_name="Leaf"))
+        self.assertEqual(root.name, "Root")
+        self.assertIsNone(root.parent_id)
+
+        self.block_service.update_block(branch.id, parent_name="Other")
+        self.assertEqual(self.block_service.get_category_path(leaf.id), "Other → Branch")
+        self.assertEqual(self.block_service.get_subtree_ids(root.id), {root.id})
+        self.assertFalse(self.block_service.would_create_cycle(root.id, leaf.id))
+
+        self.block_service.toggle_block_active_status_recursive(other.id)
+        self.assertEqual([b.name for b in self.block_service.get_all_active_blocks()], ["Root"])
+
+        # Deleting a subtree keeps its history, unlinked
+        self.session.add(TimeBlock(leaf.id, datetime.now(), 25, state=TimeBlockState.COMPLETED))
+        self.session.commit()
+        self.assertTrue(self.block_service.delete_block(other.id))
+        self.assertEqual([b.name for b in self.block_service.get_all_blocks()], ["Root"])
+        self.assertEqual(self.block_service.get_subtree_ids(other.id), set())
+        self.assertEqual([t.block_id for t in self.session.query(TimeBlock)], [None])
+
+    def test_accumulated_weight_follows_edits(self):
+        """Test that accumulated weights track weight changes and reparenting"""
+        root = self.block_service.add_block("Root", 2)
+        branch = self.block_service.add_block("Branch", 3, "Root")
+        leaf = self.block_service.add_block("Leaf", 5, "Branch")
+        other = self.block_service.add_block("Other", 7)
+
+        self.assertEqual(self.block_service.calculate_accumulated_weight(leaf), 30)
+
+        self.block_service.update_block(root.id, weight=4)
+        self.assertEqual(self.block_service.calculate_accumulated_weight(leaf), 60)
+
+        self.block_service.update_block(branch.id, parent_name="Other")
+        self.assertEqual(self.block_service.calculate_accumulated_weight(branch), 21)
+        self.assertEqual(self.block_service.calculate_accumulated_weight(leaf), 105)
+
+    def test_delayed_overdue_block_not_prioritized(self):
+        """Test that a delayed overdue block loses its overdue priority until the delay ends"""
+        overdue = self.block_service.add_block("Overdue", 1, max_interval_hours=2)
+        self.block_service.add_block("Other", 1)
+        overdue.last_picked = datetime.now() - timedelta(hours=3)
+        self.session.commit()
+
+        self.assertEqual(self.block_service.pick_block_queue().pick_reason.value, "overdue")
+
+        self.block_service.create_delayed_timeblock(overdue.id, delay_hours=1)
+        self.assertTrue(self.block_service.was_recently_delayed(overdue))
+        for _ in range(20):
+            # Past its max interval but delayed: neither overdue nor in the weighted draw
+            block_queue = self.block_service.pick_block_queue()
+            self.assertEqual(block_queue.blocks[0].name, "Other")
+
+        # Once the delay has passed the block is overdue again
+        overdue.snoozed_until = datetime.now() - timedelta(minutes=1)
+        self.session.commit()
+        self.assertFalse(self.block_service.was_recently_delayed(overdue))
+        self.assertEqual(self.block_service.pick_block_queue().blocks[0].name, "Overdue")
+
+    def test_injected_clock_fast_forwards_delays_and_intervals(self):
+        """Weeks of simulated time pass without sleeping or patching datetime"""
+        clock = ManualClock(datetime(2024, 3, 1, 9, 0))
+        block_service = BlockService(self.session, self.settings_service, clock=clock)
+        self.settings_service.set_setting("use_leaf_based_selection", "true")
+        overdue = block_service.add_block("Overdue", 1, max_interval_hours=24)
+        block_service.add_block("Other", 1)
+        overdue.last_picked = clock.now()
+        self.session.commit()
+
+        clock.advance(hours=23)
+        self.assertEqual(block_service.pick_block_queue().pick_reason.value, "normal")
+        clock.advance(hours=2)
+        self.assertEqual(block_service.pick_block_queue().pick_reason.value, "overdue")
+
+        block_service.create_delayed_timeblock(overdue.id, delay_hours=48)
+        self.assertEqual(overdue.snoozed_until, datetime(2024, 3, 4, 10, 0))
+        clock.advance(days=1)
+        self.assertTrue(block_service.was_recently_delayed(overdue))
+        self.assertEqual(block_service.pick_block_queue().blocks[0].name, "Other")
+        clock.advance(weeks=3)
+        self.assertFalse(block_service.was_recently_delayed(overdue))
+        self.assertEqual(block_service.pick_block_queue().blocks[0].name, "Overdue")
+
+    def test_pick_probabilities_follow_weights_in_both_modes(self):
+        """Exact odds match the accumulated weights without sampling"""
+        clock = ManualClock(datetime(2024, 3, 1, 9, 0))
+        block_service = BlockService(self.session, self.settings_service, clock=clock)
+        block_service.add_block("Parent A", 2)
+        block_service.add_block("Parent B", 3)
+        leaf_a1 = block_service.add_block("Leaf A1", 2, "Parent A")
+        leaf_a2 = block_service.add_block("Leaf A2", 1, "Parent A")
+        leaf_b1 = block_service.add_block("Leaf B1", 1, "Parent B")
+
+        leaf_odds = block_service.pick_probabilities(leaf_based=True)
+        self.assertAlmostEqual(leaf_odds[leaf_a1.id].primary, 4 / 9)
+        self.assertAlmostEqual(leaf_odds[leaf_a2.id].primary, 2 / 9)
+        self.assertAlmostEqual(leaf_odds[leaf_b1.id].primary, 3 / 9)
+        self.assertEqual(len(leaf_odds), 3)
+
+        # Hierarchical: Parent A 2/5 then Leaf A1 2/3
+        tree_odds = block_service.pick_probabilities(leaf_based=False)
+        self.assertAlmostEqual(tree_odds[leaf_a1.id].primary, 2 / 5 * 2 / 3)
+        self.assertAlmostEqual(tree_odds[leaf_b1.id].primary, 3 / 5)
+        self.assertAlmostEqual(sum(odds.primary for odds in tree_odds.values()), 1.0)
+
+    def test_pick_probabilities_match_sampled_queues(self):
+        """Primary and fill odds agree with what pick_block_queue actually draws"""
+        clock = ManualClock(datetime(2024, 3, 1, 9, 0))
+        block_service = BlockService(self.session, self.settings_service, clock=clock)
+        block_service.add_block("Parent", 1)
+        block_service.add_block("Other", 2)
+        blocks = [
+            block_service.add_block("Full", 2, "Parent"),
+            block_service.add_block("Half", 1, "Parent", length_multiplier=0.5),
+            block_service.add_block("Third", 2, "Parent", length_multiplier=0.3),
+            block_service.add_block("Fifth", 1, "Parent", length_multiplier=0.2),
+            block_service.add_block("Due", 1, "Other", max_interval_hours=12, length_multiplier=0.4),
+            block_service.add_block("Solo", 1, "Other"),
+        ]
+        blocks[0].last_picked = clock.now() - timedelta(hours=30)
+        blocks[3].last_picked = clock.now() - timedelta(hours=5)
+        self.session.commit()
+
+        for leaf_based, overdue in ((True, False), (False, False), (True, True), (False, True)):
+            if overdue:
+                blocks[4].last_picked = clock.now() - timedelta(hours=13)
+                self.session.commit()
+            self.settings_service.set_setting("use_leaf_based_selection", "true" if leaf_based else "false")
+            odds = block_service.pick_probabilities()
+            self.assertAlmostEqual(sum(block_odds.primary for block_odds in odds.values()), 1.0)
+
+            num_picks = 4000
+            primary = Counter()
+            fill = Counter()
+            for _ in range(num_picks):
+                block_queue = block_service.pick_block_queue()
+                primary[block_queue.blocks[0].id] += 1
+                fill.update(block.id for block in block_queue.blocks[1:])
+
+            for block in blocks:
+                block_odds = odds.get(block.id, (0.0, 0.0))
+                self.assertAlmostEqual(primary[block.id] / num_picks, block_odds[0], delta=0.03)
+                self.assertAlmostEqual(fill[block.id] / num_picks, block_odds[1], delta=0.03)
+
+
+    def test_fill_odds_of_a_large_pool_are_estimated_quickly(self):
+        """Past MAX_FILL_STATES queues the fill is sampled rather than enumerated"""
+        clock = ManualClock(datetime(2024, 3, 1, 9, 0))
+        block_service = BlockService(self.session, self.settings_service, clock=clock)
+        blocks = [
+            block_service.add_block(f"Quarter {i}", 4 if i == 0 else 1, length_multiplier=0.25)
+            for i in range(150)
+        ]
+
+        started = time.perf_counter()
+        odds = block_service.pick_probabilities(leaf_based=True)
+        self.assertLess(time.perf_counter() - started, 5.0)
+
+        # Every queue is one primary and three fill blocks, so C(149, 3) ways to fill it
+        self.assertAlmostEqual(sum(block_odds.primary for block_odds in odds.values()), 1.0)
+        self.assertAlmostEqual(sum(block_odds.fill for block_odds in odds.values()), 3.0)
+        self.assertEqual(set(odds), {block.id for block in blocks})
+        # The heavy block joins about one fill in ten (4 / 153 per draw), the others about one in fifty
+        self.assertAlmostEqual(odds[blocks[0].id].fill, 0.077, delta=0.02)
+        self.assertAlmostEqual(odds[blocks[1].id].fill, 0.019, delta=0.015)
+
 
 if __name__ == "__main__":
     unittest.main()
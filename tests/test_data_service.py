@@ -0,0 +1,169 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from lifeblocks.models import Base, Block, TimeBlock
+from lifeblocks.models.timeblock import TimeBlockState
+from lifeblocks.services.block_service import BlockService
+from lifeblocks.services.data_service import DataService
+from lifeblocks.services.history_service import HistoryService
+from lifeblocks.services.settings_service import SettingsService
+
+
+class TestDataService(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        Session = sessionmaker(bind=self.engine)
+        self.session = Session()
+        self.settings_service = SettingsService(self.session)
+        self.block_service = BlockService(self.session, self.settings_service)
+        self.data_service = DataService(self.session)
+
+        parent = self.block_service.add_block("Parent", 2)
+        child = self.block_service.add_block("Child", 1, "Parent", max_interval_hours=4)
+        start = datetime(2024, 1, 1, 9, 0)
+        for i in range(25):
+            self.session.add(
+                TimeBlock(
+                    block_id=child.id if i % 2 else parent.id,
+                    start_time=start + timedelta(hours=i),
+                    duration_minutes=30.0,
+                    notes=f"session {i}",
+                    state=TimeBlockState.COMPLETED,
+                )
+            )
+        self.session.commit()
+        self.block_service.create_delayed_timeblock(child.id, delay_hours=2)
+        self.settings_service.set_setting("default_duration", "45")
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_streamed_export_matches_export_data(self):
+        stream = io.StringIO()
+        counts = self.data_service.export_to_stream(stream, batch_size=4)
+
+        self.assertEqual(counts, {"blocks": 2, "timeblocks": 26, "settings": 1})
+        self.assertEqual(json.loads(stream.getvalue()), self.data_service.export_data())
+
+    def test_gzip_round_trip(self):
+        expected = self.data_service.export_data()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "export.json.gz")
+            self.data_service.export_to_file(path)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(2), b"\x1f\x8b")
+
+            messages = self.data_service.import_from_file(path)
+
+        self.assertIn("Import completed successfully", messages)
+        self.assertEqual(self.data_service.export_data(), expected)
+        self.assertEqual(self.session.query(Block).count(), 2)
+
+    def test_chunked_import_reports_progress(self):
+        expected = self.data_service.export_data()
+        progress = []
+
+        messages = self.data_service.import_data(
+            json.loads(json.dumps(expected)),
+            chunk_size=10,
+            progress=lambda section, count, rate: progress.append((section, count)),
+        )
+
+        self.assertIn("Import completed successfully", messages)
+        self.assertTrue(any("rows/sec" in message for message in messages))
+        self.assertEqual(
+            progress,
+            [("blocks", 2), ("timeblocks", 10), ("timeblocks", 20), ("timeblocks", 26), ("settings", 1)],
+        )
+        self.assertEqual(self.data_service.export_data(), expected)
+        self.assertEqual(self.settings_service.get_setting("default_duration"), "45")
+        self.assertEqual(len(self.block_service.get_all_leaf_blocks()), 1)
+
+    def test_failed_import_keeps_existing_data(self):
+        expected = self.data_service.export_data()
+        data = json.loads(json.dumps(expected))
+        data["timeblocks"][20]["state"] = "not-a-state"
+
+        messages = self.data_service.import_data(data, chunk_size=5)
+
+        self.assertTrue(messages[-1].startswith("Error during import"))
+        self.assertEqual(self.data_service.export_data(), expected)
+
+    def test_streamed_file_import(self):
+        expected = self.data_service.export_data()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "export.json")
+            self.data_service.export_to_file(path)
+            self.session.query(TimeBlock).delete()
+            self.session.commit()
+
+            messages = self.data_service.import_from_file(path, chunk_size=7)
+
+        self.assertEqual(messages[0], "Import completed successfully")
+        self.assertEqual(self.data_service.export_data(), expected)
+
+    def test_upgrade_indexes_existing_notes(self):
+        # A database from before notes search
+        with self.engine.begin() as connection:
+            connection.execute(text("DROP TABLE history_fts"))
+            for trigger in ("insert", "delete", "update"):
+                connection.execute(text(f"DROP TRIGGER history_fts_{trigger}"))
+
+        self.data_service.ensure_schema_current()
+
+        history_service = HistoryService(self.session)
+        rows, _ = history_service.search_notes("session", limit=100)
+        self.assertEqual(len(rows), 25)
+        rows, _ = history_service.search_notes("24")
+        self.assertEqual([row.notes for row in rows], ["session [24]"])
+
+    def test_upgrade_derives_block_ancestry(self):
+        # A database from before block ancestry
+        Base.metadata.tables["block_ancestry"].drop(self.engine)
+        self.settings_service.set_setting("schema_version", "1.18")
+
+        self.data_service.ensure_schema_current()
+
+        child = self.session.query(Block).filter_by(name="Child").one()
+        self.assertEqual(self.block_service.get_category_path(child.id), "Parent")
+        self.block_service.add_block("Grandchild", 1, "Child")
+        grandchild = self.session.query(Block).filter_by(name="Grandchild").one()
+        self.assertEqual(self.block_service.get_category_path(grandchild.id), "Parent → Child")
+
+    def test_import_derives_ancestry_of_children_listed_first(self):
+        data = self.data_service.export_data()
+        data["blocks"].reverse()
+
+        self.data_service.import_data(data)
+
+        child = self.session.query(Block).filter_by(name="Child").one()
+        self.assertEqual(self.block_service.get_category_path(child.id), "Parent")
+
+    def test_upgrade_adds_stride_pass_and_round_trips_it(self):
+        # A database from before stride selection
+        with self.engine.begin() as connection:
+            connection.execute(text("ALTER TABLE blocks DROP COLUMN stride_pass"))
+        self.settings_service.set_setting("schema_version", "1.19")
+
+        self.data_service.ensure_schema_current()
+
+        self.settings_service.set_setting("use_stride_selection", "true")
+        # Once the fixture's delay is over
+        queue = self.block_service.pick_block_queue(now=datetime.now() + timedelta(hours=3))
+        picked = queue.blocks[0]
+        self.block_service.record_stride_turn(queue, picked)
+        picked_name = picked.name  # The import replaces every block
+        data = self.data_service.export_data()
+        self.data_service.import_data(data)
+        stored = self.session.query(Block).filter_by(name=picked_name).one()
+        self.assertGreater(stored.stride_pass, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from lifeblocks.models import Base, Block, TimeBlock
+from lifeblocks.services.data_worker import DataWorker
+from lifeblocks.services.block_service import BlockService
+from lifeblocks.services.history_service import HistoryService
+
+
+class TestDataWorker(unittest.TestCase):
+    def setUp(self):
+        # Worker sessions need their own connections, so use a file database
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'blocks.db')}")
+        Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.session = self.Session()
+        block = Block("Reading", 1)
+        self.session.add(block)
+        self.session.flush()
+        self.session.add(TimeBlock(block_id=block.id, start_time=datetime(2024, 1, 1, 9), duration_minutes=30.0))
+        self.session.commit()
+
+        self.worker = DataWorker(self.Session)
+
+    def tearDown(self):
+        self.worker.stop(timeout=5)
+        self.session.close()
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def wait_for_results(self, expected):
+        """Drain the result queue the way the Tk poll loop would."""
+        delivered = 0
+        for _ in range(500):
+            delivered += self.worker.process_results()
+            if delivered >= expected:
+                return
+            threading.Event().wait(0.01)
+        self.fail("worker did not deliver results")
+
+    def test_jobs_run_off_the_calling_thread_and_deliver_results(self):
+        results = []
+        threads = []
+
+        def fetch(session):
+            threads.append(threading.current_thread())
+            return HistoryService(session).fetch_page("All Time", "All States")
+
+        self.worker.submit(fetch, on_done=results.append)
+        self.assertEqual(results, [])  # Nothing is delivered until results are processed
+
+        self.wait_for_results(1)
+        rows, cursor = results[0]
+        self.assertEqual([row.block_name for row in rows], ["Reading"])
+        self.assertIsNone(cursor)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_errors_roll_back_and_reach_on_error(self):
+        errors = []
+
+        def failing(session):
+            session.add(Block("Discarded", 1))
+            session.flush()
+            raise RuntimeError("boom")
+
+        self.worker.submit(failing, on_done=self.fail, on_error=errors.append)
+        self.worker.submit(lambda session: session.scalars(select(Block.name)).all())
+        self.wait_for_results(2)
+
+        self.assertEqual([str(error) for error in errors], ["boom"])
+        self.assertEqual(self.session.scalars(select(Block.name)).all(), ["Reading"])
+
+    def test_block_rows_are_read_on_the_worker(self):
+        results = []
+        self.session.add(Block("Writing", 2, parent_id=self.session.scalar(select(Block.id))))
+        self.session.commit()
+
+        self.worker.submit(BlockService.fetch_block_rows, on_done=results.append)
+        self.wait_for_results(1)
+        self.assertEqual([(row.name, row.weight, row.parent_id is None) for row in results[0]],
+                         [("Reading", 1, True), ("Writing", 2, False)])
+
+    def test_polling_runs_only_while_jobs_are_outstanding(self):
+        class Widget:
+            def __init__(self):
+                self.scheduled = []
+
+            def after(self, delay, callback):
+                self.scheduled.append(callback)
+                return len(self.scheduled)
+
+        widget = Widget()
+        results = []
+        self.worker.attach(widget)
+        self.assertEqual(widget.scheduled, [])  # Idle: nothing to poll for
+
+        self.worker.submit(lambda session: 1, on_done=results.append)
+        self.worker.submit(lambda session: 2, on_done=results.append)
+        self.assertEqual(len(widget.scheduled), 1)  # One poll serves every job
+
+        for _ in range(500):
+            if not widget.scheduled:
+                break
+            widget.scheduled.pop()()
+            threading.Event().wait(0.01)
+        self.assertEqual(results, [1, 2])
+        self.assertEqual(widget.scheduled, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from lifeblocks.models import Base, Block, TimeBlock
+from lifeblocks.models.timeblock import TimeBlockState
+from lifeblocks.services.history_service import HistoryService
+from lifeblocks.utils.clock import ManualClock
+
+
+class TestHistoryService(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        Session = sessionmaker(bind=self.engine)
+        self.session = Session()
+        self.history_service = HistoryService(self.session)
+
+        self.now = datetime(2024, 3, 10, 12, 0)
+        block = Block("Reading", 1)
+        self.session.add(block)
+        self.session.flush()
+        for i in range(50):
+            # Pairs of rows share a start time to exercise the id tie-break
+            self.session.add(
+                TimeBlock(
+                    block_id=block.id,
+                    start_time=self.now - timedelta(hours=i // 2),
+                    duration_minutes=30.0,
+                    state=TimeBlockState.EXPIRED if i % 5 == 0 else TimeBlockState.COMPLETED,
+                )
+            )
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def fetch_all(self, filter_value, state_value, limit):
+        rows, cursor = self.history_service.fetch_page(filter_value, state_value, limit=limit, now=self.now)
+        pages = 1
+        while cursor is not None:
+            page, cursor = self.history_service.fetch_page(
+                filter_value, state_value, after=cursor, limit=limit, now=self.now
+            )
+            rows.extend(page)
+            pages += 1
+        return rows, pages
+
+    def test_pages_cover_every_row_once_in_order(self):
+        expected = (
+            self.session.query(TimeBlock)
+            .order_by(TimeBlock.start_time.desc(), TimeBlock.id.desc())
+            .all()
+        )
+
+        rows, pages = self.fetch_all("All Time", "All States", limit=7)
+
+        self.assertEqual([row.id for row in rows], [row.id for row in expected])
+        self.assertEqual(pages, 8)
+
+    def test_pages_before_a_row_walk_back_up(self):
+        rows, _ = self.fetch_all("All Time", "All States", limit=50)
+        key = lambda row: (row.start_time, row.id)
+
+        # Back up from the last row, one page of 7 at a time
+        collected = [rows[-1]]
+        cursor = key(rows[-1])
+        while True:
+            page, above = self.history_service.fetch_page(
+                "All Time", "All States", before=key(collected[0]), limit=7, now=self.now
+            )
+            collected = page + collected
+            # The cursor fetches the same page going down again
+            again, _ = self.history_service.fetch_page("All Time", "All States", after=above, limit=7, now=self.now)
+            self.assertEqual([row.id for row in again], [row.id for row in page])
+            if above is None:
+                break
+            cursor = above
+
+        self.assertEqual([row.id for row in collected], [row.id for row in rows])
+        self.assertEqual(collected[0].id, rows[0].id)
+        self.assertEqual(cursor, key(rows[6]))  # The row just above the second page
+
+    def test_filters_apply_across_pages(self):
+        rows, _ = self.fetch_all("Today", "Current & Completed", limit=4)
+
+        self.assertEqual(len(rows), 20)
+        self.assertTrue(all(row.state == TimeBlockState.COMPLETED for row in rows))
+        self.assertTrue(all(row.start_time >= self.now.replace(hour=0) for row in rows))
+
+    def test_filters_and_deletes_read_the_injected_clock(self):
+        clock = ManualClock(self.now + timedelta(days=1))
+        history_service = HistoryService(self.session, clock=clock)
+
+        today, _ = history_service.fetch_page("Today", "All States")
+        yesterday, _ = history_service.fetch_page("Yesterday", "All States")
+        self.assertEqual(today, [])
+        # Rows up to 12 hours before noon, in pairs
+        self.assertEqual(len(yesterday), 26)
+
+        history_service.delete_timeblocks([yesterday[0].id])
+        deleted = self.session.get(TimeBlock, yesterday[0].id)
+        self.assertEqual(deleted.deleted_at, clock.now())
+
+    def test_page_is_one_statement_of_plain_rows(self):
+        self.session.query(TimeBlock).update({"notes": "x" * 1000})
+        self.session.commit()
+        self.session.expunge_all()
+        statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        rows, _ = self.history_service.fetch_page("All Time", "All States", limit=20, now=self.now)
+        rendered = [(row.block_name, row.start_time, row.notes, row.state.value) for row in rows]
+
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(len(rendered), 20)
+        self.assertEqual(rows[0].block_name, "Reading")
+        self.assertEqual(len(rows[0].notes), HistoryService.NOTES_PREVIEW_LENGTH)
+        self.assertEqual(len(self.session.identity_map), 0)
+
+    def test_delete_resets_last_picked_in_a_fixed_number_of_statements(self):
+        other = Block("Writing", 1)
+        self.session.add(other)
+        self.session.flush()
+        for i in range(3):
+            self.session.add(TimeBlock(block_id=other.id, start_time=self.now - timedelta(days=i), duration_minutes=10.0))
+        reading = self.session.query(Block).filter_by(name="Reading").one()
+        reading.last_picked = self.now
+        other.last_picked = self.now
+        self.session.commit()
+
+        newest_reading = (
+            self.session.query(TimeBlock.id)
+            .filter_by(block_id=reading.id)
+            .order_by(TimeBlock.start_time.desc())
+            .limit(30)
+        )
+        doomed = [row.id for row in newest_reading]
+        doomed += [row.id for row in self.session.query(TimeBlock.id).filter_by(block_id=other.id)]
+        statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        count = self.history_service.delete_timeblocks(doomed, now=self.now)
+
+        self.assertEqual(count, 33)
+        self.assertLessEqual(len([sql for sql in statements if "SELECT" in sql]), 4)
+        self.assertEqual(self.session.query(TimeBlock).filter(TimeBlock.deleted.is_(True)).count(), 33)
+        # 30 of the 50 rows were the newest 15 hours, in pairs
+        self.assertEqual(reading.last_picked, self.now - timedelta(hours=15))
+        self.assertIsNone(other.last_picked)
+
+    def test_deleted_rows_are_skipped(self):
+        self.session.query(TimeBlock).filter(TimeBlock.id <= 10).update({"deleted": True})
+        self.session.commit()
+
+        rows, _ = self.fetch_all("All Time", "All States", limit=6)
+
+        self.assertEqual(len(rows), 40)
+
+    def add_notes(self, *notes):
+        timeblocks = self.session.query(TimeBlock).order_by(TimeBlock.id).limit(len(notes)).all()
+        for timeblock, text in zip(timeblocks, notes):
+            timeblock.notes = text
+        self.session.commit()
+        return [timeblock.id for timeblock in timeblocks]
+
+    def test_search_ranks_matches_and_marks_them(self):
+        ids = self.add_notes(
+            "Finished the dragon chapter",
+            "dragons, dragons everywhere",
+            "Nothing to see",
+            "Chapter on gardening",
+        )
+
+        rows, cursor = self.history_service.search_notes("dragon", now=self.now)
+
+        # Prefix match; the note that mentions it most ranks first
+        self.assertEqual([row.id for row in rows], [ids[1], ids[0]])
+        self.assertEqual(rows[0].notes, "[dragons], [dragons] everywhere")
+        self.assertEqual(rows[0].block_name, "Reading")
+        self.assertIsNone(cursor)
+        # Every word has to match
+        rows, _ = self.history_service.search_notes("chapter garden", now=self.now)
+        self.assertEqual([row.id for row in rows], [ids[3]])
+
+    def test_search_follows_edits_deletes_and_filters(self):
+        ids = self.add_notes("old words", "kept words", "other words")
+        first = self.session.get(TimeBlock, ids[0])
+        first.notes = "new text"
+        self.session.get(TimeBlock, ids[2]).deleted = True
+        self.session.commit()
+
+        search = lambda text, *args: [row.id for row in self.history_service.search_notes(text, *args, now=self.now)[0]]
+        self.assertEqual(search("old"), [])
+        self.assertEqual(search("new"), [ids[0]])
+        self.assertEqual(search("words"), [ids[1]])
+        # The first rows are expired (i % 5 == 0), so the default state filter hides them
+        self.assertEqual(search("new", "All Time", HistoryService.CURRENT_AND_COMPLETED), [])
+
+    def test_search_pages_and_literal_input(self):
+        self.add_notes(*["meeting notes %d" % i for i in range(12)])
+
+        rows, cursor = self.history_service.search_notes("meet", limit=5, now=self.now)
+        seen = [row.id for row in rows]
+        while cursor is not None:
+            rows, cursor = self.history_service.search_notes("meet", after=cursor, limit=5, now=self.now)
+            seen.extend(row.id for row in rows)
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(len(set(seen)), 12)
+
+        # FTS syntax is searched as plain text rather than raising
+        for text in ('"meeting', "meeting OR", "notes -x", "NEAR(", "*", "   "):
+            self.history_service.search_notes(text, now=self.now)
+        self.assertEqual(self.history_service.search_notes("   ", now=self.now), ([], None))
+
+
+if __name__ == "__main__":
+    unittest.main()
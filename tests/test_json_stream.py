@@ -0,0 +1,43 @@
+import io
+import json
+import unittest
+from lifeblocks.utils.json_stream import JSONObjectStream
+
+
+class TestJSONObjectStream(unittest.TestCase):
+    def read(self, document, chunk_size):
+        result = {}
+        for key, value in JSONObjectStream(io.StringIO(document), chunk_size).items():
+            # Arrays come back as iterators
+            result[key] = list(value) if hasattr(value, "__next__") else value
+        return result
+
+    def test_matches_json_load_at_any_chunk_size(self):
+        data = {
+            "version": "1.16",
+            "numbers": [1, 22, 333.5, -4444, 1e10],
+            "records": [{"id": i, "notes": f"line {i}, with \"quotes\""} for i in range(20)],
+            "empty": [],
+            "nested": {"a": [1, 2], "b": None},
+            "flag": True,
+        }
+        for indent in (None, 2):
+            document = json.dumps(data, indent=indent)
+            for chunk_size in (1, 2, 3, 7, 64, 4096):
+                self.assertEqual(self.read(document, chunk_size), data)
+
+    def test_unread_arrays_are_skipped(self):
+        document = json.dumps({"skip": [[1, 2], {"x": 3}], "keep": [4, 5]})
+        members = JSONObjectStream(io.StringIO(document), 4).items()
+
+        self.assertEqual(next(members)[0], "skip")
+        key, values = next(members)
+        self.assertEqual((key, list(values)), ("keep", [4, 5]))
+
+    def test_malformed_input_raises(self):
+        with self.assertRaises(ValueError):
+            self.read('{"a": [1, 2 3]}', 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
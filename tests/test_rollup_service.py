@@ -0,0 +1,135 @@
+import random
+import unittest
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from lifeblocks.models import Base, Block, DailyRollup, TimeBlock
+from lifeblocks.models.timeblock import TimeBlockState
+from lifeblocks.services.data_service import DataService
+from lifeblocks.services.history_service import HistoryService
+from lifeblocks.services.rollup_service import ROLLUP_FIELDS, RollupService
+from lifeblocks.services.settings_service import SettingsService
+from lifeblocks.services.timer_service import TimerService
+
+
+class TestRollupService(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        Session = sessionmaker(bind=self.engine)
+        self.session = Session()
+        self.rollup_service = RollupService.for_session(self.session)
+
+        self.blocks = [Block(name, 1) for name in ("Reading", "Writing", "Exercise")]
+        self.session.add_all(self.blocks)
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def stored(self):
+        rows = self.session.execute(select(DailyRollup.block_id, DailyRollup.date, *(getattr(DailyRollup, name) for name in ROLLUP_FIELDS)))
+        return {(row[0], row[1]): tuple(round(value, 6) for value in row[2:]) for row in rows}
+
+    def recomputed(self):
+        rows = self.session.execute(self.rollup_service._grouped_history())
+        return {
+            (row[0], date.fromisoformat(row[1])): tuple(round(value, 6) for value in row[2:])
+            for row in rows
+        }
+
+    def add_timeblock(self, block, start_time, minutes, state=TimeBlockState.COMPLETED, **kwargs):
+        timeblock = TimeBlock(block_id=block.id, start_time=start_time, duration_minutes=minutes, state=state, **kwargs)
+        self.session.add(timeblock)
+        self.session.commit()
+        return timeblock
+
+    def test_is_installed_once_per_session(self):
+        self.assertIs(RollupService.for_session(self.session), self.rollup_service)
+        TimerService(self.session, SettingsService(self.session))
+        HistoryService(self.session)
+
+        self.add_timeblock(self.blocks[0], datetime(2024, 5, 1, 9), 30.0)
+
+        self.assertEqual(self.stored()[(self.blocks[0].id, date(2024, 5, 1))][:3], (30.0, 0.0, 1))
+
+    def test_saved_timer_session_is_counted(self):
+        timer_service = TimerService(self.session, SettingsService(self.session))
+        timer_service.start_timer(self.blocks[1], 25, resistance_level=3)
+        self.assertEqual(self.stored(), {})  # Active sessions aren't counted yet
+
+        timer_service.save_session(20.0, satisfaction_level=4, notes="done")
+
+        key = (self.blocks[1].id, timer_service.session_start.date())
+        self.assertEqual(self.stored()[key], (20.0, 0.0, 1, 3, 1, 4, 1))
+
+    def test_edits_and_deletes_follow_history(self):
+        rng = random.Random(7)
+        start = datetime(2024, 1, 1, 8)
+        timeblocks = []
+        for i in range(60):
+            timeblocks.append(
+                self.add_timeblock(
+                    rng.choice(self.blocks),
+                    start + timedelta(hours=rng.randrange(24 * 5)),
+                    rng.choice([10.0, 25.0, 50.0]),
+                    state=rng.choice([TimeBlockState.COMPLETED, TimeBlockState.COMPLETED, TimeBlockState.ABANDONED]),
+                    resistance_level=rng.choice([None, 1, 4]),
+                )
+            )
+
+        for _ in range(80):
+            timeblock = rng.choice(timeblocks)
+            action = rng.randrange(6)
+            if action == 0:
+                timeblock.duration_minutes = rng.choice([5.0, 45.0])
+            elif action == 1:
+                timeblock.start_time += timedelta(days=rng.choice([-1, 1]))
+            elif action == 2:
+                timeblock.state = rng.choice(list(TimeBlockState))
+            elif action == 3:
+                timeblock.block_id = rng.choice(self.blocks).id
+                timeblock.satisfaction_level = rng.choice([None, 2, 5])
+            elif action == 4:
+                timeblock.deleted = not timeblock.deleted
+            else:
+                timeblock.notes = "only notes changed"
+            if rng.random() < 0.5:
+                self.session.commit()  # Expires everything, so later edits start from unloaded rows
+
+        self.session.delete(timeblocks[0])
+        self.session.commit()
+        HistoryService(self.session).delete_timeblocks([tb.id for tb in timeblocks[1:20]])
+
+        self.assertEqual(self.stored(), self.recomputed())
+        self.assertTrue(all(values[2] > 0 for values in self.stored().values()))
+
+    def test_rolled_back_changes_leave_the_rollup_alone(self):
+        timeblock = self.add_timeblock(self.blocks[0], datetime(2024, 5, 1, 9), 30.0)
+        expected = self.stored()
+
+        timeblock.duration_minutes = 90.0
+        self.session.flush()
+        self.session.rollback()
+
+        self.assertEqual(self.stored(), expected)
+
+    def test_import_rebuilds_the_rollup(self):
+        for i in range(10):
+            self.add_timeblock(self.blocks[i % 3], datetime(2024, 2, 1 + i % 4, 9), 15.0, satisfaction_level=3)
+        data_service = DataService(self.session)
+        data = data_service.export_data()
+        expected = self.stored()
+        self.session.query(DailyRollup).delete()
+        self.session.commit()
+
+        data_service.import_data(data)
+
+        self.assertEqual(self.stored(), expected)
+        totals = self.rollup_service.totals_by_block(date(2024, 2, 1), date(2024, 2, 3))
+        self.assertEqual(totals[self.blocks[0].id].session_count, 2)
+        self.assertEqual(totals[self.blocks[0].id].completed_minutes, 30.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
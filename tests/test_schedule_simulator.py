@@ -0,0 +1,95 @@
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from lifeblocks.models import Base
+from lifeblocks.services.block_service import BlockService
+from lifeblocks.services.schedule_simulator import DAY_SECONDS, ScheduleSimulator
+from lifeblocks.services.settings_service import SettingsService
+from lifeblocks.utils.clock import ManualClock
+
+
+class TestScheduleSimulator(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        Session = sessionmaker(bind=self.engine)
+        self.session = Session()
+        self.settings_service = SettingsService(self.session)
+        self.clock = ManualClock(datetime(2024, 3, 1, 9, 0))
+        self.block_service = BlockService(self.session, self.settings_service, clock=self.clock)
+        self.simulator = ScheduleSimulator(self.block_service)
+
+        work = self.block_service.add_block("Work", 3)
+        self.block_service.add_block("Life", 1)
+        self.block_service.add_block("Code", 2, "Work")
+        self.block_service.add_block("Email", 1, "Work", length_multiplier=0.5)
+        self.gym = self.block_service.add_block("Gym", 1, "Life", max_interval_hours=30)
+        self.block_service.add_block("Read", 1, "Life", length_multiplier=0.5)
+        self.gym.last_picked = self.clock.now() - timedelta(hours=6)
+        self.session.commit()
+        self.ids = {name: block.id for name, block in [("Work", work), ("Gym", self.gym)]}
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_snapshot_is_plain_arrays(self):
+        tree = self.simulator.snapshot()
+
+        gym = tree.ids.index(self.gym.id)
+        self.assertEqual(tree.max_intervals[gym], 30 * 3600.0)
+        self.assertEqual(tree.last_picked[gym], -6 * 3600.0)
+        self.assertEqual(tree.weights[tree.names.index("Code")], 6.0)
+        self.assertEqual(sorted(tree.names[i] for i in tree.leaf_pool), ["Code", "Email", "Gym", "Read"])
+        self.assertEqual(sorted(tree.names[i] for i in tree.child_pools[None]), ["Life", "Work"])
+        self.assertEqual(tree.doubling_seconds, 48 * 3600.0)
+
+    def test_report_covers_time_picks_and_intervals_in_seconds(self):
+        report = self.simulator.run(days=60, runs=4, workers=0, seed=5)
+
+        self.assertEqual(report.simulated_seconds, 4 * 60 * DAY_SECONDS)
+        self.assertAlmostEqual(report.worked_seconds, 4 * 60 * 8 * 3600.0)
+        self.assertEqual(report.blocks[self.ids["Work"]].picks, 0)  # Only leaves are worked on
+        self.assertAlmostEqual(sum(block.share for block in report.blocks.values()), 1.0)
+        shares = {block.name: block.share for block in report.blocks.values()}
+        self.assertGreater(shares["Code"], shares["Gym"])
+
+        gym = report.blocks[self.gym.id]
+        # Nights are 16 hours, so a 30 hour interval is overrun now and then; each
+        # overrun ends in an overdue pick, unless a run finishes in the middle of it
+        self.assertGreater(gym.violations, 0)
+        self.assertIn(gym.violations - report.overdue_picks, range(0, 5))
+        self.assertGreater(gym.longest_violation_seconds, 0)
+        self.assertLessEqual(gym.gap_p50, gym.gap_p90)
+        self.assertLessEqual(gym.gap_p90, gym.gap_max)
+
+    def test_runs_are_repeatable_across_processes(self):
+        self.settings_service.set_setting("use_leaf_based_selection", "false")
+        inline = self.simulator.run(days=20, runs=3, workers=0, seed=11)
+        pooled = self.simulator.run(days=20, runs=3, workers=2, seed=11)
+
+        self.assertEqual(inline, pooled)
+        self.assertEqual(inline.blocks[self.ids["Work"]].picks, 0)
+
+    def test_stride_selection_shortens_the_longest_waits(self):
+        lottery = self.simulator.run(days=60, runs=2, workers=0, seed=3)
+        self.settings_service.set_setting("use_stride_selection", "true")
+        stride = self.simulator.run(days=60, runs=2, workers=0, seed=3)
+
+        names = {block.name: block_id for block_id, block in stride.blocks.items()}
+        for name in ("Code", "Email", "Read"):
+            block_id = names[name]
+            self.assertLess(stride.blocks[block_id].gap_max, lottery.blocks[block_id].gap_max)
+            # Turns come round every day: the longest wait is a night
+            self.assertLessEqual(stride.blocks[block_id].gap_max, DAY_SECONDS)
+        self.assertEqual(stride.blocks[self.ids["Work"]].picks, 0)
+
+    def test_always_delayed_blocks_skip_every_session(self):
+        report = self.simulator.run(days=3, runs=1, workers=0, session_minutes=60, delay_probability=1.0, seed=1)
+
+        self.assertEqual(report.skipped_sessions, 3 * 8)
+        self.assertEqual(report.worked_seconds, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
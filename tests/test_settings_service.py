@@ -0,0 +1,61 @@
+import unittest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from lifeblocks.models import Base, Settings
+from lifeblocks.services.block_service import BlockService
+from lifeblocks.services.settings_service import SettingsService
+
+
+class TestSettingsService(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        Session = sessionmaker(bind=self.engine)
+        self.session = Session()
+        self.settings_service = SettingsService(self.session)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_reads_are_served_from_memory(self):
+        self.settings_service.set_setting("debug_mode", "false")
+        self.assertEqual(self.settings_service.get_setting("debug_mode"), "false")
+
+        statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        for _ in range(10):
+            self.settings_service.get_setting("debug_mode")
+            self.settings_service.get_setting("missing", "default")
+        self.assertEqual(statements, [])
+
+        stats = self.settings_service.cache_stats()
+        self.assertEqual(stats["loads"], 1)
+        self.assertEqual(stats["misses"], 10)
+
+    def test_cache_follows_external_changes(self):
+        self.assertIsNone(self.settings_service.get_setting("theme"))
+
+        # Writes through the ORM outside the service
+        self.session.add(Settings(key="theme", value="dark"))
+        self.session.commit()
+        self.assertEqual(self.settings_service.get_setting("theme"), "dark")
+
+        # Bulk statements force a reload
+        self.session.query(Settings).delete()
+        self.session.commit()
+        self.assertIsNone(self.settings_service.get_setting("theme"))
+
+    def test_pick_runs_no_settings_queries(self):
+        block_service = BlockService(self.session, self.settings_service)
+        for i in range(50):
+            block_service.add_block(f"Block {i}", weight=i % 3 + 1, length_multiplier=0.5)
+        block_service.pick_block_queue()
+
+        statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        block_service.pick_block_queue()
+        self.assertFalse([sql for sql in statements if "settings" in sql])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from collections import Counter
+from lifeblocks.utils.stride_queue import StrideQueue
+
+
+class TestStrideQueue(unittest.TestCase):
+    def test_shares_stay_within_a_stride_of_the_weights(self):
+        weights = {"a": 1, "b": 2, "c": 4, "d": 0}
+        queue = StrideQueue((item, weight, 0.0) for item, weight in weights.items())
+        counts = Counter()
+
+        self.assertNotIn("d", queue)
+        for served in range(1, 701):
+            item = queue.first()
+            queue.serve(item)
+            counts[item] += 1
+            for other in "abc":
+                self.assertLessEqual(abs(counts[other] - served * weights[other] / 7), 1.0)
+
+        self.assertEqual(counts, {"a": 100, "b": 200, "c": 400})
+
+    def test_in_order_walks_passes_without_popping(self):
+        queue = StrideQueue([("a", 1, 3.0), ("b", 1, 1.0), ("c", 2, 2.0), ("d", 1, 2.0), ("e", 1, 0.5)])
+        queue.remove("e")
+        queue.update("a", pass_value=0.0)
+
+        # Ties go to the heavier item
+        self.assertEqual(list(queue.in_order()), ["a", "b", "c", "d"])
+        self.assertEqual(queue.first(), "a")
+        self.assertEqual(len(queue), 4)
+
+    def test_serve_amount_and_floor(self):
+        queue = StrideQueue([("a", 4, 1.0)])
+
+        self.assertEqual(queue.serve("a", amount=0.5), 1.125)
+        self.assertEqual(queue.serve("a", floor=10.0), 10.25)
+        queue.update("a", weight=1)
+        self.assertEqual(queue.stride("a"), 1.0)
+        queue.update("a", weight=0)
+        self.assertIsNone(queue.first())
+
+    def test_many_updates_keep_the_heap_small(self):
+        queue = StrideQueue((i, 1 + i % 3, 0.0) for i in range(50))
+        for _ in range(5000):
+            queue.serve(queue.first())
+
+        self.assertLessEqual(len(queue._heap), 2 * len(queue) + 16)
+        passes = [queue.pass_value(item) for item in queue.in_order()]
+        self.assertEqual(passes, sorted(passes))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from lifeblocks.models import Base, Block, TimeBlock
+from lifeblocks.models.timeblock import TimeBlockState
+from lifeblocks.services import timer_journal
+from lifeblocks.services.settings_service import SettingsService
+from lifeblocks.services.timer_journal import RECORD_SIZE, TimerJournal, replay
+from lifeblocks.services.timer_service import TimerService
+
+
+class TestTimerJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "blocks.db" + TimerJournal.SUFFIX)
+        self.journal = TimerJournal(self.path)
+
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.settings_service = SettingsService(self.session)
+        self.block = Block("Reading", 1)
+        self.session.add(self.block)
+        self.session.commit()
+
+    def tearDown(self):
+        self.journal.close()
+        self.session.close()
+        self.directory.cleanup()
+
+    def restarted_service(self):
+        """A TimerService as created by the next run of the app, after a crash."""
+        self.session.expire_all()
+        journal = TimerJournal(self.path)
+        self.addCleanup(journal.close)
+        return TimerService(self.session, self.settings_service, journal=journal)
+
+    def test_replay_rebuilds_the_timer(self):
+        self.journal.start(7, 1000.0, 1500.0)
+        self.journal.append(timer_journal.ADJUST, 7, 1010.0, 30.0)
+        self.journal.append(timer_journal.PAUSE, 7, 1020.0)
+        self.journal.append(timer_journal.RESUME, 7, 1080.0, 60.0)
+        self.journal.append(timer_journal.UNFOCUS, 7, 1100.0, 120.0)
+        self.journal.append(timer_journal.PAUSE, 7, 1200.0)
+
+        replayed = replay(self.journal.events())
+
+        self.assertEqual(replayed.timeblock_id, 7)
+        self.assertEqual(replayed.end_time, 1000.0 + 1500 + 30 + 60 + 120)
+        self.assertEqual(replayed.total_pause_duration, 180.0)
+        self.assertEqual(replayed.pause_start, 1200.0)
+        self.assertEqual(os.path.getsize(self.path), 6 * RECORD_SIZE)
+
+    def test_torn_tail_is_ignored(self):
+        self.journal.start(7, 1000.0, 1500.0)
+        self.journal.append(timer_journal.ADJUST, 7, 1010.0, 30.0)
+        self.journal.append(timer_journal.ADJUST, 7, 1020.0, 30.0)
+        with open(self.path, "r+b") as journal:
+            # Damage the last record and leave half a record after it
+            journal.seek(2 * RECORD_SIZE + 12)
+            journal.write(b"\xff")
+            journal.seek(0, os.SEEK_END)
+            journal.write(b"\x01" * (RECORD_SIZE // 2))
+
+        events = self.journal.events()
+
+        self.assertEqual([event.code for event in events], [timer_journal.START, timer_journal.ADJUST])
+        self.assertEqual(replay(events).end_time, 2530.0)
+        self.assertIsNone(replay([]))
+
+    def test_restore_recovers_adjustments_and_unsaved_pauses(self):
+        timer_service = TimerService(self.session, self.settings_service, journal=self.journal)
+        timer_service.start_timer(self.block, 25, resistance_level=2)
+        timer_service.adjust_timer(300)
+        timer_service.track_unfocused_time(60)
+        timer_service.pause_timer()
+        # The app dies before the buffered pause and unfocused time reach the database
+        timeblock = timer_service.active_timeblock
+        self.session.execute(
+            update(TimeBlock).values(state=TimeBlockState.ACTIVE, pause_duration_minutes=0.0, pause_start=None)
+        )
+        self.session.commit()
+
+        restored = self.restarted_service()
+
+        self.assertTrue(restored.paused)
+        self.assertAlmostEqual(restored.total_pause_duration, 60.0, places=3)
+        minutes, seconds, _ = restored.get_remaining_time()
+        # Unfocused time moves the end out too
+        self.assertAlmostEqual(minutes * 60 + seconds, 25 * 60 + 300 + 60, delta=2)
+        self.assertEqual(timeblock.state, TimeBlockState.PAUSED)
+        self.assertEqual(timeblock.pause_duration_minutes, 1.0)
+
+        restored.resume_timer()
+        restored.stop_timer()
+        self.assertEqual(self.journal.events(), [])
+
+    def test_restore_without_a_matching_journal_uses_the_row(self):
+        # A journal left over from some other timeblock
+        self.journal.start(999, time.time(), 60.0)
+        self.session.add(
+            TimeBlock(
+                block_id=self.block.id,
+                start_time=datetime.now() - timedelta(minutes=10),
+                duration_minutes=25,
+                state=TimeBlockState.ACTIVE,
+            )
+        )
+        self.session.commit()
+
+        restored = self.restarted_service()
+
+        minutes, _, _ = restored.get_remaining_time()
+        self.assertIn(minutes, (14, 15))
+
+    def test_for_database_skips_memory_databases(self):
+        self.assertIsNone(TimerJournal.for_database(self.engine))
+        engine = create_engine("sqlite:///" + os.path.join(self.directory.name, "blocks.db"))
+        journal = TimerJournal.for_database(engine)
+        self.addCleanup(journal.close)
+        self.assertEqual(journal.path, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
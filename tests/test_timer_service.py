@@ -0,0 +1,173 @@
+import unittest
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from lifeblocks.models import Base, Block, TimeBlock
+from lifeblocks.models.timeblock import TimeBlockState
+from lifeblocks.services.settings_service import SettingsService
+from lifeblocks.services.timer_service import TimerService
+from lifeblocks.utils.clock import ManualClock
+
+
+class FakeWidget:
+    """Stands in for a Tk widget: records after() jobs so tests can run them."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.next_id = 0
+
+    def after(self, delay_ms, callback):
+        self.next_id += 1
+        self.jobs[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, job_id):
+        del self.jobs[job_id]
+
+    def run_jobs(self):
+        jobs, self.jobs = self.jobs, {}
+        for callback in jobs.values():
+            callback()
+
+
+class TestTimerService(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        Session = sessionmaker(bind=self.engine)
+        self.session = Session()
+        self.clock = ManualClock()
+        self.timer_service = TimerService(self.session, SettingsService(self.session), clock=self.clock)
+        self.block = Block("Reading", 1)
+        self.session.add(self.block)
+        self.session.commit()
+
+        self.commits = 0
+
+        def count_commit(session):
+            self.commits += 1
+
+        event.listen(self.session, "after_commit", count_commit)
+
+    def tearDown(self):
+        self.session.close()
+
+    def run_out(self):
+        """Let the timer run its course."""
+        self.clock.advance(self.timer_service._remaining_seconds() + 0.5)
+
+    def test_ticks_wake_at_the_next_second_boundary(self):
+        self.assertIsNone(self.timer_service.seconds_until_display_change())  # Idle
+
+        self.timer_service.start_timer(self.block, 25, resistance_level=2)
+        self.clock.advance(25 * 60 - 90.25)
+
+        self.assertEqual(self.timer_service.seconds_until_display_change(), 0.25)
+        self.assertEqual(self.timer_service.get_remaining_time()[:2], (1, 30))
+
+        self.timer_service.pause_timer()
+        self.assertIsNone(self.timer_service.seconds_until_display_change())
+
+    def test_expiry_is_handled_once_without_commits_while_polling(self):
+        self.timer_service.start_timer(self.block, 25, resistance_level=2)
+        self.commits = 0
+        for _ in range(5):
+            self.timer_service.get_remaining_time()
+            self.assertFalse(self.timer_service.check_expired())
+        self.assertEqual(self.commits, 0)
+
+        self.run_out()
+        self.assertEqual(self.timer_service.get_remaining_time(), (0, 0, True))
+        self.assertEqual(self.timer_service.seconds_until_display_change(), 0.0)
+        self.assertEqual(self.commits, 0)  # Reading the time never writes
+
+        self.assertTrue(self.timer_service.check_expired())
+        self.assertEqual(self.timer_service.active_timeblock.state, TimeBlockState.EXPIRED)
+        for _ in range(5):
+            self.assertFalse(self.timer_service.check_expired())
+            self.timer_service.get_remaining_time()
+        self.assertEqual(self.commits, 1)
+        self.assertIsNone(self.timer_service.seconds_until_display_change())
+
+    def test_restarted_timer_can_expire_again(self):
+        self.timer_service.start_timer(self.block, 25, resistance_level=2)
+        self.run_out()
+        self.assertTrue(self.timer_service.check_expired())
+
+        self.timer_service.restart_timer()
+        self.assertFalse(self.timer_service.check_expired())
+        self.run_out()
+        self.assertTrue(self.timer_service.check_expired())
+        states = [timeblock.state for timeblock in self.session.query(TimeBlock).order_by(TimeBlock.id)]
+        self.assertEqual(states, [TimeBlockState.RESTARTED, TimeBlockState.EXPIRED])
+
+    def stored_timeblock(self):
+        """The active timeblock row as stored, bypassing the session's identity map."""
+        with self.engine.connect() as connection:
+            return connection.execute(
+                TimeBlock.__table__.select().where(TimeBlock.id == self.timer_service.active_timeblock.id)
+            ).one()
+
+    def test_buffered_changes_are_committed_once_per_interval(self):
+        widget = FakeWidget()
+        self.timer_service.attach(widget)
+        notifications = []
+        self.timer_service.set_state_change_callback(lambda: notifications.append(self.timer_service.has_pending_writes))
+        self.timer_service.start_timer(self.block, 25, resistance_level=2)
+        self.commits = 0
+
+        self.timer_service.pause_timer()
+        self.timer_service.resume_timer()
+        for _ in range(5):
+            self.timer_service.track_unfocused_time(60)
+        self.assertEqual(self.commits, 0)
+        self.assertEqual(len(widget.jobs), 1)
+        self.assertTrue(self.timer_service.has_pending_writes)
+
+        widget.run_jobs()
+
+        self.assertEqual(self.commits, 1)
+        self.assertFalse(self.timer_service.has_pending_writes)
+        self.assertEqual(notifications[-1], False)  # Observers hear once the change is visible
+        self.assertEqual(self.stored_timeblock().state, TimeBlockState.ACTIVE)
+        self.assertAlmostEqual(self.stored_timeblock().pause_duration_minutes, 5.0, places=2)
+
+    def test_finishing_commits_buffered_changes_at_once(self):
+        widget = FakeWidget()
+        self.timer_service.attach(widget)
+        self.timer_service.start_timer(self.block, 25, resistance_level=2)
+        self.timer_service.track_unfocused_time(120)
+        self.commits = 0
+
+        self.timer_service.stop_timer()
+
+        self.assertEqual(self.commits, 1)
+        self.assertEqual(widget.jobs, {})
+        self.assertEqual(self.stored_timeblock().state, TimeBlockState.ABANDONED)
+        self.assertAlmostEqual(self.stored_timeblock().pause_duration_minutes, 2.0)
+
+    def test_restart_is_one_commit(self):
+        self.timer_service.start_timer(self.block, 25, resistance_level=2)
+        self.commits = 0
+
+        self.timer_service.restart_timer()
+
+        self.assertEqual(self.commits, 1)
+
+    def test_durations_ignore_wall_clock_changes(self):
+        self.timer_service.start_timer(self.block, 25, resistance_level=2)
+        self.clock.advance(minutes=10)
+        self.timer_service.pause_timer()
+        self.clock.advance(minutes=5)
+        # The system clock is set back an hour mid-session
+        self.clock.set_wall_time(datetime(2024, 1, 1, 8, 0))
+        self.timer_service.resume_timer()
+        self.clock.advance(minutes=5)
+
+        self.assertEqual(self.timer_service.get_remaining_time(), (10, 0, False))
+        self.assertEqual(self.timer_service.total_pause_duration, 300.0)
+        self.assertEqual(self.timer_service.stop_timer(), 15.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import random
+import unittest
+from collections import Counter
+from lifeblocks.utils.weighted_sampler import DecayWeightedSampler
+
+
+class TestDecayWeightedSampler(unittest.TestCase):
+    def test_total_matches_per_item_weights(self):
+        entries = [("a", 1, 0.0), ("b", 2, 10.0), ("c", 4, 20.0)]
+        sampler = DecayWeightedSampler(entries)
+
+        for now in (20.0, 48.0, 500.0):
+            expected = sum(w * (1 + (now - t) / 48.0) for _, w, t in entries)
+            self.assertAlmostEqual(sampler.total(now, 48.0), expected)
+
+        # Resetting an item's time only changes its own contribution
+        sampler.update("a", reset_time=48.0)
+        self.assertAlmostEqual(sampler.value("a", 48.0, 48.0), 1.0)
+
+    def test_distribution_follows_decayed_weights(self):
+        # Equal base weights; "old" has waited 48h longer, so it weighs twice as much at now=96
+        sampler = DecayWeightedSampler([("old", 1, 0.0), ("new", 1, 48.0)])
+        rng = random.Random(7)
+        counts = Counter(sampler.sample(96.0, 48.0, rng) for _ in range(20000))
+        self.assertAlmostEqual(counts["old"] / 20000, 3 / 5, delta=0.02)
+
+        weight, reset_time = sampler.remove("old")
+        self.assertEqual(sampler.sample(96.0, 48.0), "new")
+        sampler.update("old", weight=weight)
+        self.assertAlmostEqual(sampler.total(96.0, 48.0), 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()